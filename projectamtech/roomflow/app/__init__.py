@@ -3,18 +3,32 @@
 Responsável por:
 - carregar configuração;
 - inicializar persistência TXT/JSON (`FileDB` + `RoomFlowService`);
-- registrar blueprints (`auth`, `main`, `admin`);
+- rodar seed e conversões de arranque uma única vez por vez (lock em `_meta`);
+- criar o cache de fragmentos renderizados (grade da agenda);
+- preparar o estado de cada processo (`init_process`): caches vazios e worker
+  do outbox (notificações e auditoria fora da requisição). Roda na primeira
+  requisição de cada processo, ou no `post_fork` do servidor: com preload, o
+  app é criado uma vez no processo mestre e herdado pelos workers;
+- registrar blueprints (`auth`, `main`, `admin`, `api`) e comandos CLI (`roomflow`);
 - injetar helpers globais para templates.
 """
 
-from flask import Flask, g, render_template
+import atexit
+import os
+import threading
+
+from flask import Flask, g, render_template, request
 
 from .auth.decorators import load_logged_user
+from .cli import roomflow_cli
 from .config import Config
 from .storage.filedb import FileDB
 from .storage.services import RoomFlowService
+from .storage.tokencache import TokenCache
 from .storage.validators import format_date_br, weekday_pt
 
+_process_lock = threading.Lock()
+
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -26,20 +40,29 @@ def create_app(config_class=Config):
         lock_stale=app.config["LOCK_STALE_SECONDS"],
     )
     app.roomflow = RoomFlowService(db, config_class)
-    app.roomflow.ensure_seed()
+    app.roomflow.run_startup(app.config.get("STARTUP_LOCK_TIMEOUT_SECONDS", 60))
+    if app.roomflow.repo:
+        # Antes do fork, com preload: os workers herdam o conjunto de trabalho carregado.
+        app.roomflow.repo.warm()
+    app.fragments = TokenCache(app.config.get("FRAGMENT_CACHE_ENTRIES", 512))
 
     from .auth import bp as auth_bp
     from .main import bp as main_bp
     from .admin import bp as admin_bp
+    from .api import bp as api_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(api_bp)
+    app.cli.add_command(roomflow_cli)
 
     @app.before_request
     def _load_user():
+        init_process(app)
         load_logged_user()
-        if getattr(g, "user", None):
+        # A API de pré-visualização só consulta: a varredura de expiração fica para as páginas.
+        if getattr(g, "user", None) and request.blueprint != "api":
             app.roomflow.expire_due_checkins()
 
     @app.context_processor
@@ -63,3 +86,19 @@ def create_app(config_class=Config):
         return render_template("errors/500.html"), 500
 
     return app
+
+
+def init_process(app):
+    """Prepara o estado por processo uma vez por pid (idempotente)."""
+    pid = os.getpid()
+    if app.extensions.get("roomflow_pid") == pid:
+        return
+    with _process_lock:
+        if app.extensions.get("roomflow_pid") == pid:
+            return
+        app.fragments.clear()
+        interval = app.config.get("OUTBOX_POLL_SECONDS", 1.0) if app.config.get("OUTBOX_WORKER", True) else None
+        app.roomflow.init_process(interval)
+        if interval:
+            atexit.register(app.roomflow.stop_outbox_worker)
+        app.extensions["roomflow_pid"] = pid
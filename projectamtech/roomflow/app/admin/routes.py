@@ -4,13 +4,15 @@ Inclui dashboards, decisões de solicitação, gestão de reservas,
 emergências, bloqueios, usuários, setores e auditoria.
 """
 
-from datetime import datetime
+from calendar import monthrange
+from datetime import datetime, timedelta
 
 from flask import current_app, flash, g, redirect, render_template, request, url_for
 
 from app.auth.decorators import require_roles
+from app.conditional import conditional_page
 from app.storage.services import REQ_PENDING, ROLE_ADMIN, ROLE_RH
-from app.storage.validators import parse_date_br
+from app.storage.validators import format_date_br, parse_date_br
 from . import bp
 
 
@@ -45,15 +47,19 @@ def requests_list():
         "date": date_iso,
         "has_conflict": has_conflict,
     }
-    requests_data = service.list_requests(filters)
-    groups = service.group_requests_for_display(requests_data)
-    return render_template(
-        "admin/requests.html",
-        requests=requests_data,
-        groups=groups,
-        rooms=service.list_rooms(),
-        sectors=service.list_sectors(),
-    )
+
+    def render():
+        requests_data = service.list_requests(filters)
+        groups = service.group_requests_for_display(requests_data)
+        return render_template(
+            "admin/requests.html",
+            requests=requests_data,
+            groups=groups,
+            rooms=service.list_rooms(),
+            sectors=service.list_sectors(),
+        )
+
+    return conditional_page(service.data_generation(("requests",), user_id=g.user.id), render)
 
 
 @bp.route("/requests/<request_id>/approve", methods=["POST"])
@@ -84,6 +90,9 @@ def request_deny(request_id):
 def request_group_approve(recurrence_group_id):
     result = current_app.roomflow.approve_request_group(recurrence_group_id, g.user)
     flash(f"Grupo {recurrence_group_id}: {result['approved']} aprovadas, {result['failed']} falhas.", "success")
+    for outcome in result["outcomes"]:
+        if not outcome["ok"]:
+            flash(f"{format_date_br(outcome['date'])} {outcome['start']}-{outcome['end']}: {outcome['error']}", "warning")
     return redirect(url_for("admin.requests_list"))
 
 
@@ -113,8 +122,10 @@ def bookings_list():
         "date": date_iso,
         "is_emergency": True if request.args.get("emergency") == "yes" else (False if request.args.get("emergency") == "no" else None),
     }
-    bookings = service.list_bookings(filters)
-    return render_template("admin/bookings.html", bookings=bookings, rooms=service.list_rooms(), sectors=service.list_sectors())
+    return conditional_page(
+        service.data_generation(("bookings",), user_id=g.user.id),
+        lambda: render_template("admin/bookings.html", bookings=service.list_bookings(filters), rooms=service.list_rooms(), sectors=service.list_sectors()),
+    )
 
 
 @bp.route("/bookings/<booking_id>/cancel", methods=["POST"])
@@ -129,6 +140,45 @@ def booking_cancel(booking_id):
     return redirect(url_for("admin.bookings_list"))
 
 
+@bp.route("/calendar")
+@require_roles([ROLE_ADMIN, ROLE_RH])
+def calendar():
+    service = current_app.roomflow
+    view = request.args.get("view", "week")
+    if view not in ("week", "month"):
+        view = "week"
+    room_id = request.args.get("room_id") or None
+    date_br = request.args.get("date", "") or service.today_br()
+    try:
+        ref = datetime.strptime(parse_date_br(date_br), "%Y-%m-%d").date()
+    except ValueError:
+        flash("Data inválida. Use DD/MM/AAAA.", "warning")
+        ref = datetime.strptime(service.today_iso(), "%Y-%m-%d").date()
+
+    if view == "month":
+        first = ref.replace(day=1)
+        last = ref.replace(day=monthrange(ref.year, ref.month)[1])
+        prev_ref = first - timedelta(days=1)
+        next_ref = last + timedelta(days=1)
+    else:
+        first = ref - timedelta(days=ref.weekday())
+        last = first + timedelta(days=6)
+        prev_ref = first - timedelta(days=7)
+        next_ref = first + timedelta(days=7)
+
+    grid = service.calendar_grid(first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d"), room_id=room_id)
+    return render_template(
+        "admin/calendar.html",
+        grid=grid,
+        view=view,
+        room_id=room_id,
+        rooms=service.list_rooms(),
+        date_br=format_date_br(ref.strftime("%Y-%m-%d")),
+        prev_date_br=format_date_br(prev_ref.strftime("%Y-%m-%d")),
+        next_date_br=format_date_br(next_ref.strftime("%Y-%m-%d")),
+    )
+
+
 @bp.route("/emergency", methods=["GET", "POST"])
 @require_roles([ROLE_ADMIN, ROLE_RH])
 def emergency():
@@ -0,0 +1,11 @@
+"""Blueprint da API JSON.
+
+Consultas leves usadas pelo front-end para atualizar formulários sem
+recarregar a página.
+"""
+
+from flask import Blueprint
+
+bp = Blueprint("api", __name__, url_prefix="/api")
+
+from . import routes  # noqa: E402,F401
@@ -0,0 +1,123 @@
+"""Rotas JSON e de eventos.
+
+`GET /api/rooms/<room_id>/availability?date=DD/MM/AAAA[&start=HH:MM&end=HH:MM]`
+devolve a ocupação de sala+dia (horários bloqueados e reservados) e, com
+início e fim, o semáforo do intervalo. Lê a ocupação em cache do serviço
+(`room_day_occupancy`); o formulário de solicitação usa a rota a cada
+mudança de data ou horário.
+
+`GET /api/events?rooms=room_1,room_2` é um stream SSE com os eventos do
+usuário logado (`unread`, `user-data`) e das salas pedidas (`room-day`),
+vindos de `RoomFlowService.events`.
+
+`GET /api/kiosk[?room=room_1]` devolve a reserva atual e a próxima de cada
+sala (ou de uma), para os tablets de porta. O corpo sai pronto do snapshot
+compartilhado `RoomFlowService.kiosk`, com ETag pelo conteúdo.
+`POST /api/kiosk/checkin` faz o check-in no tablet: o dono da reserva se
+identifica com usuário e senha, e a reserva é lida só do arquivo da sala no
+dia.
+"""
+
+import json
+import time
+
+from flask import Response, current_app, g, jsonify, request
+
+from app.storage.security import PasswordBusy
+from app.storage.validators import parse_date_br
+from . import bp
+
+
+def _error(message: str, status: int):
+    return jsonify({"error": message}), status
+
+
+@bp.route("/rooms/<room_id>/availability")
+def room_availability(room_id):
+    if g.user is None:
+        return _error("Faça login para continuar.", 401)
+    service = current_app.roomflow
+    if not service.get_room(room_id):
+        return _error("Sala inválida.", 404)
+    try:
+        date_iso = parse_date_br(request.args.get("date", "") or service.today_br())
+    except ValueError:
+        return _error("Data inválida. Use DD/MM/AAAA.", 400)
+
+    data = service.availability(room_id, date_iso, request.args.get("start", ""), request.args.get("end", ""))
+    response = jsonify(data)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@bp.route("/events")
+def events_stream():
+    if g.user is None:
+        return _error("Faça login para continuar.", 401)
+    service = current_app.roomflow
+    rooms = [r for r in request.args.get("rooms", "").split(",") if r.startswith("room_")][:10]
+    topics = [f"user:{g.user.id}"] + [f"room:{r}" for r in rooms]
+    heartbeat = current_app.config.get("SSE_HEARTBEAT_SECONDS", 15)
+    max_seconds = current_app.config.get("SSE_MAX_SECONDS", 300)
+    subscription = service.events.subscribe(topics)
+    unread = service.unread_notification_count(g.user.id)
+
+    def stream():
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield "retry: 5000\n"
+            yield _sse("unread", {"unread": unread})
+            while time.monotonic() < deadline:
+                item = subscription.get(timeout=heartbeat)
+                yield _sse(item["event"], item["data"]) if item else ": ping\n\n"
+        finally:
+            service.events.unsubscribe(subscription)
+
+    response = Response(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@bp.route("/kiosk")
+def kiosk_board():
+    if g.user is None:
+        return _error("Faça login para continuar.", 401)
+    entry = current_app.roomflow.kiosk.room(request.args.get("room") or None)
+    if entry is None:
+        return _error("Sala inválida.", 404)
+    body, etag = entry
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@bp.route("/kiosk/checkin", methods=["POST"])
+def kiosk_checkin():
+    if g.user is None:
+        return _error("Faça login para continuar.", 401)
+    service = current_app.roomflow
+    payload = request.get_json(silent=True) or {}
+    room_id = str(payload.get("room_id", ""))
+    booking_id = str(payload.get("booking_id", ""))
+    if service.kiosk.room(room_id) is None:
+        return _error("Sala inválida.", 404)
+    try:
+        user = service.authenticate(str(payload.get("username", "")).strip(), str(payload.get("password", "")))
+    except PasswordBusy as exc:
+        return _error(str(exc), 503)
+    if not user:
+        return _error("Credenciais inválidas.", 403)
+    try:
+        service.checkin(booking_id, user, room_id=room_id, date_iso=service.today_iso())
+    except ValueError as exc:
+        return _error(str(exc), 400)
+    return jsonify({"ok": True, "booking_id": booking_id})
@@ -1,6 +1,8 @@
 """Decorators de autenticação/autorização.
 
-Integra com `flask.session` e com `RoomFlowService.get_user`.
+Integra com `flask.session` e com `RoomFlowService.get_user`. A sessão
+carrega um snapshot do usuário (`user_snapshot`); enquanto a versão do
+usuário não muda, nenhuma requisição precisa ler `users/<id>.txt`.
 """
 
 from functools import wraps
@@ -8,11 +10,28 @@ from functools import wraps
 from flask import current_app, flash, g, redirect, session, url_for
 
 
+def remember_user(user):
+    session["user_id"] = user.id
+    session["user_snapshot"] = current_app.roomflow.user_snapshot(user)
+
+
 def load_logged_user():
     user_id = session.get("user_id")
     g.user = None
-    if user_id:
-        g.user = current_app.roomflow.get_user(user_id)
+    if not user_id:
+        return
+    service = current_app.roomflow
+    snapshot = session.get("user_snapshot")
+    if snapshot and snapshot.get("id") == user_id:
+        g.user = service.user_from_snapshot(snapshot)
+        if g.user:
+            return
+    # Sem snapshot ou versão desatualizada (papel, setor, senha ou exclusão): relê do disco.
+    g.user = service.get_user(user_id)
+    if g.user:
+        remember_user(g.user)
+    else:
+        session.pop("user_snapshot", None)
 
 
 def login_required(f):
@@ -5,8 +5,10 @@ Conecta UI (`templates/auth/*`) com regras de senha no `RoomFlowService`.
 
 from flask import flash, g, redirect, render_template, session, url_for, current_app
 
+from app.storage.security import PasswordBusy
+
 from . import bp
-from .decorators import login_required
+from .decorators import login_required, remember_user
 from .forms import ChangePasswordForm, LoginForm
 
 
@@ -24,12 +26,16 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         service = current_app.roomflow
-        user = service.authenticate(form.username.data.strip(), form.password.data)
+        try:
+            user = service.authenticate(form.username.data.strip(), form.password.data)
+        except PasswordBusy as exc:
+            flash(str(exc), "warning")
+            return render_template("auth/login.html", form=form), 503
         if not user:
             flash("Credenciais inválidas.", "danger")
         else:
             session.clear()
-            session["user_id"] = user.id
+            remember_user(user)
             flash("Login realizado com sucesso.", "success")
             if user.must_change_password:
                 return redirect(url_for("auth.change_password"))
@@ -0,0 +1,53 @@
+"""Comandos de linha de comando do RoomFlow.
+
+Registrados no grupo `roomflow` do Flask CLI:
+    flask --app run roomflow migrate [--workers N]
+    flask --app run roomflow rebuild-metrics
+    flask --app run roomflow drain-outbox
+    flask --app run roomflow calibrate-password [--target-ms 250]
+"""
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .storage.security import calibrate_iterations
+
+roomflow_cli = AppGroup("roomflow", help="Manutenção da base TXT/JSON do RoomFlow.")
+
+
+@roomflow_cli.command("migrate")
+@click.option("--workers", default=0, type=int, help="Processos em paralelo (0 = automático).")
+def migrate_command(workers):
+    """Reescreve `data/` no schema atual e grava a versão em `_meta/schema.txt`."""
+    report = current_app.roomflow.migrate_schema(workers=workers)
+    click.echo(
+        f"Schema v{report['version']}: {report['files']} arquivos verificados, "
+        f"{report['files_changed']} reescritos, {report['items_changed']} registros convertidos."
+    )
+
+
+@roomflow_cli.command("rebuild-metrics")
+def rebuild_metrics_command():
+    """Reconstrói `_meta/metrics.txt` a partir de solicitações e reservas."""
+    metrics = current_app.roomflow.rebuild_metrics()
+    click.echo(f"Métricas reconstruídas: {len(metrics['months'])} meses, {len(metrics['days'])} dias com reservas ativas.")
+
+
+@roomflow_cli.command("drain-outbox")
+def drain_outbox_command():
+    """Aplica na hora os eventos pendentes do outbox (notificações e auditoria)."""
+    total = current_app.roomflow.drain_outbox()
+    click.echo(f"Outbox: {total} eventos aplicados.")
+
+
+@roomflow_cli.command("calibrate-password")
+@click.option("--target-ms", default=250.0, type=float, help="Tempo alvo de um hash PBKDF2, em milissegundos.")
+@click.option("--minimum", default=100_000, type=int, help="Piso de iterações.")
+def calibrate_password_command(target_ms, minimum):
+    """Sugere `PASSWORD_ITERATIONS` para o tempo alvo neste hardware."""
+    cfg = current_app.config
+    iterations = calibrate_iterations(target_ms, algorithm=cfg["PASSWORD_ALGORITHM"], minimum=minimum)
+    click.echo(f"Atual: PASSWORD_ITERATIONS = {cfg['PASSWORD_ITERATIONS']}")
+    click.echo(f"Sugerido para ~{target_ms:.0f} ms: PASSWORD_ITERATIONS = {iterations}")
+    click.echo("Após ajustar o Config, cada usuário tem o hash regravado no próximo login.")
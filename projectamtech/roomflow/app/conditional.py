@@ -0,0 +1,58 @@
+"""Respostas condicionais (ETag / If-None-Match) para páginas de consulta.
+
+A rota informa os tokens de geração dos dados exibidos
+(`RoomFlowService.data_generation`). O ETag junta esses tokens com o que
+muda o HTML para os mesmos dados: usuário logado (id, papel, setor e versão),
+URL com query string e versão dos templates. Se o navegador já tem essa
+versão, a resposta é 304 sem chamar o serviço nem renderizar o template.
+
+Páginas com mensagens flash pendentes não recebem ETag: as mensagens
+precisam ser consumidas e exibidas.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Callable, Optional
+
+from flask import current_app, g, make_response, request, session
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def _templates_signature(app) -> str:
+    # Calculado uma vez por processo; muda a cada deploy que altera templates.
+    signature = app.extensions.get("roomflow_templates_signature")
+    if signature is None:
+        folder = Path(app.root_path) / app.template_folder
+        digest = hashlib.blake2b(digest_size=8)
+        for path in sorted(folder.rglob("*.html")):
+            digest.update(f"{path.relative_to(folder)}:{path.stat().st_mtime_ns}".encode("utf-8"))
+        signature = digest.hexdigest()
+        app.extensions["roomflow_templates_signature"] = signature
+    return signature
+
+
+def page_etag(tokens: list[str]) -> Optional[str]:
+    if session.get("_flashes"):
+        return None
+    service = current_app.roomflow
+    user = g.user
+    viewer = [user.id, user.role, user.sector, str(service.user_versions.get(user.id))] if user else ["-"]
+    parts = [_templates_signature(current_app), request.full_path, *viewer, *tokens]
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def conditional_page(tokens: list[str], render: Callable):
+    etag = page_etag(tokens)
+    if etag is None:
+        return render()
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.vary.add("Cookie")
+    return response
@@ -15,6 +15,10 @@ class Config:
     PASSWORD_ALGORITHM = "sha256"
     PASSWORD_ITERATIONS = 220_000
     PASSWORD_SALT_BYTES = 16
+    # Hash/verificação em processos separados; acima de MAX_PENDING o login é recusado na hora.
+    PASSWORD_POOL_WORKERS = 2
+    PASSWORD_POOL_MAX_PENDING = 16
+    PASSWORD_POOL_TIMEOUT_SECONDS = 10
 
     BUSINESS_START = "07:00"
     BUSINESS_END = "18:30"
@@ -24,3 +28,34 @@ class Config:
 
     LOCK_TIMEOUT_SECONDS = 5
     LOCK_STALE_SECONDS = 20
+    # Espera máxima de um worker pelo seed/conversões de arranque feitos por outro processo.
+    STARTUP_LOCK_TIMEOUT_SECONDS = 60
+
+    # Grades de agenda renderizadas mantidas em memória (chaves sala+dia+classe de visualizador).
+    FRAGMENT_CACHE_ENTRIES = 512
+    # Ocupação sala+dia em cache para semáforo e API de disponibilidade.
+    OCCUPANCY_CACHE_ENTRIES = 1024
+
+    # Eventos ao vivo (SSE): leitura do arquivo compartilhado entre processos, heartbeat e
+    # duração máxima de cada conexão (o navegador reconecta sozinho).
+    EVENTS_POLL_SECONDS = 0.5
+    SSE_HEARTBEAT_SECONDS = 15
+    SSE_MAX_SECONDS = 300
+
+    # Leituras servidas de um repositório em memória; escritas seguem direto para os arquivos.
+    MEMORY_REPOSITORY = False
+    # Com o repositório em memória: invalidação pelo log `_meta/changes.log` (gravado só
+    # neste modo) + inotify; sem inotify, entradas revalidadas por `stat` a cada N segundos.
+    # Desligado, cada leitura valida o arquivo por `stat`.
+    CHANGE_FEED = True
+    CHANGE_FEED_INOTIFY = True
+    CHANGE_FEED_POLL_SECONDS = 0.5
+
+    # Painel dos tablets de porta: snapshot refeito no máximo a cada N segundos (ou antes,
+    # quando a agenda de hoje muda); intervalo de consulta da página do quiosque.
+    KIOSK_REFRESH_SECONDS = 15
+    KIOSK_POLL_SECONDS = 15
+
+    # Notificações e auditoria são aplicadas por um worker em segundo plano.
+    OUTBOX_WORKER = True
+    OUTBOX_POLL_SECONDS = 1.0
@@ -0,0 +1,42 @@
+"""Cache de fragmentos renderizados (grade de horários da agenda).
+
+A tabela de horários de `main/schedule_room.html` só varia por sala, dia,
+configuração de slots e classe do visualizador (RH/Admin vê quem reservou;
+os demais, só o setor). Cada linha é renderizada uma vez por entrada e
+guardada junto com a variante "minha reserva"; por visualizador só se
+escolhe a variante e se aplica o filtro de status.
+
+As linhas ficam em um `TokenCache` (`app.fragments`) com chave
+`(sala, dia, classe)`, validado pelos tokens de sala+dia de
+`RoomFlowService.data_generation` (reservas do dia, bloqueios da sala, sala,
+catálogo e configuração).
+"""
+
+from flask import get_template_attribute
+from markupsafe import Markup
+
+from app.storage.services import ROLE_ADMIN, ROLE_RH
+from app.storage.tokencache import TokenCache
+
+
+def _render_rows(service, room_id: str, date_iso: str, staff: bool) -> tuple:
+    schedule_row = get_template_attribute("partials/schedule_rows.html", "schedule_row")
+    rows = []
+    for entry in service.schedule_slots(room_id, date_iso, staff):
+        mine_html = str(schedule_row(service.mine_slot(entry, staff))) if entry["owner"] else None
+        rows.append((entry["status_key"], entry["owner"], str(schedule_row(entry)), mine_html))
+    return tuple(rows)
+
+
+def schedule_grid(cache: TokenCache, service, room_id: str, date_iso: str, viewer, status_filter: str = "") -> Markup:
+    staff = viewer.role in (ROLE_ADMIN, ROLE_RH)
+    tokens = tuple(service.data_generation(room_day=(room_id, date_iso)))
+    rows = cache.get((room_id, date_iso, staff), tokens, lambda: _render_rows(service, room_id, date_iso, staff))
+    out = []
+    for status_key, owner, html, mine_html in rows:
+        if owner and owner == viewer.id:
+            status_key, html = "mine", mine_html
+        if status_filter and status_key != status_filter:
+            continue
+        out.append(html)
+    return Markup("\n".join(out))
@@ -9,6 +9,8 @@ from datetime import datetime, timedelta
 from flask import current_app, flash, g, redirect, render_template, request, url_for
 
 from app.auth.decorators import login_required
+from app.conditional import conditional_page
+from app.fragments import schedule_grid
 from app.storage.services import BOOK_ACTIVE, REQ_PENDING, ROLE_ADMIN, ROLE_RH
 from app.storage.validators import format_date_br, parse_date_br
 from . import bp
@@ -26,8 +28,21 @@ def index():
 @bp.route("/rooms")
 @login_required
 def rooms():
-    rooms = current_app.roomflow.list_rooms()
-    return render_template("main/rooms.html", rooms=rooms)
+    service = current_app.roomflow
+    return conditional_page(
+        service.data_generation(user_id=g.user.id),
+        lambda: render_template("main/rooms.html", rooms=service.list_rooms()),
+    )
+
+
+@bp.route("/kiosk/<room_id>")
+@login_required
+def kiosk(room_id):
+    room = current_app.roomflow.get_room(room_id)
+    if not room:
+        flash("Sala inválida.", "danger")
+        return redirect(url_for("main.rooms"))
+    return render_template("main/kiosk.html", room=room, poll_seconds=current_app.config.get("KIOSK_POLL_SECONDS", 15))
 
 
 @bp.route("/room/<room_id>/schedule")
@@ -51,25 +66,66 @@ def room_schedule(room_id):
     except ValueError:
         duration = 30
     status_filter = request.args.get("status", "")
-    schedule = service.schedule_for_room(room_id, date_iso, g.user)
-    if status_filter:
-        schedule = [s for s in schedule if s["status_key"] == status_filter]
 
-    suggestions = service.suggest_free_slots(room_id, date_iso, duration, limit=5)
+    def render():
+        schedule_rows = schedule_grid(current_app.fragments, service, room_id, date_iso, g.user, status_filter)
+        suggestions = service.suggest_free_slots(room_id, date_iso, duration, limit=5)
+
+        prev_date_br = format_date_br((datetime.strptime(date_iso, "%Y-%m-%d").date() - timedelta(days=1)).strftime("%Y-%m-%d"))
+        next_date_br = format_date_br((datetime.strptime(date_iso, "%Y-%m-%d").date() + timedelta(days=1)).strftime("%Y-%m-%d"))
+
+        return render_template(
+            "main/schedule_room.html",
+            room=room,
+            date_br=date_br,
+            date_iso=date_iso,
+            schedule_rows=schedule_rows,
+            suggestions=suggestions,
+            duration=duration,
+            prev_date_br=prev_date_br,
+            next_date_br=next_date_br,
+            filter_status=status_filter,
+        )
+
+    return conditional_page(service.data_generation(user_id=g.user.id, room_day=(room_id, date_iso)), render)
 
-    prev_date_br = format_date_br((datetime.strptime(date_iso, "%Y-%m-%d").date() - timedelta(days=1)).strftime("%Y-%m-%d"))
-    next_date_br = format_date_br((datetime.strptime(date_iso, "%Y-%m-%d").date() + timedelta(days=1)).strftime("%Y-%m-%d"))
+
+@bp.route("/search")
+@login_required
+def search():
+    service = current_app.roomflow
+    date_br = request.args.get("date", "") or service.today_br()
+    date_to_br = request.args.get("date_to", "")
+    start = request.args.get("start", "") or service.get_runtime_config()["business_start"]
+    end = request.args.get("end", "") or service.get_runtime_config()["business_end"]
+    try:
+        duration = int(request.args.get("duration", "60") or 60)
+    except ValueError:
+        duration = 60
+    try:
+        capacity = int(request.args.get("capacity", "0") or 0)
+    except ValueError:
+        capacity = 0
+
+    results = None
+    if request.args.get("date"):
+        try:
+            date_from_iso = parse_date_br(date_br)
+            date_to_iso = parse_date_br(date_to_br) if date_to_br else date_from_iso
+            results = service.search_availability(date_from_iso, date_to_iso, start, end, duration, min_capacity=capacity)
+        except ValueError as exc:
+            flash(str(exc), "danger")
 
     return render_template(
-        "main/schedule_room.html",
-        room=room,
+        "main/search.html",
         date_br=date_br,
-        schedule=schedule,
-        suggestions=suggestions,
+        date_to_br=date_to_br,
+        start=start,
+        end=end,
         duration=duration,
-        prev_date_br=prev_date_br,
-        next_date_br=next_date_br,
-        filter_status=status_filter,
+        capacity=capacity,
+        time_options=service.build_time_options(),
+        results=results,
     )
 
 
@@ -200,8 +256,10 @@ def my_bookings():
         "date_from": date_from,
         "date_to": date_to,
     }
-    bookings = service.list_bookings(filters)
-    return render_template("main/my_bookings.html", bookings=bookings, now=datetime.now(), rooms=service.list_rooms())
+    return conditional_page(
+        service.data_generation(user_id=g.user.id),
+        lambda: render_template("main/my_bookings.html", bookings=service.list_bookings(filters), now=datetime.now(), rooms=service.list_rooms()),
+    )
 
 
 @bp.route("/my/bookings/<booking_id>/cancel", methods=["POST"])
@@ -220,7 +278,7 @@ def my_cancel_booking(booking_id):
 @login_required
 def booking_checkin(booking_id):
     try:
-        current_app.roomflow.checkin(booking_id, g.user)
+        current_app.roomflow.checkin(booking_id, g.user, room_id=request.form.get("room_id", ""), date_iso=request.form.get("date", ""))
         flash("Check-in confirmado.", "success")
     except Exception as exc:
         flash(str(exc), "danger")
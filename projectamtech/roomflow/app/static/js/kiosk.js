@@ -0,0 +1,87 @@
+// Tablet de porta: consulta /api/kiosk?room=<id> periodicamente (o navegador revalida
+// pelo ETag) e mostra a reserva atual, a próxima e o check-in da atual.
+(function () {
+  const body = document.getElementById("rf-kiosk");
+  if (!body) return;
+
+  const boardUrl = body.dataset.boardUrl;
+  const checkinUrl = body.dataset.checkinUrl;
+  const roomId = body.dataset.room;
+  const pollMs = Math.max(5, Number(body.dataset.pollSeconds) || 15) * 1000;
+  const form = body.querySelector("[data-role=checkin]");
+  const message = body.querySelector("[data-role=checkin-message]");
+  let current = null;
+
+  function describe(target, booking, emptyText) {
+    target.replaceChildren();
+    if (!booking) {
+      const span = document.createElement("span");
+      span.className = "text-muted";
+      span.textContent = emptyText;
+      target.append(span);
+      return;
+    }
+    const title = document.createElement("div");
+    title.className = "fs-4";
+    title.textContent = booking.start + " - " + booking.end;
+    const who = document.createElement("div");
+    who.textContent = booking.sector + " · " + booking.username + (booking.checked_in ? " · check-in feito" : "");
+    target.append(title, who);
+  }
+
+  function render(room, asOf) {
+    body.querySelector("[data-role=as-of]").textContent = asOf;
+    const blocked = body.querySelector("[data-role=blocked]");
+    blocked.textContent = room.blocked ? "Bloqueada " + room.blocked.start + " - " + room.blocked.end + ": " + room.blocked.reason : "";
+    blocked.classList.toggle("d-none", !room.blocked);
+    describe(body.querySelector("[data-role=current]"), room.current, "Livre agora");
+    describe(body.querySelector("[data-role=next]"), room.next, "Sem próximas reservas hoje");
+    current = room.current;
+    form.classList.toggle("d-none", !(current && current.checkin_open));
+  }
+
+  async function refresh() {
+    try {
+      const response = await fetch(boardUrl, { headers: { Accept: "application/json" } });
+      if (response.status === 401) {
+        window.location.reload();
+        return;
+      }
+      if (!response.ok) return;
+      const data = await response.json();
+      if (data.rooms.length) render(data.rooms[0], data.as_of);
+    } catch (err) {
+      // Rede fora: mantém a última tela e tenta de novo no próximo ciclo.
+    }
+  }
+
+  form.addEventListener("submit", async (event) => {
+    event.preventDefault();
+    if (!current) return;
+    message.className = "w-100 small";
+    message.textContent = "Enviando...";
+    try {
+      const response = await fetch(checkinUrl, {
+        method: "POST",
+        headers: { "Content-Type": "application/json", Accept: "application/json" },
+        body: JSON.stringify({
+          room_id: roomId,
+          booking_id: current.id,
+          username: form.elements["username"].value,
+          password: form.elements["password"].value,
+        }),
+      });
+      const data = await response.json();
+      message.className = "w-100 small " + (response.ok ? "text-success" : "text-danger");
+      message.textContent = response.ok ? "Check-in confirmado." : data.error;
+    } catch (err) {
+      message.className = "w-100 small text-danger";
+      message.textContent = "Falha de conexão. Tente novamente.";
+    }
+    form.elements["password"].value = "";
+    refresh();
+  });
+
+  refresh();
+  window.setInterval(refresh, pollMs);
+})();
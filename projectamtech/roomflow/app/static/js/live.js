@@ -0,0 +1,47 @@
+// Atualização ao vivo via SSE (/api/events): badge de notificações não lidas e recarga da página
+// quando mudam os dados que ela mostra. Páginas sem eventos próprios, ou sem EventSource,
+// mantêm a recarga a cada 2 minutos.
+(function () {
+  const body = document.body;
+  const url = body.dataset.eventsUrl;
+  const live = body.dataset.live || "";
+  const fallbackReload = () => setTimeout(() => location.reload(), 120000);
+
+  if (!url || !("EventSource" in window)) {
+    fallbackReload();
+    return;
+  }
+  if (!live) fallbackReload();
+
+  const room = body.dataset.liveRoom || "";
+  const date = body.dataset.liveDate || "";
+  const source = new EventSource(url + (room ? "?rooms=" + encodeURIComponent(room) : ""));
+  let reloadTimer = null;
+  let unreadKnown = Number(body.dataset.unread || 0);
+
+  function reloadSoon() {
+    // Agrupa rajadas de eventos (aprovação em lote) em uma única recarga.
+    if (!reloadTimer) reloadTimer = setTimeout(() => location.reload(), 500);
+  }
+
+  source.addEventListener("unread", (e) => {
+    const unread = JSON.parse(e.data).unread;
+    document.querySelectorAll("[data-unread-badge]").forEach((badge) => {
+      badge.textContent = unread;
+      badge.classList.toggle("d-none", unread <= 0);
+    });
+    // O primeiro evento de cada conexão repete a contagem atual: só recarrega se mudou.
+    if (unread !== unreadKnown && live === "user") reloadSoon();
+    unreadKnown = unread;
+  });
+  source.addEventListener("room-day", (e) => {
+    const data = JSON.parse(e.data);
+    if (live === "room" && data.room_id === room && (!data.date || data.date === date)) reloadSoon();
+  });
+  source.addEventListener("user-data", () => {
+    if (live === "user") reloadSoon();
+  });
+  source.addEventListener("resync", () => {
+    if (live) reloadSoon();
+  });
+})();
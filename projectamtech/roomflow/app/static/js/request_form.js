@@ -0,0 +1,59 @@
+// Pré-visualização do formulário de solicitação: consulta /api/rooms/<id>/availability
+// a cada mudança de data ou horário e atualiza opções e semáforo sem recarregar a página.
+(function () {
+  const form = document.querySelector("form[data-availability-url]");
+  if (!form) return;
+
+  const url = form.dataset.availabilityUrl;
+  const dateInput = form.elements["date"];
+  const startSelect = form.elements["start"];
+  const endSelect = form.elements["end"];
+  const panel = document.getElementById("rf-semaphore");
+  const badges = { verde: ["success", "Verde"], amarelo: ["warning", "Amarelo"], vermelho: ["danger", "Vermelho"] };
+  let sequence = 0;
+
+  function markOptions(select, data) {
+    const blocked = new Set(data.blocked_times);
+    const reserved = new Set(data.reserved_times);
+    for (const option of select.options) {
+      if (!option.value) continue;
+      const time = option.value;
+      option.disabled = blocked.has(time) || reserved.has(time);
+      option.textContent = time + (blocked.has(time) ? " (bloqueado)" : reserved.has(time) ? " (reservado)" : "");
+    }
+  }
+
+  function showSemaphore(semaphore) {
+    if (!semaphore) {
+      panel.classList.add("d-none");
+      return;
+    }
+    const [color, label] = badges[semaphore.color] || badges.vermelho;
+    const badge = panel.querySelector("[data-role=badge]");
+    badge.className = "badge text-bg-" + color;
+    badge.textContent = label;
+    panel.querySelector("[data-role=message]").textContent = semaphore.message;
+    panel.classList.remove("d-none");
+  }
+
+  async function refresh() {
+    const current = ++sequence;
+    const params = new URLSearchParams({ date: dateInput.value.trim(), start: startSelect.value, end: endSelect.value });
+    try {
+      const response = await fetch(url + "?" + params.toString(), { headers: { Accept: "application/json" }, credentials: "same-origin" });
+      const data = await response.json();
+      if (current !== sequence) return;
+      if (!response.ok) {
+        showSemaphore({ color: "vermelho", message: data.error });
+        return;
+      }
+      markOptions(startSelect, data);
+      markOptions(endSelect, data);
+      showSemaphore(data.semaphore);
+    } catch (err) {
+      // Sem resposta: mantém o que já está na tela; o envio valida no servidor.
+    }
+  }
+
+  [dateInput, startSelect, endSelect].forEach((el) => el.addEventListener("change", refresh));
+})();
@@ -3,6 +3,19 @@
 Módulos:
 - `filedb`: IO em TXT/JSON com atomic write + lock
 - `models`: dataclasses de domínio
+- `blockindex`: índice compilado de bloqueios por sala (cache invalidado por arquivo)
+- `metrics`: contadores materializados do dashboard (delta por mutação, reconstruíveis)
+- `migrations`: versão de schema e migração da árvore `data/`
+- `summaries`: resumo materializado do "Meu Painel" por usuário
+- `locks`: locks de reserva por sala+dia (striping + lock de arquivo, métricas de espera)
+- `outbox`: fila durável de notificações/auditoria aplicada por worker
+- `userversions`: versões de usuário que invalidam o snapshot da sessão
+- `generations`: tokens de geração por escopo (ETag das páginas)
+- `tokencache`: cache LRU em memória validado por tokens de geração
+- `events`: pub/sub de eventos ao vivo (SSE) com repasse entre processos por arquivo
+- `kiosk`: snapshot compartilhado do painel agora/próxima dos tablets de porta
+- `repository`: repositório em memória opcional (leituras validadas por stat, escrita direta)
+- `changefeed`: feed de mudanças entre processos (log `_meta/changes.log`, inotify ou expiração periódica)
 - `security`: hash/verify de senha PBKDF2
 - `validators`: helpers de data/hora
 - `services`: regras e casos de uso
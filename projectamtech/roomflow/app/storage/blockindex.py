@@ -0,0 +1,130 @@
+"""Índice em memória dos bloqueios por sala.
+
+Cada bloqueio é compilado uma única vez, na carga do arquivo
+`blocks/<room_id>.txt`, em uma regra com intervalo de datas (ordinal),
+máscara de dias da semana e intervalo em minutos. O índice de uma sala é
+invalidado quando o arquivo muda (assinatura de `stat`) ou explicitamente
+via `invalidate`.
+"""
+
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Callable, Optional
+
+from .filedb import FileDB
+
+ALL_WEEKDAYS_MASK = 0
+
+
+class BlockRule:
+    __slots__ = ("block", "active", "start_ord", "end_ord", "weekday_mask", "start_min", "end_min")
+
+    def __init__(self, block, active: bool):
+        self.block = block
+        self.active = active
+        start_date = block.start_date or block.date
+        end_date = block.end_date or block.date
+        self.start_ord = date.fromisoformat(start_date).toordinal() if start_date else None
+        self.end_ord = date.fromisoformat(end_date).toordinal() if end_date else None
+        if block.date:
+            # Bloqueio legado de data única: restringe o intervalo ao próprio dia.
+            day = date.fromisoformat(block.date).toordinal()
+            self.start_ord = max(self.start_ord or day, day)
+            self.end_ord = min(self.end_ord or day, day)
+        mask = ALL_WEEKDAYS_MASK
+        for weekday in block.weekdays or []:
+            mask |= 1 << int(weekday)
+        self.weekday_mask = mask
+        self.start_min = block.start_min
+        self.end_min = block.end_min
+
+    def applies_on(self, day_ord: int, weekday_iso: int) -> bool:
+        if self.start_ord is not None and day_ord < self.start_ord:
+            return False
+        if self.end_ord is not None and day_ord > self.end_ord:
+            return False
+        return not self.weekday_mask or bool(self.weekday_mask & (1 << weekday_iso))
+
+    def overlaps(self, start_min: int, end_min: int) -> bool:
+        return self.start_min < end_min and start_min < self.end_min
+
+
+class _RoomEntry:
+    __slots__ = ("signature", "rules", "by_day")
+
+    def __init__(self, signature, rules):
+        self.signature = signature
+        self.rules = rules
+        self.by_day = {}
+
+
+class BlockIndex:
+    MAX_DAYS_PER_ROOM = 512
+
+    def __init__(self, db: FileDB, block_factory: Callable, active_status: str):
+        self.db = db
+        self.block_factory = block_factory
+        self.active_status = active_status
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def _blocks_dir(self) -> Path:
+        return self.db.data_dir / "blocks"
+
+    def _signature(self, path: Path):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _entry(self, room_id: str) -> _RoomEntry:
+        path = self._blocks_dir() / f"{room_id}.txt"
+        signature = self._signature(path)
+        entry = self._rooms.get(room_id)
+        if entry is not None and entry.signature == signature:
+            return entry
+        with self._lock:
+            entry = self._rooms.get(room_id)
+            if entry is not None and entry.signature == signature:
+                return entry
+            data = self.db.read_json(path, {"room_id": room_id, "items": []}) if signature else {"items": []}
+            rules = []
+            for raw in data.get("items", []):
+                blk = self.block_factory(raw)
+                rules.append(BlockRule(blk, blk.status == self.active_status))
+            rules.sort(key=lambda r: (r.start_min, r.end_min))
+            entry = _RoomEntry(signature, rules)
+            self._rooms[room_id] = entry
+            return entry
+
+    def invalidate(self, room_id: Optional[str] = None):
+        with self._lock:
+            if room_id is None:
+                self._rooms.clear()
+            else:
+                self._rooms.pop(room_id, None)
+
+    def room_ids(self) -> list[str]:
+        return sorted(p.stem for p in self._blocks_dir().glob("*.txt"))
+
+    def rules(self, room_id: str) -> list[BlockRule]:
+        return self._entry(room_id).rules
+
+    def active_on(self, room_id: str, date_iso: str) -> list[BlockRule]:
+        entry = self._entry(room_id)
+        cached = entry.by_day.get(date_iso)
+        if cached is not None:
+            return cached
+        day = date.fromisoformat(date_iso)
+        day_ord = day.toordinal()
+        weekday_iso = day.isoweekday()
+        out = [r for r in entry.rules if r.active and r.applies_on(day_ord, weekday_iso)]
+        if len(entry.by_day) >= self.MAX_DAYS_PER_ROOM:
+            entry.by_day.clear()
+        entry.by_day[date_iso] = out
+        return out
+
+    def overlapping(self, room_id: str, date_iso: str, start_min: int, end_min: int) -> list[BlockRule]:
+        return [r for r in self.active_on(room_id, date_iso) if r.overlaps(start_min, end_min)]
@@ -0,0 +1,277 @@
+"""Feed de mudanças em `data/` para invalidar caches entre processos.
+
+Fontes, da mais precisa para a mais ampla:
+- log `_meta/changes.log`: `FileDB` com `record_changes` acrescenta
+  `pid<TAB>caminho` depois de cada escrita atômica ou remoção, de qualquer
+  processo com o feed configurado (workers, CLI e scripts com o mesmo
+  Config). Acima de `FileDB.CHANGE_LOG_ROTATE_BYTES` vira `changes.log.1` e
+  o leitor termina o antigo pelo descritor aberto; `generation` conta os
+  registros lidos por este feed e só cresce;
+- inotify (Linux, via libc): pega também quem escreve sem `FileDB` (editor,
+  `cp`, scripts externos) nos diretórios observados;
+- sem inotify, uma thread marca todos os watches como "tudo mudou" a cada
+  `poll_interval`: os caches voltam a validar por `stat` cada entrada na
+  leitura seguinte, então qualquer escrita externa (inclusive edição no
+  lugar) aparece em até `poll_interval`, a um `stat` por entrada lida.
+
+Caches pedem um `Watch` por prefixo de caminho (ex.: `users/`) e chamam
+`poll()` antes de ler: um `stat` do log, sem depender de quantos arquivos o
+cache guarda; só com o log maior há leitura e os watches afetados são
+marcados. Escritas via `FileDB` (de qualquer processo) aparecem já no
+próximo `poll()`. O inotify é lido por uma thread por processo, que espera
+no descritor: escritas externas chegam logo depois de fechadas; sem
+inotify, em até `poll_interval`.
+
+Após um fork o processo filho abre o próprio inotify e marca todos os
+watches como "tudo mudou" (revalidação por `stat`), pois mudanças entre o
+fork e a abertura não teriam sido vistas.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+
+from .filedb import FileDB
+
+log = logging.getLogger(__name__)
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class Watch:
+    """Mudanças pendentes sob um prefixo; o cache consome com `drain()`."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.generation = 0
+        self._changed = set()
+        self._everything = False
+        self._lock = threading.Lock()
+
+    def _mark(self, rel: str = ""):
+        with self._lock:
+            if rel:
+                self._changed.add(rel)
+            else:
+                self._everything = True
+            self.generation += 1
+
+    def drain(self) -> tuple[bool, set]:
+        """Devolve `(tudo_mudou, caminhos)` desde a última chamada."""
+        if not self._everything and not self._changed:
+            return False, set()
+        with self._lock:
+            everything, changed = self._everything, self._changed
+            self._everything, self._changed = False, set()
+        return everything, changed
+
+
+class ChangeFeed:
+    def __init__(self, db: FileDB, poll_interval: float = 0.5, use_inotify: bool = True):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self._log_path = str(db.change_log)
+        db.change_log.parent.mkdir(parents=True, exist_ok=True)
+        self._watches = []
+        self._lock = threading.Lock()
+        self._pid = None
+        self._inotify = None
+        self._wd_dirs = {}
+        # Começa no fim do log atual: o que já estava escrito está nos arquivos.
+        self._log = None
+        self._log_ino = None
+        self._offset = 0
+        self._pending = b""
+        self._seen = None
+        self._generation = 0
+        self._start_at_end()
+
+    def _start_at_end(self):
+        try:
+            st = os.stat(self._log_path)
+        except FileNotFoundError:
+            return
+        self._log_ino, self._offset = st.st_ino, st.st_size
+        self._seen = (st.st_ino, st.st_size)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def inotify_active(self) -> bool:
+        return self._inotify is not None
+
+    def watch(self, prefix: str) -> Watch:
+        watch = Watch(prefix)
+        with self._lock:
+            self._watches.append(watch)
+            if self._pid == os.getpid():
+                self._watch_dir(prefix)
+        return watch
+
+    def _dir_of(self, prefix: str) -> Path:
+        path = self.db.data_dir / prefix
+        return path if prefix.endswith("/") or path.is_dir() else path.parent
+
+    # --- estado por processo -------------------------------------------------
+
+    def _ensure_process(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._log is not None:
+                # Descritor herdado do pai: o filho abre o seu, no mesmo offset.
+                self._log = None
+            self._inotify = None
+            self._wd_dirs = {}
+            libc = _load_libc() if self.use_inotify else None
+            if libc is not None:
+                fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+                if fd >= 0:
+                    self._libc = libc
+                    self._inotify = fd
+            for watch in self._watches:
+                self._watch_dir(watch.prefix)
+                watch._mark()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="roomflow-changefeed", daemon=True).start()
+
+    def _watch_dir(self, prefix: str):
+        directory = self._dir_of(prefix)
+        directory.mkdir(parents=True, exist_ok=True)
+        if self._inotify is not None:
+            wd = self._libc.inotify_add_watch(self._inotify, str(directory).encode(), _WATCH_MASK)
+            if wd >= 0:
+                self._wd_dirs[wd] = directory.relative_to(self.db.data_dir).as_posix()
+
+    # --- leitura das fontes --------------------------------------------------
+
+    def _dispatch(self, rels):
+        for rel in rels:
+            for watch in self._watches:
+                if rel.startswith(watch.prefix):
+                    watch._mark(rel)
+
+    def _open_log(self, offset: int):
+        try:
+            f = open(self._log_path, "rb")
+        except FileNotFoundError:
+            return None
+        self._log_ino = os.fstat(f.fileno()).st_ino
+        f.seek(offset)
+        self._offset = offset
+        return f
+
+    def _consume(self, raw: bytes):
+        raw = self._pending + raw
+        end = raw.rfind(b"\n") + 1
+        self._pending = raw[end:]
+        rels = set()
+        for line in raw[:end].decode("utf-8", "replace").splitlines():
+            _, _, rel = line.partition("\t")
+            if rel:
+                rels.add(rel)
+                self._generation += 1
+        self._dispatch(rels)
+
+    def _poll_log(self, st):
+        self._seen = (st.st_ino, st.st_size)
+        if self._log is None:
+            # Primeiro acesso neste processo (ou após rotação): retoma do offset conhecido.
+            self._log = self._open_log(self._offset if st.st_ino == self._log_ino else 0)
+            if self._log is None:
+                return
+        if st.st_ino != self._log_ino:
+            # Rotação: termina o arquivo antigo e segue no novo desde o início.
+            data = self._log.read()
+            self._log.close()
+            self._consume(data)
+            self._log, self._pending = self._open_log(0), b""
+            if self._log is None:
+                return
+            st = os.fstat(self._log.fileno())
+        if st.st_size > self._log.tell():
+            self._consume(self._log.read())
+            self._offset = self._log.tell()
+
+    def _poll_inotify(self):
+        try:
+            raw = os.read(self._inotify, 64 * 1024)
+        except BlockingIOError:
+            return
+        rels = set()
+        pos = 0
+        while pos + _EVENT.size <= len(raw):
+            wd, mask, _, length = _EVENT.unpack_from(raw, pos)
+            name = raw[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\0").decode("utf-8", "replace")
+            pos += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                for watch in self._watches:
+                    watch._mark()
+                continue
+            # Só os arquivos de dados: temporários e `.lock` da escrita atômica ficam de fora.
+            if name.endswith(".txt") and wd in self._wd_dirs:
+                rels.add(f"{self._wd_dirs[wd]}/{name}")
+        self._dispatch(rels)
+
+    def _expire_all(self):
+        # Sem inotify nada avisa da escrita externa: validade das entradas limitada a `poll_interval`.
+        for watch in self._watches:
+            watch._mark()
+
+    def poll(self):
+        """Aplica aos watches o que já está no log; chamado pelos caches antes de ler."""
+        self._ensure_process()
+        try:
+            st = os.stat(self._log_path)
+        except FileNotFoundError:
+            return
+        if (st.st_ino, st.st_size) == self._seen:
+            return
+        with self._lock:
+            self._poll_log(st)
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            try:
+                if self._inotify is not None:
+                    ready, _, _ = select.select([self._inotify], [], [], self.poll_interval)
+                    if ready:
+                        with self._lock:
+                            self._poll_inotify()
+                else:
+                    time.sleep(self.poll_interval)
+                    with self._lock:
+                        self._expire_all()
+                self.poll()
+            except Exception:
+                log.exception("falha ao ler o feed de mudanças")
+                time.sleep(self.poll_interval)
@@ -0,0 +1,182 @@
+"""Pub/sub de eventos ao vivo (notificações e mudanças de agenda).
+
+`publish` entrega na hora aos assinantes do próprio processo e acrescenta os
+eventos em `_events/bus.jsonl` (uma escrita `O_APPEND`, sem fsync: evento
+perdido só atrasa a tela). Cada processo com assinantes roda uma thread que
+acompanha o arquivo (como `tail -F`) e entrega os eventos publicados pelos
+outros processos, então um worker do servidor recebe o que outro publicou.
+
+Acima de `ROTATE_BYTES` o arquivo é renomeado para `bus.jsonl.1`; quem está
+lendo termina o arquivo antigo pelo descritor aberto e passa ao novo.
+
+Tópicos: `user:<id>` (eventos `unread`, `user-data`) e `room:<room_id>`
+(evento `room-day`, com `date` nulo quando mudam os bloqueios da sala). Quem
+assina `ALL_TOPICS` recebe todos.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Iterable, Optional
+
+from .filedb import FileDB
+
+log = logging.getLogger(__name__)
+
+ALL_TOPICS = "*"
+
+
+class Subscription:
+    def __init__(self, topics: Iterable[str], max_pending: int = 256):
+        self.topics = frozenset(topics)
+        self._queue = queue.Queue(max_pending)
+
+    def put(self, item: dict):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Cliente lento: descarta o acumulado e pede recarga completa.
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            self._queue.put_nowait({"event": "resync", "data": {}})
+
+    def get(self, timeout: float) -> Optional[dict]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self) -> list[dict]:
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+
+class EventBus:
+    ROTATE_BYTES = 4 << 20
+
+    def __init__(self, db: FileDB, poll_interval: float = 0.5):
+        self.db = db
+        self.dir = db.data_dir / "_events"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.dir / "bus.jsonl"
+        self.poll_interval = poll_interval
+        self._instance = uuid.uuid4().hex
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._tail_pid = None
+
+    def _origin(self) -> str:
+        # Inclui o pid: processos filhos de um fork não se confundem com o pai.
+        return f"{os.getpid()}:{self._instance}"
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        sub = Subscription(topics)
+        with self._lock:
+            for topic in sub.topics:
+                self._subscribers.setdefault(topic, set()).add(sub)
+            if self._tail_pid != os.getpid():
+                self._tail_pid = os.getpid()
+                threading.Thread(target=self._tail, name="roomflow-events", daemon=True).start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            for topic in sub.topics:
+                subs = self._subscribers.get(topic)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subscribers[topic]
+
+    def _dispatch(self, events: list[dict]):
+        with self._lock:
+            everyone = self._subscribers.get(ALL_TOPICS, set())
+            targets = [(sub, ev) for ev in events for sub in self._subscribers.get(ev["topic"], set()) | everyone]
+        for sub, ev in targets:
+            sub.put({"event": ev["event"], "data": ev["data"]})
+
+    def publish(self, events: list[tuple[str, str, dict]]):
+        """Publica `(topic, event, data)`; nunca levanta erro para quem está gravando dados."""
+        if not events:
+            return
+        origin = self._origin()
+        records = [{"origin": origin, "topic": topic, "event": event, "data": data} for topic, event, data in events]
+        self._dispatch(records)
+        raw = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        try:
+            fd = os.open(str(self.path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, raw)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size > self.ROTATE_BYTES:
+                self._rotate()
+        except (OSError, TimeoutError):
+            log.exception("falha ao publicar eventos entre processos")
+
+    def _rotate(self):
+        with self.db.file_lock(self.path):
+            try:
+                if self.path.stat().st_size > self.ROTATE_BYTES:
+                    os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+            except FileNotFoundError:
+                pass
+
+    def _open_at_end(self):
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return None
+        f.seek(0, os.SEEK_END)
+        return f
+
+    def _tail(self):
+        f = self._open_at_end()
+        pending = b""
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                if f is None:
+                    if not self.path.exists():
+                        continue
+                    f = open(self.path, "rb")
+                pending += f.read()
+                end = pending.rfind(b"\n") + 1
+                if end:
+                    self._deliver(pending[:end])
+                    pending = pending[end:]
+                try:
+                    rotated = os.stat(self.path).st_ino != os.fstat(f.fileno()).st_ino
+                except FileNotFoundError:
+                    rotated = True
+                if rotated:
+                    # Arquivo renomeado: termina o antigo pelo descritor aberto e segue no novo desde o início.
+                    self._deliver(pending + f.read())
+                    f.close()
+                    f, pending = None, b""
+            except Exception:
+                log.exception("falha ao acompanhar eventos entre processos")
+
+    def _deliver(self, raw: bytes):
+        origin = self._origin()
+        events = []
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            try:
+                ev = json.loads(line)
+            except ValueError:
+                continue
+            if ev.get("origin") != origin:
+                events.append(ev)
+        if events:
+            self._dispatch(events)
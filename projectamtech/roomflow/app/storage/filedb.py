@@ -1,21 +1,42 @@
 """Camada de acesso a arquivos TXT/JSON.
 
 Fornece leitura/escrita atômica e lock por arquivo.
+
+Read-modify-write usa concorrência otimista: `read_json_versioned` devolve o
+documento com um token (hash do conteúdo), `write_json_if` só grava se o
+arquivo ainda tiver o mesmo token e `update_json` repete o ciclo em caso de
+conflito. O lock é mantido apenas durante a comparação e a troca do arquivo.
+
+Com `record_changes` ligado (o serviço liga quando há feed de mudanças),
+toda escrita atômica e toda remoção (`remove`) acrescentam `pid<TAB>caminho`
+ao log de mudanças `_meta/changes.log` (append, sem fsync), lido por
+`changefeed.ChangeFeed` para invalidar caches em qualquer processo.
 """
 
+import copy
+import hashlib
 import json
 import os
+import random
 import time
 from contextlib import contextmanager
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 
 
+class WriteConflict(RuntimeError):
+    """O arquivo mudou entre a leitura e a escrita condicional."""
+
+
 class FileDB:
-    def __init__(self, data_dir: Path, lock_timeout: int = 5, lock_stale: int = 20):
+    UPDATE_RETRIES = 16
+    CHANGE_LOG_ROTATE_BYTES = 4 << 20
+
+    def __init__(self, data_dir: Path, lock_timeout: int = 5, lock_stale: int = 20, record_changes: bool = False):
         self.data_dir = Path(data_dir)
         self.lock_timeout = lock_timeout
         self.lock_stale = lock_stale
+        self.record_changes = record_changes
 
     def ensure_dirs(self):
         for p in [
@@ -25,13 +46,50 @@ class FileDB:
             "bookings",
             "requests",
             "notifications",
+            "dashboards",
             "blocks",
             "logs",
             "_meta",
+            "_outbox",
+            "_events",
             "_backup",
         ]:
             (self.data_dir / p).mkdir(parents=True, exist_ok=True)
 
+    @property
+    def change_log(self) -> Path:
+        return self.data_dir / "_meta" / "changes.log"
+
+    def _record_change(self, path: Path):
+        # Depois da troca do arquivo: quem ler o registro já encontra o conteúdo novo.
+        if not self.record_changes:
+            return
+        try:
+            rel = Path(path).relative_to(self.data_dir).as_posix()
+        except ValueError:
+            return
+        try:
+            fd = os.open(str(self.change_log), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, f"{os.getpid()}\t{rel}\n".encode("utf-8"))
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size > self.CHANGE_LOG_ROTATE_BYTES:
+                with self.file_lock(self.change_log):
+                    if self.change_log.stat().st_size > self.CHANGE_LOG_ROTATE_BYTES:
+                        os.replace(self.change_log, self.change_log.with_name(self.change_log.name + ".1"))
+        except (OSError, TimeoutError):
+            # Log de mudanças é auxiliar: a escrita do dado já aconteceu.
+            pass
+
+    def remove(self, path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return
+        self._record_change(path)
+
     @contextmanager
     def file_lock(self, target: Path):
         lock_file = target.with_suffix(target.suffix + ".lock")
@@ -68,6 +126,58 @@ class FileDB:
                 return default
             return json.loads(raw)
 
+    @staticmethod
+    def _token(raw: bytes) -> str:
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    def _current_token(self, path: Path):
+        try:
+            with open(path, "rb") as f:
+                return self._token(f.read())
+        except FileNotFoundError:
+            return None
+
+    def content_token(self, path: Path):
+        """Token de versão do arquivo (o mesmo de `read_json_versioned`), sem decodificar JSON."""
+        return self._current_token(path)
+
+    def read_json_versioned(self, path: Path, default):
+        """Lê o documento e o token de versão (`None` quando o arquivo não existe)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return default, None
+        text = raw.decode("utf-8").strip()
+        return (json.loads(text) if text else default), self._token(raw)
+
+    def write_json_if(self, path: Path, data, expected_token):
+        """Compare-and-swap: grava só se o arquivo ainda estiver na versão lida."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.file_lock(path):
+            if self._current_token(path) != expected_token:
+                raise WriteConflict(f"conflito de escrita em {path}")
+            self._write_atomic_unlocked(path, data)
+
+    def update_json(self, path: Path, default, mutate, retries: int = 0):
+        """Aplica `mutate(data)` e grava com CAS, relendo o arquivo a cada conflito.
+
+        `mutate` altera o documento no lugar e pode ser chamado mais de uma vez;
+        se devolver `False` nada é gravado. Devolve o documento final.
+        """
+        retries = retries or self.UPDATE_RETRIES
+        for attempt in range(retries):
+            data, token = self.read_json_versioned(path, copy.deepcopy(default))
+            if mutate(data) is False:
+                return data
+            try:
+                self.write_json_if(path, data, token)
+                return data
+            except WriteConflict:
+                time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+        raise WriteConflict(f"conflito de escrita persistente em {path}")
+
     def _write_atomic_unlocked(self, path: Path, data):
         path.parent.mkdir(parents=True, exist_ok=True)
         with NamedTemporaryFile("w", delete=False, dir=path.parent, encoding="utf-8") as tf:
@@ -76,6 +186,7 @@ class FileDB:
             os.fsync(tf.fileno())
             tmp_name = tf.name
         os.replace(tmp_name, path)
+        self._record_change(path)
 
     def write_json_atomic(self, path: Path, data, use_lock: bool = True):
         path.parent.mkdir(parents=True, exist_ok=True)
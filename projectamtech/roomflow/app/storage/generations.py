@@ -0,0 +1,38 @@
+"""Tokens de geração para respostas condicionais (ETag).
+
+Cada escopo tem um arquivo em `_meta/gen/<escopo>.txt` com um token
+aleatório, trocado (escrita atômica, sem read-modify-write) a cada mudança
+nos dados do escopo:
+
+- `bookings` e `requests`: listas globais de reservas e solicitações;
+- `catalog`: salas, setores e migrações de schema;
+- `user_<id>`: reservas, solicitações e notificações de um usuário.
+
+Sala+dia não tem arquivo próprio: o token vem do conteúdo dos arquivos de
+reservas do dia e de bloqueios da sala (`FileDB.content_token`).
+"""
+
+import uuid
+from pathlib import Path
+
+from .filedb import FileDB
+
+
+class GenerationStore:
+    def __init__(self, db: FileDB):
+        self.db = db
+        self.dir = db.data_dir / "_meta" / "gen"
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, scope: str) -> Path:
+        return self.dir / f"{scope}.txt"
+
+    def bump(self, *scopes: str):
+        for scope in dict.fromkeys(scopes):
+            self.db.write_json_atomic(self._path(scope), {"token": uuid.uuid4().hex}, use_lock=False)
+
+    def token(self, scope: str) -> str:
+        return self.db.read_json(self._path(scope), {}).get("token", "0")
+
+    def tokens(self, *scopes: str) -> list[str]:
+        return [self.token(scope) for scope in scopes]
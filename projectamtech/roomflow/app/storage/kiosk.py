@@ -0,0 +1,79 @@
+"""Painel "agora / próxima" das salas para tablets de porta (quiosque).
+
+`KioskBoard` guarda um snapshot compartilhado por processo, já serializado
+por sala (JSON + ETag pelo hash do conteúdo, igual entre workers). O
+snapshot é reconstruído no máximo uma vez a cada `max_age` segundos, ou
+antes disso quando chega um evento `room-day` de hoje (ou de bloqueio) pelo
+`EventBus`. Entre reconstruções, cada consulta custa só a checagem da fila
+de eventos.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from .events import ALL_TOPICS, EventBus
+
+
+class KioskSnapshot:
+    __slots__ = ("board", "rooms", "built_at")
+
+    def __init__(self, board: dict, built_at: float):
+        self.board = board
+        self.built_at = built_at
+        # (corpo JSON, ETag) por sala e do painel inteiro (chave None).
+        self.rooms = {None: self._encode(board)}
+        for room in board["rooms"]:
+            self.rooms[room["room_id"]] = self._encode({**board, "rooms": [room]})
+
+    @staticmethod
+    def _encode(payload: dict) -> tuple[bytes, str]:
+        body = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return body, hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+class KioskBoard:
+    def __init__(self, events: EventBus, build: Callable[[], dict], max_age: float = 15.0):
+        self.events = events
+        self.build = build
+        self.max_age = max_age
+        self._snapshot = None
+        self._subscription = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _changed(self, today: str) -> bool:
+        # Consome a fila inteira: eventos que sobrassem forçariam outra reconstrução.
+        changed = False
+        for item in self._subscription.drain():
+            if item["event"] == "resync":
+                changed = True
+            elif item["event"] == "room-day" and item["data"].get("date") in (None, today):
+                changed = True
+        return changed
+
+    def snapshot(self) -> KioskSnapshot:
+        if self._pid != os.getpid():
+            # Assinatura feita no processo que atende (depois do fork, se houver).
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._subscription = self.events.subscribe([ALL_TOPICS])
+                    self._snapshot = None
+                    self._pid = os.getpid()
+        snap = self._snapshot
+        now = time.monotonic()
+        if snap is not None and now - snap.built_at < self.max_age and not self._changed(snap.board["date"]):
+            return snap
+        with self._lock:
+            if self._snapshot is not snap and self._snapshot is not None:
+                return self._snapshot
+            # O que chegou até aqui já entra na reconstrução (inclusive com `max_age` vencido).
+            self._subscription.drain()
+            self._snapshot = KioskSnapshot(self.build(), time.monotonic())
+            return self._snapshot
+
+    def room(self, room_id: Optional[str]) -> Optional[tuple[bytes, str]]:
+        return self.snapshot().rooms.get(room_id)
@@ -0,0 +1,71 @@
+"""Locks de reserva por sala+dia.
+
+Protege a seção "verifica conflito -> grava reserva" de aprovações,
+emergências e aprovações de grupo. Cada chave `(room_id, date)` é mapeada
+para uma de `stripes` travas de thread (lock striping) e para um lock de
+arquivo em `_meta/locks/`, que cobre os demais processos do servidor.
+
+Operações com várias chaves adquirem sempre na mesma ordem global (travas de
+thread por índice, depois locks de arquivo por chave ordenada), então não há
+deadlock. Salas e dias diferentes continuam em paralelo, salvo colisão de
+stripe dentro do mesmo processo.
+
+`metrics()` expõe, por chave, quantas aquisições houve e o tempo de espera
+total e máximo.
+"""
+
+import threading
+import time
+import zlib
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Iterable
+
+from .filedb import FileDB
+
+
+class ReservationLocks:
+    MAX_TRACKED_KEYS = 4096
+
+    def __init__(self, db: FileDB, stripes: int = 64):
+        self.db = db
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        (db.data_dir / "_meta" / "locks").mkdir(parents=True, exist_ok=True)
+
+    def _lock_path(self, key: tuple[str, str]) -> Path:
+        room_id, date_iso = key
+        return self.db.data_dir / "_meta" / "locks" / f"{date_iso}_{room_id}"
+
+    def _stripe_index(self, key: tuple[str, str]) -> int:
+        return zlib.crc32(f"{key[0]}|{key[1]}".encode("utf-8")) % len(self._stripes)
+
+    def _record(self, keys: list, waited: float):
+        with self._stats_lock:
+            for key in keys:
+                label = f"{key[0]}@{key[1]}"
+                stat = self._stats.pop(label, None) or {"acquired": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0}
+                stat["acquired"] += 1
+                stat["wait_total_ms"] += waited * 1000
+                stat["wait_max_ms"] = max(stat["wait_max_ms"], waited * 1000)
+                # Reinsere no fim: a mais antiga sai primeiro quando o limite estoura.
+                self._stats[label] = stat
+            while len(self._stats) > self.MAX_TRACKED_KEYS:
+                self._stats.pop(next(iter(self._stats)))
+
+    @contextmanager
+    def hold(self, keys: Iterable[tuple[str, str]]):
+        keys = sorted(set(keys))
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for idx in sorted({self._stripe_index(k) for k in keys}):
+                stack.enter_context(self._stripes[idx])
+            for key in keys:
+                stack.enter_context(self.db.file_lock(self._lock_path(key)))
+            self._record(keys, time.perf_counter() - started)
+            yield
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            return {label: dict(stat) for label, stat in self._stats.items()}
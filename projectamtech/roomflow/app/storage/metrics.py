@@ -0,0 +1,85 @@
+"""Métricas materializadas do painel administrativo.
+
+O documento `_meta/metrics.txt` guarda contadores agregados:
+
+    {"version": 1,
+     "months": {"AAAA-MM": {"pending": n, "pending_conflict": n, "no_show": n}},
+     "days": {"AAAA-MM-DD": {"<room_id>": n}}}
+
+Cada mutação do serviço calcula a contribuição do registro antes e depois
+da escrita e aplica apenas a diferença. Contadores zerados são removidos,
+então `days` só mantém dias com reservas ativas. O documento pode ser
+reconstruído do zero a partir de `requests/` e `bookings/`
+(`flask --app run roomflow rebuild-metrics`).
+"""
+
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .filedb import FileDB
+
+METRICS_VERSION = 1
+
+
+def metrics_file(db: FileDB) -> Path:
+    return db.data_dir / "_meta" / "metrics.txt"
+
+
+def diff_keys(old_keys: Iterable[tuple], new_keys: Iterable[tuple]) -> Counter:
+    delta = Counter(new_keys)
+    delta.subtract(old_keys)
+    return Counter({k: v for k, v in delta.items() if v})
+
+
+def _empty() -> dict:
+    return {"version": METRICS_VERSION, "months": {}, "days": {}}
+
+
+def _add(doc: dict, key: tuple, amount: int):
+    section, bucket, name = key
+    counters = doc[section].setdefault(bucket, {})
+    value = counters.get(name, 0) + amount
+    if value > 0:
+        counters[name] = value
+    else:
+        counters.pop(name, None)
+        if not counters:
+            doc[section].pop(bucket, None)
+
+
+class MetricsStore:
+    def __init__(self, db: FileDB):
+        self.db = db
+
+    @property
+    def path(self) -> Path:
+        return metrics_file(self.db)
+
+    def read(self) -> Optional[dict]:
+        data = self.db.read_json(self.path, None)
+        if not data or data.get("version") != METRICS_VERSION:
+            return None
+        return data
+
+    def apply(self, delta: Counter):
+        if not delta:
+            return
+        path = self.path
+        with self.db.file_lock(path):
+            data = self.db.read_json(path, None)
+            if not data or data.get("version") != METRICS_VERSION:
+                # Sem documento válido não há base para o delta: a próxima leitura reconstrói.
+                return
+            for key, amount in delta.items():
+                _add(data, key, amount)
+            self.db.write_json_atomic(path, data, use_lock=False)
+
+    def rebuild(self, keys: Iterable[tuple]) -> dict:
+        path = self.path
+        with self.db.file_lock(path):
+            data = _empty()
+            for key, amount in Counter(keys).items():
+                _add(data, key, amount)
+            self.db.write_json_atomic(path, data, use_lock=False)
+        return data
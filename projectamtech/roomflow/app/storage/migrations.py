@@ -0,0 +1,112 @@
+"""Versionamento de schema e migração única da árvore `data/`.
+
+`SCHEMA_VERSION` descreve o formato atual dos registros. A migração
+reescreve reservas, solicitações, bloqueios e logs de auditoria no formato
+atual (em paralelo, um arquivo por tarefa) e grava a versão em
+`_meta/schema.txt`. Com a versão em dia, o serviço lê os registros sem
+nenhuma conversão de legado.
+
+Deve rodar com a aplicação parada: `flask --app run roomflow migrate`.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from .filedb import FileDB
+from .models import AuditEvent, Block, Booking, BookingRequest
+
+SCHEMA_VERSION = 2
+
+
+def schema_file(db: FileDB) -> Path:
+    return db.data_dir / "_meta" / "schema.txt"
+
+
+def read_schema(db: FileDB) -> dict:
+    return db.read_json(schema_file(db), {"version": 1})
+
+
+def read_schema_version(db: FileDB) -> int:
+    return int(read_schema(db).get("version", 1))
+
+
+def stamp_schema_version(db: FileDB, version: int = SCHEMA_VERSION, **extra):
+    path = schema_file(db)
+    with db.file_lock(path):
+        data = db.read_json(path, {})
+        data.update(extra)
+        data["version"] = version
+        data["migrated_at"] = datetime.now().isoformat(timespec="seconds")
+        db.write_json_atomic(path, data, use_lock=False)
+
+
+def _normalize_block(raw: dict) -> dict:
+    data = Block.from_dict(raw).to_dict()
+    if data["weekdays"]:
+        # `weekday` (0..6) já foi convertido para `weekdays` (1..7).
+        data["weekday"] = None
+    return data
+
+
+def _normalize_booking(raw: dict, checkin_grace_minutes: int) -> dict:
+    if "created_by" in raw:
+        return raw
+    return Booking.from_dict(raw, checkin_grace_minutes=checkin_grace_minutes).to_dict()
+
+
+def _normalize_request(raw: dict) -> dict:
+    if "requested_by" in raw:
+        return raw
+    return BookingRequest.from_dict(raw).to_dict()
+
+
+def _normalize_audit(raw: dict) -> dict:
+    if "action" in raw:
+        return raw
+    return AuditEvent.from_dict(raw).to_dict()
+
+
+def _migrate_file(task) -> tuple[str, int]:
+    data_dir, kind, path, checkin_grace_minutes = task
+    db = FileDB(Path(data_dir))
+    path = Path(path)
+    with db.file_lock(path):
+        data = db.read_json(path, {"items": []})
+        items = data.get("items", [])
+        if kind == "bookings":
+            new_items = [_normalize_booking(x, checkin_grace_minutes) for x in items]
+        elif kind == "requests":
+            new_items = [_normalize_request(x) for x in items]
+        elif kind == "blocks":
+            new_items = [_normalize_block(x) for x in items]
+        else:
+            new_items = [_normalize_audit(x) for x in items]
+        changed = sum(1 for old, new in zip(items, new_items) if old != new)
+        if changed:
+            data["items"] = new_items
+            db.write_json_atomic(path, data, use_lock=False)
+    return str(path), changed
+
+
+def migrate_data_tree(db: FileDB, checkin_grace_minutes: int = 15, workers: int = 0) -> dict:
+    tasks = []
+    for kind, pattern in (("bookings", "bookings/*.txt"), ("requests", "requests/*.txt"), ("blocks", "blocks/*.txt"), ("logs", "logs/audit_*.txt")):
+        for path in sorted(db.data_dir.glob(pattern)):
+            tasks.append((str(db.data_dir), kind, str(path), int(checkin_grace_minutes)))
+
+    workers = workers or min(8, os.cpu_count() or 1)
+    if workers <= 1 or len(tasks) <= 1:
+        results = [_migrate_file(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_migrate_file, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    stamp_schema_version(db)
+    return {
+        "version": SCHEMA_VERSION,
+        "files": len(tasks),
+        "files_changed": sum(1 for _, changed in results if changed),
+        "items_changed": sum(changed for _, changed in results),
+    }
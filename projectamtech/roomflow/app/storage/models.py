@@ -1,8 +1,20 @@
-"""Modelos de dados do domínio RoomFlow (dataclasses)."""
+"""Modelos de dados do domínio RoomFlow (dataclasses).
+
+Os modelos de alto volume (`BookingRequest`, `Booking`, `Block`,
+`Notification`, `AuditEvent`) usam `slots=True` e serialização escrita à mão
+(`to_dict`/`from_dict`), sem `dataclasses.asdict`. `from_dict` também
+converte os formatos legados gravados por versões anteriores.
+
+`Booking`, `BookingRequest` e `Block` carregam campos derivados
+(`start_min`, `end_min`, `date_ord`), calculados uma vez na construção e
+nunca persistidos: o núcleo de agenda compara e ordena inteiros.
+"""
 
 from dataclasses import asdict, dataclass, field
 from typing import Optional
 
+from .validators import date_to_ordinal_or_default, time_to_minutes_or_default
+
 
 @dataclass
 class User:
@@ -32,7 +44,7 @@ class Room:
         return asdict(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class BookingRequest:
     id: str
     requested_by: str
@@ -51,12 +63,63 @@ class BookingRequest:
     has_conflict: bool = False
     conflict_summary: str = ""
     recurrence_group_id: Optional[str] = None
+    start_min: int = field(init=False, repr=False, compare=False)
+    end_min: int = field(init=False, repr=False, compare=False)
+    date_ord: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.start_min = time_to_minutes_or_default(self.start)
+        self.end_min = time_to_minutes_or_default(self.end)
+        self.date_ord = date_to_ordinal_or_default(self.date)
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "BookingRequest":
+        if "requested_by" in item:
+            return cls(**item)
+        # Formato legado: user_id/start_time/end_time/RECUSADA/recurring_group.
+        return cls(
+            id=item.get("id", ""),
+            requested_by=item.get("user_id", ""),
+            username=item.get("username", ""),
+            sector=item.get("sector", ""),
+            room_id=item.get("room_id", ""),
+            date=item.get("date", ""),
+            start=item.get("start", item.get("start_time", "")),
+            end=item.get("end", item.get("end_time", "")),
+            reason=item.get("reason", ""),
+            status="NEGADA" if item.get("status") == "RECUSADA" else item.get("status", "PENDENTE"),
+            created_at=item.get("created_at", ""),
+            decided_at=item.get("decided_at"),
+            decided_by=item.get("decided_by"),
+            decision_reason=item.get("decision_reason", ""),
+            has_conflict=item.get("has_conflict", item.get("is_conflicting_on_create", False)),
+            conflict_summary=item.get("conflict_summary", ""),
+            recurrence_group_id=item.get("recurrence_group_id", item.get("recurring_group")),
+        )
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            "id": self.id,
+            "requested_by": self.requested_by,
+            "username": self.username,
+            "sector": self.sector,
+            "room_id": self.room_id,
+            "date": self.date,
+            "start": self.start,
+            "end": self.end,
+            "reason": self.reason,
+            "status": self.status,
+            "created_at": self.created_at,
+            "decided_at": self.decided_at,
+            "decided_by": self.decided_by,
+            "decision_reason": self.decision_reason,
+            "has_conflict": self.has_conflict,
+            "conflict_summary": self.conflict_summary,
+            "recurrence_group_id": self.recurrence_group_id,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class Booking:
     id: str
     room_id: str
@@ -79,12 +142,71 @@ class Booking:
     cancelled_by: str = ""
     created_at: str = ""
     updated_at: str = ""
+    start_min: int = field(init=False, repr=False, compare=False)
+    end_min: int = field(init=False, repr=False, compare=False)
+    date_ord: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.start_min = time_to_minutes_or_default(self.start)
+        self.end_min = time_to_minutes_or_default(self.end)
+        self.date_ord = date_to_ordinal_or_default(self.date)
+
+    @classmethod
+    def from_dict(cls, item: dict, checkin_grace_minutes: int = 15) -> "Booking":
+        if "created_by" in item:
+            return cls(**item)
+        # Formato legado: user_id/username/start_time/end_time/checkin_confirmed_at.
+        return cls(
+            id=item.get("id", ""),
+            room_id=item.get("room_id", ""),
+            date=item.get("date", ""),
+            start=item.get("start", item.get("start_time", "")),
+            end=item.get("end", item.get("end_time", "")),
+            sector=item.get("sector", ""),
+            created_by=item.get("user_id", ""),
+            created_by_username=item.get("created_by_username", item.get("username", "")),
+            approved_by=item.get("approved_by", ""),
+            status=item.get("status", "ATIVA"),
+            request_id=item.get("request_id"),
+            is_emergency=item.get("is_emergency", False),
+            emergency_reason=item.get("emergency_reason", ""),
+            requires_checkin=item.get("requires_checkin", True),
+            checkin_deadline_minutes=item.get("checkin_deadline_minutes", checkin_grace_minutes),
+            checked_in_at=item.get("checked_in_at", item.get("checkin_confirmed_at")),
+            recurrence_group_id=item.get("recurrence_group_id"),
+            cancel_reason=item.get("cancel_reason", ""),
+            cancelled_by=item.get("cancelled_by", ""),
+            created_at=item.get("created_at", ""),
+            updated_at=item.get("updated_at", ""),
+        )
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            "id": self.id,
+            "room_id": self.room_id,
+            "date": self.date,
+            "start": self.start,
+            "end": self.end,
+            "sector": self.sector,
+            "created_by": self.created_by,
+            "created_by_username": self.created_by_username,
+            "approved_by": self.approved_by,
+            "status": self.status,
+            "request_id": self.request_id,
+            "is_emergency": self.is_emergency,
+            "emergency_reason": self.emergency_reason,
+            "requires_checkin": self.requires_checkin,
+            "checkin_deadline_minutes": self.checkin_deadline_minutes,
+            "checked_in_at": self.checked_in_at,
+            "recurrence_group_id": self.recurrence_group_id,
+            "cancel_reason": self.cancel_reason,
+            "cancelled_by": self.cancelled_by,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class Block:
     id: str
     room_id: str
@@ -100,12 +222,59 @@ class Block:
     weekdays: list[int] = field(default_factory=list)
     created_at: str = ""
     updated_at: str = ""
+    start_min: int = field(init=False, repr=False, compare=False)
+    end_min: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.start_min = time_to_minutes_or_default(self.start)
+        self.end_min = time_to_minutes_or_default(self.end)
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> "Block":
+        legacy_date = raw.get("date")
+        legacy_weekday = raw.get("weekday")
+        weekdays = raw.get("weekdays") or []
+        if legacy_weekday is not None and not weekdays:
+            legacy_weekday = int(legacy_weekday)
+            # Compatibilidade: legado podia estar em 0..6; novo padrão usa 1..7.
+            weekdays = [legacy_weekday + 1] if 0 <= legacy_weekday <= 6 else [legacy_weekday]
+        return cls(
+            id=raw["id"],
+            room_id=raw["room_id"],
+            date=legacy_date,
+            weekday=legacy_weekday,
+            start=raw["start"],
+            end=raw["end"],
+            reason=raw["reason"],
+            created_by=raw["created_by"],
+            status=raw["status"],
+            start_date=raw.get("start_date", legacy_date),
+            end_date=raw.get("end_date", legacy_date),
+            weekdays=list(weekdays),
+            created_at=raw.get("created_at", ""),
+            updated_at=raw.get("updated_at", raw.get("created_at", "")),
+        )
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            "id": self.id,
+            "room_id": self.room_id,
+            "date": self.date,
+            "weekday": self.weekday,
+            "start": self.start,
+            "end": self.end,
+            "reason": self.reason,
+            "created_by": self.created_by,
+            "status": self.status,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "weekdays": list(self.weekdays),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class Notification:
     id: str
     user_id: str
@@ -114,12 +283,26 @@ class Notification:
     message: str
     created_at: str
     read_at: Optional[str] = None
+    event_id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "Notification":
+        return cls(**item)
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "type": self.type,
+            "title": self.title,
+            "message": self.message,
+            "created_at": self.created_at,
+            "read_at": self.read_at,
+            "event_id": self.event_id,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class AuditEvent:
     id: str
     actor_user_id: str
@@ -129,6 +312,33 @@ class AuditEvent:
     target_id: str
     details: dict = field(default_factory=dict)
     created_at: str = ""
+    event_id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "AuditEvent":
+        if "action" in item:
+            return cls(**item)
+        # Formato legado: ts/actor_id/event_type/payload.
+        return cls(
+            id=item.get("id", ""),
+            actor_user_id=item.get("actor_id", ""),
+            actor_username=item.get("actor_username", ""),
+            action=item.get("event_type", ""),
+            target_type=item.get("target_type", ""),
+            target_id=item.get("target_id", ""),
+            details=dict(item.get("payload") or {}),
+            created_at=item.get("ts", ""),
+        )
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            "id": self.id,
+            "actor_user_id": self.actor_user_id,
+            "actor_username": self.actor_username,
+            "action": self.action,
+            "target_type": self.target_type,
+            "target_id": self.target_id,
+            "details": dict(self.details),
+            "created_at": self.created_at,
+            "event_id": self.event_id,
+        }
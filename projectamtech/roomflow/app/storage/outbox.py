@@ -0,0 +1,185 @@
+"""Outbox transacional de notificações e auditoria.
+
+As mutações do serviço não gravam notificações e eventos de auditoria
+diretamente: acrescentam um registro compacto (uma linha JSON com
+`event_id`) em `_outbox/events.jsonl`, com fsync. Um worker aplica os
+registros em lote e só então avança o offset em `_outbox/offset.txt`.
+
+A entrega é pelo menos uma vez: se o processo cair entre aplicar e avançar
+o offset, o lote é reaplicado, e a aplicação ignora `event_id` já gravado.
+Quando todo o arquivo foi consumido e ele passou de `COMPACT_BYTES`, é
+truncado. Linha que não decodifica (append cortado por uma queda) vai para
+`_outbox/rejected.jsonl` e o offset passa por cima dela. Lote que falha ao
+ser aplicado é refeito evento a evento; o evento que não aplica (payload
+fora do formato) vai para o mesmo arquivo, com o erro. Só falhas de IO
+(lock ocupado, disco, conflito de escrita) deixam o offset parado para a
+próxima tentativa.
+
+Sem worker rodando (scripts, CLI), `RoomFlowService` drena a fila na hora.
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Callable
+
+from .filedb import FileDB, WriteConflict
+
+log = logging.getLogger(__name__)
+
+# Falhas passageiras: o lote fica na fila e é reaplicado no próximo ciclo.
+TRANSIENT_ERRORS = (OSError, TimeoutError, WriteConflict)
+
+
+class Outbox:
+    COMPACT_BYTES = 1 << 20
+
+    def __init__(self, db: FileDB):
+        self.db = db
+        self.dir = db.data_dir / "_outbox"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.events_path = self.dir / "events.jsonl"
+        self.offset_path = self.dir / "offset.txt"
+        self.consumer_path = self.dir / "consumer"
+        self.rejected_path = self.dir / "rejected.jsonl"
+        self._wake = threading.Event()
+
+    def enqueue(self, records: list[tuple[str, dict]]) -> list[str]:
+        """Acrescenta `(kind, payload)` à fila em uma única escrita; devolve os `event_id`."""
+        ids = []
+        lines = []
+        for kind, payload in records:
+            event_id = uuid.uuid4().hex
+            ids.append(event_id)
+            lines.append(json.dumps({"event_id": event_id, "kind": kind, "payload": payload}, ensure_ascii=False))
+        if not lines:
+            return ids
+        raw = ("\n".join(lines) + "\n").encode("utf-8")
+        with self.db.file_lock(self.events_path):
+            fd = os.open(str(self.events_path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, raw)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._wake.set()
+        return ids
+
+    def _read_offset(self) -> int:
+        return int(self.db.read_json(self.offset_path, {"offset": 0}).get("offset", 0))
+
+    def _pending(self, offset: int) -> tuple[list[dict], int]:
+        try:
+            with open(self.events_path, "rb") as f:
+                f.seek(offset)
+                raw = f.read()
+        except FileNotFoundError:
+            return [], offset
+        # Só linhas completas: uma escrita em andamento fica para o próximo ciclo.
+        end = raw.rfind(b"\n") + 1
+        events = []
+        rejected = []
+        for line in raw[:end].splitlines():
+            if not line.strip():
+                continue
+            event = self._decode(line)
+            if event is None:
+                # Append cortado seguido de um novo: o registro colado no fim ainda vale.
+                start = line.rfind(b'{"event_id"')
+                event = self._decode(line[start:]) if start > 0 else None
+                rejected.append(line[:start] if event is not None else line)
+            if event is not None:
+                events.append(event)
+        if rejected:
+            self._reject(rejected)
+        return events, offset + end
+
+    @staticmethod
+    def _decode(line: bytes):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        return event if isinstance(event, dict) and "kind" in event else None
+
+    def _reject(self, lines: list[bytes]):
+        # Fora da fila para não travar o offset; fica guardada para inspeção.
+        log.error("outbox: %d evento(s) inválido(s) em %s movidos para %s", len(lines), self.events_path, self.rejected_path)
+        with open(self.rejected_path, "ab") as f:
+            f.write(b"".join(line + b"\n" for line in lines))
+
+    def drain(self, apply: Callable[[list[dict]], None], batch_size: int = 500) -> int:
+        """Aplica todos os eventos pendentes; devolve quantos foram processados."""
+        total = 0
+        with self.db.file_lock(self.consumer_path):
+            offset = self._read_offset()
+            if offset > self._size():
+                # Arquivo truncado por fora: recomeça do início.
+                offset = 0
+            events, new_offset = self._pending(offset)
+            for start in range(0, len(events), batch_size):
+                self._apply_batch(apply, events[start:start + batch_size])
+            if events:
+                self.db.write_json_atomic(self.offset_path, {"offset": new_offset})
+                total = len(events)
+            self._compact(new_offset)
+        return total
+
+    def _apply_batch(self, apply: Callable[[list[dict]], None], batch: list[dict]):
+        try:
+            apply(batch)
+            return
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception:
+            log.exception("outbox: lote de %d evento(s) falhou; aplicando um a um", len(batch))
+        # Reaplicar é seguro (idempotente por `event_id`): só o evento que falha sai da fila.
+        rejected = []
+        for event in batch:
+            try:
+                apply([event])
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as exc:
+                rejected.append(json.dumps({"error": repr(exc), "event": event}, ensure_ascii=False, default=str).encode("utf-8"))
+        if rejected:
+            self._reject(rejected)
+
+    def _size(self) -> int:
+        try:
+            return self.events_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _compact(self, offset: int):
+        if offset < self.COMPACT_BYTES:
+            return
+        with self.db.file_lock(self.events_path):
+            if self._size() != offset:
+                return
+            with open(self.events_path, "wb") as f:
+                os.fsync(f.fileno())
+            self.db.write_json_atomic(self.offset_path, {"offset": 0})
+
+    def backlog(self) -> int:
+        return max(0, self._size() - self._read_offset())
+
+    def run_worker(self, apply: Callable[[list[dict]], None], interval: float, stop: threading.Event):
+        while not stop.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.drain(apply)
+            except TimeoutError:
+                # Outro processo está drenando a fila.
+                continue
+            except Exception:
+                log.exception("falha ao aplicar eventos do outbox")
+
+    def start_worker(self, apply: Callable[[list[dict]], None], interval: float = 1.0) -> threading.Event:
+        stop = threading.Event()
+        thread = threading.Thread(target=self.run_worker, args=(apply, interval, stop), name="roomflow-outbox", daemon=True)
+        thread.start()
+        return stop
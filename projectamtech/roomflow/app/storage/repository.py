@@ -0,0 +1,275 @@
+"""Repositório em memória dos dados de trabalho (modo opcional `MEMORY_REPOSITORY`).
+
+Na subida carrega, já decodificados nos modelos, usuários, salas, setores,
+reservas de hoje em diante e solicitações do mês corrente em diante. Cada
+`Collection` guarda os arquivos de um diretório e índices por chave (id,
+username); o serviço lê dela em vez de abrir e decodificar JSON. Arquivos
+fora do conjunto de trabalho (reservas passadas, meses antigos) continuam
+lidos do disco a cada acesso, mas entram no índice de ids.
+
+As escritas continuam síncronas pelo `FileDB` (write-through): o
+compare-and-swap de `update_json` depende do disco ser a fonte da verdade
+entre processos. A entrada do arquivo alterado é relida na próxima leitura.
+As verificações de conflito sob `reservation_locks` não passam por aqui:
+leem o arquivo do dia direto.
+
+Cada `Collection` tem um lock: entradas, índice e listagem são
+compartilhados pelas threads do worker.
+
+Escritas de qualquer processo são detectadas pela assinatura de `stat`
+(inode, mtime, tamanho; toda escrita atômica troca o inode) de cada arquivo
+e, nas listagens, do diretório. Assinatura com mtime a menos de `RACY_NS` do
+momento da leitura não é considerada estável (a resolução do mtime pode
+esconder uma segunda escrita no mesmo instante): o arquivo é relido até
+estabilizar.
+
+Com um `ChangeFeed` (modo `CHANGE_FEED`) cada coleção assina o prefixo do
+seu diretório: antes de ler aplica as mudanças avisadas (descarta a entrada
+do arquivo alterado e acerta a listagem) e devolve o resto sem `stat`.
+Quando o feed avisa que tudo pode ter mudado (fork, estouro da fila do
+inotify, expiração periódica sem inotify), as entradas voltam a ser validadas por
+`stat` como acima.
+"""
+
+import bisect
+import fnmatch
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+RACY_NS = 2_000_000_000
+
+
+def _signature(path: Path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class _Entry:
+    __slots__ = ("signature", "stable", "value", "keys", "trusted")
+
+    def __init__(self, signature, stable: bool, value, keys: tuple, trusted: bool = False):
+        self.signature = signature
+        self.stable = stable
+        self.value = value
+        self.keys = keys
+        # Com feed: válida até o feed avisar mudança, sem `stat` a cada leitura.
+        self.trusted = trusted
+
+
+class Collection:
+    """Arquivos `<nome>.txt` de um diretório, decodificados por `load` e validados por `stat`."""
+
+    def __init__(
+        self,
+        directory: Path,
+        pattern: str,
+        load: Callable[[Path], Any],
+        keys: Callable[[Any], Iterable[str]] = lambda value: (),
+        retain: Callable[[str], bool] = lambda name: True,
+        feed=None,
+    ):
+        self.directory = directory
+        self.pattern = pattern
+        self.load = load
+        self.keys = keys
+        self.retain = retain
+        self._entries = {}
+        self._index = {}
+        self._listing = None
+        self._listing_trusted = False
+        self._lock = threading.RLock()
+        self._feed = feed
+        self._watch = None
+        if feed is not None:
+            self._prefix = directory.relative_to(feed.db.data_dir).as_posix() + "/"
+            self._watch = feed.watch(self._prefix)
+
+    def _sync(self):
+        if self._watch is None:
+            return
+        self._feed.poll()
+        everything, changed = self._watch.drain()
+        if everything:
+            for entry in self._entries.values():
+                entry.trusted = False
+            self._listing_trusted = False
+        for rel in changed:
+            filename = rel[len(self._prefix):]
+            if "/" in filename or not fnmatch.fnmatch(filename, self.pattern):
+                continue
+            name = filename[: -len(".txt")]
+            self._entries.pop(name, None)
+            if self._listing is not None:
+                self._update_listing(name, (self.directory / filename).exists())
+
+    def _update_listing(self, name: str, exists: bool):
+        signature, names, stable = self._listing
+        pos = bisect.bisect_left(names, name)
+        present = pos < len(names) and names[pos] == name
+        if exists and not present:
+            names = names[:pos] + [name] + names[pos:]
+        elif not exists and present:
+            names = names[:pos] + names[pos + 1:]
+        else:
+            return
+        self._listing = (signature, names, stable)
+
+    def _read(self, name: str, path: Path, signature):
+        started = time.time_ns()
+        generation = self._watch.generation if self._watch is not None else 0
+        value = self.load(path)
+        after = _signature(path)
+        keys = tuple(self.keys(value)) if value is not None else ()
+        for key in keys:
+            self._index[key] = name
+        stable = after == signature and started - signature[1] > RACY_NS
+        # Mudança avisada durante a leitura: o valor pode ser o anterior, fica só validado por `stat`.
+        trusted = stable and self._watch is not None and self._watch.generation == generation
+        # Fora do conjunto de trabalho: guarda só assinatura e chaves (para o índice).
+        self._entries[name] = _Entry(after, stable, value if self.retain(name) else None, keys, trusted)
+        return value
+
+    def get(self, name: str):
+        with self._lock:
+            self._sync()
+            return self._get(name)
+
+    def _get(self, name: str):
+        entry = self._entries.get(name)
+        if entry is not None and entry.trusted and entry.value is not None:
+            return entry.value
+        path = self.directory / f"{name}.txt"
+        signature = _signature(path)
+        if signature is None:
+            self._entries.pop(name, None)
+            return None
+        if entry is not None and entry.stable and entry.signature == signature and entry.value is not None:
+            entry.trusted = self._watch is not None
+            return entry.value
+        return self._read(name, path, signature)
+
+    def names(self) -> list[str]:
+        with self._lock:
+            self._sync()
+            return self._names()
+
+    def _names(self) -> list[str]:
+        if self._listing_trusted:
+            return self._listing[1]
+        try:
+            st = os.stat(self.directory)
+        except FileNotFoundError:
+            return []
+        signature = (st.st_ino, st.st_mtime_ns)
+        listing = self._listing
+        if listing is None or listing[0] != signature or not listing[2]:
+            started = time.time_ns()
+            names = sorted(p.stem for p in self.directory.glob(self.pattern))
+            listing = (signature, names, started - st.st_mtime_ns > RACY_NS)
+            self._listing = listing
+            for name in set(self._entries) - set(names):
+                self._entries.pop(name, None)
+        self._listing_trusted = listing[2] and self._watch is not None
+        return listing[1]
+
+    def values(self) -> list:
+        with self._lock:
+            return [value for value in map(self._get, self.names()) if value is not None]
+
+    def _refresh_index(self):
+        # Relê só arquivos novos ou alterados desde a última leitura (chaves entram no índice).
+        for name in self._names():
+            entry = self._entries.get(name)
+            if entry is not None and entry.trusted:
+                continue
+            path = self.directory / f"{name}.txt"
+            signature = _signature(path)
+            if signature is not None and (entry is None or not entry.stable or entry.signature != signature):
+                self._read(name, path, signature)
+
+    def find(self, key: str) -> Optional[tuple[str, Any]]:
+        """Devolve `(nome, valor)` do arquivo que contém `key`, ou None."""
+        with self._lock:
+            self._sync()
+            return self._find(key)
+
+    def _find(self, key: str) -> Optional[tuple[str, Any]]:
+        for attempt in range(2):
+            name = self._index.get(key)
+            if name is not None:
+                value = self._get(name)
+                entry = self._entries.get(name)
+                if value is not None and entry is not None and key in entry.keys:
+                    return name, value
+            if attempt == 0:
+                self._refresh_index()
+        return None
+
+    def warm(self):
+        with self._lock:
+            for name in self.names():
+                self._get(name)
+
+
+class MemoryRepository:
+    def __init__(
+        self,
+        data_dir: Path,
+        read_json: Callable,
+        decode: dict[str, Callable],
+        today: Callable[[], str],
+        feed=None,
+    ):
+        self.data_dir = Path(data_dir)
+        self.today = today
+        self.feed = feed
+        self.users = Collection(
+            self.data_dir / "users",
+            "u_*.txt",
+            lambda path: decode["user"](read_json(path, {})),
+            keys=lambda user: (user.id, user.username) if user else (),
+            feed=feed,
+        )
+        self.rooms = Collection(
+            self.data_dir / "rooms", "room_*.txt", lambda path: decode["room"](read_json(path, {})), feed=feed
+        )
+        self.sectors = Collection(
+            self.data_dir / "sectors", "*.txt", lambda path: read_json(path, {}).get("name"), feed=feed
+        )
+        self.bookings = Collection(
+            self.data_dir / "bookings",
+            "*.txt",
+            lambda path: tuple(map(decode["booking"], read_json(path, {"items": []}).get("items", []))),
+            keys=lambda items: [b.id for b in items],
+            retain=lambda name: name[:10] >= self.today(),
+            feed=feed,
+        )
+        self.requests = Collection(
+            self.data_dir / "requests",
+            "*.txt",
+            lambda path: tuple(map(decode["request"], read_json(path, {"items": []}).get("items", []))),
+            keys=lambda items: [r.id for r in items],
+            retain=lambda name: name[:7] >= self.today()[:7],
+            feed=feed,
+        )
+        self.meta = Collection(self.data_dir / "_meta", "config.txt", lambda path: read_json(path, {}), feed=feed)
+
+    def warm(self) -> dict:
+        """Carrega o conjunto de trabalho; devolve quantos arquivos cada coleção leu."""
+        today = self.today()
+        loaded = {}
+        for label, collection in (("users", self.users), ("rooms", self.rooms), ("sectors", self.sectors), ("config", self.meta)):
+            collection.warm()
+            loaded[label] = len(collection.names())
+        for label, collection, current in (("bookings", self.bookings, today), ("requests", self.requests, today[:7])):
+            names = [name for name in collection.names() if name[: len(current)] >= current]
+            for name in names:
+                collection.get(name)
+            loaded[label] = len(names)
+        return loaded
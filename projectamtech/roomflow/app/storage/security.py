@@ -1,12 +1,25 @@
 """Funções de segurança de senha.
 
 Implementa hash/verificação PBKDF2-HMAC com comparação segura.
+
+`PasswordPool` executa hash/verificação em um `ProcessPoolExecutor` limitado,
+fora da thread da requisição: com `max_pending` operações em andamento, a
+próxima é recusada na hora (`PasswordBusy`) em vez de enfileirar. Os
+processos do pool saem de um forkserver (ou spawn), nunca de um fork do
+worker, que já tem outras threads segurando locks.
 """
 
 import base64
 import hashlib
 import hmac
+import multiprocessing
+import os
 import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
 
 
 def hash_password(password: str, algorithm: str = "sha256", iterations: int = 220_000, salt_bytes: int = 16) -> dict:
@@ -27,3 +40,72 @@ def verify_password(password: str, stored: dict) -> bool:
     expected = base64.b64decode(stored["hash"])
     digest = hashlib.pbkdf2_hmac(algo, password.encode("utf-8"), salt, iterations)
     return hmac.compare_digest(digest, expected)
+
+
+def needs_rehash(stored: dict, algorithm: str, iterations: int, salt_bytes: int) -> bool:
+    if stored.get("algo", "sha256") != algorithm or int(stored.get("iterations", 0)) != iterations:
+        return True
+    return len(base64.b64decode(stored.get("salt", ""))) != salt_bytes
+
+
+def calibrate_iterations(target_ms: float, algorithm: str = "sha256", minimum: int = 100_000, step: int = 10_000) -> int:
+    """Menor número de iterações (múltiplo de `step`) que leva ~`target_ms` neste hardware."""
+    sample = 50_000
+    salt = secrets.token_bytes(16)
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        hashlib.pbkdf2_hmac(algorithm, b"calibrate", salt, sample)
+        best = min(best, time.perf_counter() - started)
+    per_iteration_ms = best * 1000 / sample
+    iterations = int(round(target_ms / per_iteration_ms / step)) * step
+    return max(minimum, iterations)
+
+
+class PasswordBusy(ValueError):
+    """Fila de hashing cheia: a operação é recusada em vez de esperar."""
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class PasswordPool:
+    def __init__(self, workers: int = 0, max_pending: int = 16, timeout: float = 10.0):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            # Criado sob demanda e recriado após fork: cada processo do servidor tem o seu.
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, fn, *args, **kwargs):
+        if self.workers <= 0:
+            return fn(*args, **kwargs)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordBusy("Servidor ocupado verificando senhas. Tente novamente em instantes.")
+        try:
+            return self._pool().submit(fn, *args, **kwargs).result(timeout=self.timeout)
+        except FutureTimeout as exc:
+            raise PasswordBusy("Tempo esgotado verificando a senha. Tente novamente em instantes.") from exc
+        except BrokenProcessPool as exc:
+            with self._lock:
+                self._executor = None
+            raise PasswordBusy("Servidor ocupado verificando senhas. Tente novamente em instantes.") from exc
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
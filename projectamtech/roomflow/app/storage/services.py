@@ -4,15 +4,33 @@ Centraliza as regras de negócio e orquestra persistência em TXT/JSON:
 usuários, setores, solicitações, reservas, bloqueios, notificações e logs.
 """
 
+import copy
+import logging
 import uuid
-from datetime import datetime, timedelta
+from itertools import groupby, islice
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
 from typing import Optional
 
+from .blockindex import BlockIndex
+from .changefeed import ChangeFeed
+from .events import EventBus
 from .filedb import FileDB
+from .generations import GenerationStore
+from .kiosk import KioskBoard
+from .locks import ReservationLocks
+from .metrics import MetricsStore, diff_keys
+from .outbox import Outbox
+from .repository import MemoryRepository
+from .migrations import SCHEMA_VERSION, migrate_data_tree, read_schema_version, stamp_schema_version
 from .models import AuditEvent, Block, Booking, BookingRequest, Notification, Room, User
-from .security import hash_password, verify_password
-from .validators import format_date_br, minutes_to_time, parse_date_br, parse_time_hhmm, time_to_minutes
+from .security import PasswordBusy, PasswordPool, hash_password, needs_rehash, verify_password
+from .userversions import UserVersionTable
+from .tokencache import TokenCache
+from .summaries import SUMMARY_NOTIFICATIONS, UserSummaryStore, replace_item
+from .validators import format_date_br, minutes_to_time, parse_date_br, parse_date_iso, parse_time_hhmm, time_to_minutes
+
+log = logging.getLogger(__name__)
 
 ROLE_ADMIN = "ADMIN"
 ROLE_RH = "RH"
@@ -33,12 +51,64 @@ BOOK_DONE = "CONCLUIDA"
 BLOCK_ACTIVE = "ATIVO"
 BLOCK_INACTIVE = "INATIVO"
 
+# Versão do seed (setores, salas, usuários iniciais) e conversões de arranque já
+# aplicadas, gravadas em `_meta/seed.txt`. Mudou o seed? Incremente a versão; nova
+# conversão de arranque? Acrescente o nome: a próxima subida roda `ensure_seed` de novo.
+SEED_VERSION = 1
+STARTUP_MIGRATIONS = ("admin_sector_to_rh",)
+
 
 class RoomFlowService:
     def __init__(self, db: FileDB, config):
         self.db = db
         self.cfg = config
         self.db.ensure_dirs()
+        self.block_index = BlockIndex(db, self._block_from_dict, BLOCK_ACTIVE)
+        self.metrics = MetricsStore(db)
+        self.summaries = UserSummaryStore(db)
+        self.reservation_locks = ReservationLocks(db)
+        self.outbox = Outbox(db)
+        self._outbox_stop = None
+        self.user_versions = UserVersionTable(db)
+        self.generations = GenerationStore(db)
+        self.occupancy_cache = TokenCache(getattr(config, "OCCUPANCY_CACHE_ENTRIES", 1024))
+        self.events = EventBus(db, poll_interval=getattr(config, "EVENTS_POLL_SECONDS", 0.5))
+        self.repo = None
+        self.changes = None
+        if getattr(config, "MEMORY_REPOSITORY", False):
+            if getattr(config, "CHANGE_FEED", False):
+                db.record_changes = True
+                self.changes = ChangeFeed(
+                    db,
+                    poll_interval=getattr(config, "CHANGE_FEED_POLL_SECONDS", 0.5),
+                    use_inotify=getattr(config, "CHANGE_FEED_INOTIFY", True),
+                )
+            self.repo = MemoryRepository(
+                db.data_dir,
+                db.read_json,
+                {"user": self._user_from_dict, "room": self._room_from_dict, "booking": self._booking_from_dict, "request": self._request_from_dict},
+                self.today_iso,
+                feed=self.changes,
+            )
+        self.kiosk = KioskBoard(self.events, self._build_kiosk_board, max_age=getattr(config, "KIOSK_REFRESH_SECONDS", 15))
+        self.passwords = PasswordPool(
+            workers=getattr(config, "PASSWORD_POOL_WORKERS", 0),
+            max_pending=getattr(config, "PASSWORD_POOL_MAX_PENDING", 16),
+            timeout=getattr(config, "PASSWORD_POOL_TIMEOUT_SECONDS", 10.0),
+        )
+        self.refresh_schema_state()
+
+    def refresh_schema_state(self):
+        # Com o schema em dia, os registros já estão no formato atual: leitura sem conversão.
+        self.schema_current = read_schema_version(self.db) >= SCHEMA_VERSION
+
+    def migrate_schema(self, workers: int = 0):
+        report = migrate_data_tree(self.db, checkin_grace_minutes=int(self.get_runtime_config()["checkin_grace_minutes"]), workers=workers)
+        self.block_index.invalidate()
+        self.refresh_schema_state()
+        self.generations.bump("catalog")
+        self._audit("system", "system", "SCHEMA_MIGRATED", "SCHEMA", str(report["version"]), report)
+        return report
 
     def now(self):
         return datetime.now()
@@ -88,11 +158,43 @@ class RoomFlowService:
             "checkin_grace_minutes": getattr(self.cfg, "CHECKIN_GRACE_MINUTES", 15),
             "user_cancel_limit_minutes": getattr(self.cfg, "USER_CANCEL_LIMIT_MINUTES", 30),
         }
-        cfg_path = self._meta_file("config")
-        saved = self.db.read_json(cfg_path, {})
+        if self.repo:
+            saved = self.repo.meta.get("config") or {}
+        else:
+            saved = self.db.read_json(self._meta_file("config"), {})
         merged = {**default, **saved}
         return merged
 
+    @staticmethod
+    def _user_scope(user_id: str) -> str:
+        return f"user_{user_id}"
+
+    @staticmethod
+    def _user_data_events(user_ids) -> list[tuple]:
+        return [(f"user:{user_id}", "user-data", {}) for user_id in user_ids]
+
+    @staticmethod
+    def _room_day_events(keys) -> list[tuple]:
+        # `keys`: (date_iso, room_id); data nula = todos os dias da sala (bloqueios).
+        return [(f"room:{room_id}", "room-day", {"room_id": room_id, "date": date_iso}) for date_iso, room_id in keys]
+
+    def _publish_unread(self, user_ids):
+        self.events.publish([(f"user:{user_id}", "unread", {"unread": self.unread_notification_count(user_id)}) for user_id in user_ids])
+
+    def data_generation(self, scopes: tuple = (), user_id: Optional[str] = None, room_day: Optional[tuple] = None) -> list[str]:
+        # Tokens baratos (arquivos pequenos ou hash de um único arquivo) que mudam junto com os dados.
+        # Toda página depende do catálogo e da configuração de expediente.
+        tokens = self.generations.tokens("catalog", *scopes)
+        tokens.append(self.db.content_token(self._meta_file("config")) or "0")
+        if user_id:
+            tokens.append(self.generations.token(self._user_scope(user_id)))
+        if room_day:
+            room_id, date_iso = room_day
+            tokens.append(f"{room_id}@{date_iso}")
+            for path in (self._bookings_file(date_iso, room_id), self._blocks_file(room_id), self._rooms_dir() / f"{room_id}.txt"):
+                tokens.append(self.db.content_token(path) or "0")
+        return tokens
+
     def _next_id(self, key: str, prefix: str) -> str:
         path = self._meta_file("counters")
         with self.db.file_lock(path):
@@ -106,23 +208,117 @@ class RoomFlowService:
             self.db.write_json_atomic(path, counters, use_lock=False)
             return f"{prefix}_{counters[key]:04d}"
 
-    def _audit(self, actor_user_id: str, actor_username: str, action: str, target_type: str, target_id: str, details: dict):
-        ts = self.now_iso()
-        ym = ts[:7]
-        path = self._logs_file(ym)
-        event = AuditEvent(
-            id=self._next_id("audit", "aud"),
-            actor_user_id=actor_user_id,
-            actor_username=actor_username,
-            action=action,
-            target_type=target_type,
-            target_id=target_id,
-            details=details,
-            created_at=ts,
+    def _next_ids(self, key: str, prefix: str, count: int) -> list[str]:
+        # Reserva `count` IDs consecutivos com uma única escrita do arquivo de contadores.
+        if count <= 0:
+            return []
+        path = self._meta_file("counters")
+        with self.db.file_lock(path):
+            counters = self.db.read_json(
+                path,
+                {"users": 0, "bookings": 0, "requests": 0, "audit": 0, "notifications": 0, "blocks": 0},
+            )
+            first = int(counters.get(key, 0)) + 1
+            counters[key] = first + count - 1
+            self.db.write_json_atomic(path, counters, use_lock=False)
+            return [f"{prefix}_{n:04d}" for n in range(first, first + count)]
+
+    def init_process(self, outbox_interval: Optional[float] = None):
+        # Estado deste processo: após o fork, caches herdados do pai ficam vazios e a
+        # thread do outbox (que não sobrevive ao fork) é iniciada de novo.
+        self.occupancy_cache.clear()
+        self.block_index.invalidate()
+        self._outbox_stop = None
+        if outbox_interval:
+            self.start_outbox_worker(outbox_interval)
+
+    def start_outbox_worker(self, interval: float = 1.0):
+        if self._outbox_stop is None:
+            self._outbox_stop = self.outbox.start_worker(self._apply_outbox_events, interval)
+
+    def stop_outbox_worker(self):
+        if self._outbox_stop is not None:
+            self._outbox_stop.set()
+            self._outbox_stop = None
+        self.drain_outbox()
+
+    def drain_outbox(self) -> int:
+        return self.outbox.drain(self._apply_outbox_events)
+
+    def _emit(self, records: list[tuple[str, dict]]):
+        self.outbox.enqueue(records)
+        if self._outbox_stop is None:
+            # Sem worker (scripts, CLI): aplica na hora.
+            try:
+                self.drain_outbox()
+            except TimeoutError:
+                # Outro processo está drenando; o evento já está durável na fila.
+                pass
+            except Exception:
+                # O dado da mutação já foi gravado; o evento fica na fila para a próxima drenagem.
+                log.exception("falha ao aplicar eventos do outbox")
+
+    def _audit_record(self, actor_user_id: str, actor_username: str, action: str, target_type: str, target_id: str, details: dict):
+        return (
+            "audit",
+            {
+                "actor_user_id": actor_user_id,
+                "actor_username": actor_username,
+                "action": action,
+                "target_type": target_type,
+                "target_id": target_id,
+                "details": details,
+                "created_at": self.now_iso(),
+            },
         )
-        data = self.db.read_json(path, {"month": ym, "items": []})
-        data["items"].append(event.to_dict())
-        self.db.write_json_atomic(path, data)
+
+    def _audit(self, actor_user_id: str, actor_username: str, action: str, target_type: str, target_id: str, details: dict):
+        self._emit([self._audit_record(actor_user_id, actor_username, action, target_type, target_id, details)])
+
+    def _audit_many(self, actor_user_id: str, actor_username: str, entries: list[tuple]):
+        # `entries`: (action, target_type, target_id, details); um único append na fila.
+        if entries:
+            self._emit([self._audit_record(actor_user_id, actor_username, *entry) for entry in entries])
+
+    def _apply_outbox_events(self, events: list[dict]):
+        # Idempotente por `event_id`: reaplicar um lote (entrega pelo menos uma vez) não duplica nada.
+        notifications = {}
+        audits = {}
+        for ev in events:
+            payload = ev["payload"]
+            if ev["kind"] == "notification":
+                notifications.setdefault(payload["user_id"], []).append((ev["event_id"], payload))
+            elif ev["kind"] == "audit":
+                audits.setdefault(payload["created_at"][:7], []).append((ev["event_id"], payload))
+        for user_id, batch in notifications.items():
+            added = self._append_once(
+                self._notif_file(user_id),
+                {"user_id": user_id, "items": []},
+                [Notification(id=nid, event_id=event_id, **payload) for nid, (event_id, payload) in zip(self._next_ids("notifications", "n", len(batch)), batch)],
+            )
+            self._summary_add_notifications(user_id, added)
+            if added:
+                self.generations.bump(self._user_scope(user_id))
+                self._publish_unread([user_id])
+        for ym, batch in audits.items():
+            self._append_once(
+                self._logs_file(ym),
+                {"month": ym, "items": []},
+                [AuditEvent(id=aid, event_id=event_id, **payload) for aid, (event_id, payload) in zip(self._next_ids("audit", "aud", len(batch)), batch)],
+            )
+
+    def _append_once(self, path: Path, default: dict, records: list) -> list[dict]:
+        added = []
+
+        def mutate(data):
+            added.clear()
+            seen = {x.get("event_id") for x in data.get("items", []) if x.get("event_id")}
+            added.extend(r.to_dict() for r in records if r.event_id not in seen)
+            data.setdefault("items", []).extend(added)
+            return bool(added)
+
+        self.db.update_json(path, default, mutate)
+        return added
 
     def list_audit_events(self, ym: str, action: str = ""):
         events = self.db.read_json(self._logs_file(ym), {"month": ym, "items": []}).get("items", [])
@@ -130,6 +326,22 @@ class RoomFlowService:
             events = [x for x in events if x.get("action") == action]
         return sorted(events, key=lambda x: x.get("created_at", ""), reverse=True)
 
+    def seed_current(self) -> bool:
+        state = self.db.read_json(self._meta_file("seed"), {})
+        return int(state.get("version", 0)) >= SEED_VERSION and set(STARTUP_MIGRATIONS) <= set(state.get("migrations", []))
+
+    def run_startup(self, lock_timeout: float = 60):
+        # Marcador em dia: nenhuma varredura, só a leitura de `_meta/seed.txt`.
+        if self.seed_current():
+            return False
+        # Um processo por vez: os demais workers esperam o lock e encontram a base pronta.
+        db = FileDB(self.db.data_dir, lock_timeout=lock_timeout, lock_stale=lock_timeout, record_changes=self.db.record_changes)
+        with db.file_lock(self._meta_file("startup")):
+            if self.seed_current():
+                return False
+            self.ensure_seed()
+        return True
+
     def ensure_seed(self):
         counters_path = self._meta_file("counters")
         if not counters_path.exists():
@@ -137,6 +349,9 @@ class RoomFlowService:
                 counters_path,
                 {"users": 0, "bookings": 0, "requests": 0, "audit": 0, "notifications": 0, "blocks": 0},
             )
+            # Base nova: nada legado a converter, já nasce no schema atual.
+            stamp_schema_version(self.db)
+            self.refresh_schema_state()
 
         cfg_path = self._meta_file("config")
         if not cfg_path.exists():
@@ -156,6 +371,7 @@ class RoomFlowService:
             sfile = self._sectors_dir() / f"{sector}.txt"
             if not sfile.exists():
                 self.db.write_json_atomic(sfile, {"name": sector})
+                self.generations.bump("catalog")
 
         self._migrate_admin_sector_to_rh()
 
@@ -169,6 +385,7 @@ class RoomFlowService:
             rfile = self._rooms_dir() / f"{room.id}.txt"
             if not rfile.exists():
                 self.db.write_json_atomic(rfile, room.to_dict())
+                self.generations.bump("catalog")
 
         if not self.find_user_by_username("admin"):
             self.create_user("admin", "RH", ROLE_ADMIN, "admin123", actor_username="system", actor_id="system")
@@ -178,6 +395,11 @@ class RoomFlowService:
             self.create_user("ti1", "TI", ROLE_USER, "ti123", actor_username="system", actor_id="system")
             self._seed_demo_data()
 
+        self.db.write_json_atomic(
+            self._meta_file("seed"),
+            {"version": SEED_VERSION, "migrations": list(STARTUP_MIGRATIONS), "seeded_at": self.now_iso()},
+        )
+
     def _seed_demo_data(self):
         users = {u.username: u for u in self.list_users()}
         today = self.today_iso()
@@ -206,7 +428,7 @@ class RoomFlowService:
             end="13:00",
             reason="Almoço",
             actor=users["rh"],
-            weekdays=[datetime.strptime(today, "%Y-%m-%d").isoweekday()],
+            weekdays=[parse_date_iso(today).isoweekday()],
             audit=False,
         )
 
@@ -217,10 +439,14 @@ class RoomFlowService:
             end="10:30",
             reason="Solicitação com conflito (demo)",
             user=users["eng1"],
+            # O conflito é proposital: o semáforo vermelho não barra a solicitação de demonstração.
+            semaphore=self.get_semaphore("room_1", today, "09:30", "10:30"),
         )
         self._save_request(req)
 
     def list_sectors(self):
+        if self.repo:
+            return [name for name in self.repo.sectors.values() if name != "ADMIN"]
         out = []
         for p in sorted(self._sectors_dir().glob("*.txt")):
             data = self.db.read_json(p, {})
@@ -248,13 +474,14 @@ class RoomFlowService:
             raise ValueError("Setor já existe")
         sfile = self._sectors_dir() / f"{name}.txt"
         self.db.write_json_atomic(sfile, {"name": name, "created_at": self.now_iso()})
+        self.generations.bump("catalog")
         self._audit(actor.id, actor.username, "SECTOR_CREATED", "SECTOR", name, {})
         return name
 
     def _migrate_admin_sector_to_rh(self):
         admin_sector_file = self._sectors_dir() / "ADMIN.txt"
         if admin_sector_file.exists():
-            admin_sector_file.unlink()
+            self.db.remove(admin_sector_file)
 
         changed = []
         for user in self.list_users():
@@ -262,62 +489,129 @@ class RoomFlowService:
                 user.sector = "RH"
                 user.updated_at = self.now_iso()
                 self.db.write_json_atomic(self._users_dir() / f"{user.id}.txt", user.to_dict())
+                self.user_versions.bump(user.id)
                 changed.append(user.id)
 
         if changed:
+            self.generations.bump("catalog")
             self._audit("system", "system", "SECTOR_MIGRATION", "SECTOR", "ADMIN", {"migrated_users": changed, "to": "RH"})
 
     def list_users_by_sector(self, sector: str):
         name = self.normalize_sector_name(sector)
         return [u for u in self.list_users() if u.sector == name]
 
+    @staticmethod
+    def _room_from_dict(data: dict) -> Optional[Room]:
+        if not data:
+            return None
+        data.setdefault("capacity", 0)
+        data.setdefault("created_at", "")
+        return Room(**data)
+
+    @staticmethod
+    def _user_from_dict(data: dict) -> Optional[User]:
+        if not data:
+            return None
+        data.setdefault("created_at", "")
+        data.setdefault("updated_at", "")
+        return User(**data)
+
     def list_rooms(self):
+        if self.repo:
+            return [copy.copy(r) for r in self.repo.rooms.values()]
         rooms = []
         for p in sorted(self._rooms_dir().glob("room_*.txt")):
-            data = self.db.read_json(p, {})
-            if data:
-                data.setdefault("capacity", 0)
-                data.setdefault("created_at", "")
-                rooms.append(Room(**data))
+            room = self._room_from_dict(self.db.read_json(p, {}))
+            if room:
+                rooms.append(room)
         return rooms
 
     def get_room(self, room_id: str) -> Optional[Room]:
-        data = self.db.read_json(self._rooms_dir() / f"{room_id}.txt", None)
-        if not data:
-            return None
-        data.setdefault("capacity", 0)
-        data.setdefault("created_at", "")
-        return Room(**data)
+        if self.repo:
+            room = self.repo.rooms.get(room_id)
+            return copy.copy(room) if room else None
+        return self._room_from_dict(self.db.read_json(self._rooms_dir() / f"{room_id}.txt", None))
 
     def list_users(self):
+        if self.repo:
+            return [copy.copy(u) for u in self.repo.users.values()]
         users = []
         for p in sorted(self._users_dir().glob("u_*.txt")):
-            data = self.db.read_json(p, {})
-            if data:
-                data.setdefault("created_at", "")
-                data.setdefault("updated_at", "")
-                users.append(User(**data))
+            user = self._user_from_dict(self.db.read_json(p, {}))
+            if user:
+                users.append(user)
         return users
 
     def get_user(self, user_id: str) -> Optional[User]:
-        data = self.db.read_json(self._users_dir() / f"{user_id}.txt", None)
-        if not data:
+        if self.repo:
+            user = self.repo.users.get(user_id)
+            return copy.copy(user) if user else None
+        return self._user_from_dict(self.db.read_json(self._users_dir() / f"{user_id}.txt", None))
+
+    def user_snapshot(self, user: User) -> dict:
+        return {
+            "id": user.id,
+            "username": user.username,
+            "role": user.role,
+            "sector": user.sector,
+            "is_active": user.is_active,
+            "must_change_password": user.must_change_password,
+            "version": self.user_versions.get(user.id),
+        }
+
+    def user_from_snapshot(self, snapshot: dict) -> Optional[User]:
+        # Snapshot válido só enquanto a versão do usuário não mudou; sem hash de senha.
+        if snapshot.get("version") != self.user_versions.get(snapshot.get("id", "")):
             return None
-        data.setdefault("created_at", "")
-        data.setdefault("updated_at", "")
-        return User(**data)
+        return User(
+            id=snapshot["id"],
+            username=snapshot["username"],
+            role=snapshot["role"],
+            sector=snapshot["sector"],
+            password={},
+            must_change_password=snapshot.get("must_change_password", False),
+            is_active=snapshot.get("is_active", True),
+        )
 
     def find_user_by_username(self, username: str) -> Optional[User]:
+        if self.repo:
+            found = self.repo.users.find(username)
+            if found and found[1].username == username:
+                return copy.copy(found[1])
         for user in self.list_users():
             if user.username == username:
                 return user
         return None
 
+    def _password_params(self) -> dict:
+        return {
+            "algorithm": getattr(self.cfg, "PASSWORD_ALGORITHM", "sha256"),
+            "iterations": getattr(self.cfg, "PASSWORD_ITERATIONS", 220_000),
+            "salt_bytes": getattr(self.cfg, "PASSWORD_SALT_BYTES", 16),
+        }
+
+    def _hash_password(self, raw_password: str) -> dict:
+        return self.passwords.run(hash_password, raw_password, **self._password_params())
+
+    def _verify_password(self, raw_password: str, stored: dict) -> bool:
+        return self.passwords.run(verify_password, raw_password, stored)
+
     def authenticate(self, username: str, password: str) -> Optional[User]:
         user = self.find_user_by_username(username)
         if not user or not user.is_active:
             return None
-        return user if verify_password(password, user.password) else None
+        if not self._verify_password(password, user.password):
+            return None
+        if needs_rehash(user.password, **self._password_params()):
+            # Parâmetros do Config mudaram (ex.: após calibrar): regrava o hash com a senha já validada.
+            try:
+                user.password = self._hash_password(password)
+            except PasswordBusy:
+                return user
+            user.updated_at = self.now_iso()
+            self.db.write_json_atomic(self._users_dir() / f"{user.id}.txt", user.to_dict())
+            self._audit(user.id, user.username, "PASSWORD_REHASHED", "USER", user.id, {"iterations": user.password["iterations"]})
+        return user
 
     def create_user(self, username: str, sector: str, role: str, raw_password: str, actor_username: str, actor_id: str):
         if self.find_user_by_username(username):
@@ -332,12 +626,7 @@ class RoomFlowService:
             username=username,
             role=role,
             sector=sector_name,
-            password=hash_password(
-                raw_password,
-                algorithm=getattr(self.cfg, "PASSWORD_ALGORITHM", "sha256"),
-                iterations=getattr(self.cfg, "PASSWORD_ITERATIONS", 220_000),
-                salt_bytes=getattr(self.cfg, "PASSWORD_SALT_BYTES", 16),
-            ),
+            password=self._hash_password(raw_password),
             must_change_password=True,
             created_at=now,
             updated_at=now,
@@ -357,21 +646,18 @@ class RoomFlowService:
         user.sector = sector_name
         user.updated_at = self.now_iso()
         self.db.write_json_atomic(self._users_dir() / f"{user.id}.txt", user.to_dict())
+        self.user_versions.bump(user.id)
         self._audit(actor_id, actor_username, "USER_UPDATED", "USER", user.id, {"role": role, "sector": sector_name})
 
     def reset_user_password(self, user_id: str, new_password: str, actor_id: str, actor_username: str):
         user = self.get_user(user_id)
         if not user:
             raise ValueError("Usuário não encontrado")
-        user.password = hash_password(
-            new_password,
-            algorithm=getattr(self.cfg, "PASSWORD_ALGORITHM", "sha256"),
-            iterations=getattr(self.cfg, "PASSWORD_ITERATIONS", 220_000),
-            salt_bytes=getattr(self.cfg, "PASSWORD_SALT_BYTES", 16),
-        )
+        user.password = self._hash_password(new_password)
         user.must_change_password = True
         user.updated_at = self.now_iso()
         self.db.write_json_atomic(self._users_dir() / f"{user.id}.txt", user.to_dict())
+        self.user_versions.bump(user.id)
         self._audit(actor_id, actor_username, "PASSWORD_RESET", "USER", user.id, {})
 
     def delete_user(self, user_id: str, actor: User):
@@ -380,85 +666,95 @@ class RoomFlowService:
             raise ValueError("Usuário não encontrado")
         if user.id == actor.id:
             raise ValueError("Você não pode excluir o próprio usuário")
-        user_file = self._users_dir() / f"{user.id}.txt"
-        if user_file.exists():
-            user_file.unlink()
+        self.db.remove(self._users_dir() / f"{user.id}.txt")
+        self.user_versions.bump(user.id)
+        self.summaries.delete(user.id)
         self._audit(actor.id, actor.username, "USER_DELETED", "USER", user.id, {"username": user.username, "sector": user.sector, "role": user.role})
 
     def change_own_password(self, user: User, current_password: str, new_password: str):
-        if not verify_password(current_password, user.password):
+        # `user` pode vir do snapshot da sessão (sem hash): a verificação usa o registro em disco.
+        stored = self.get_user(user.id)
+        if not stored:
+            raise ValueError("Usuário não encontrado")
+        if not self._verify_password(current_password, stored.password):
             raise ValueError("Senha atual inválida")
-        user.password = hash_password(
-            new_password,
-            algorithm=getattr(self.cfg, "PASSWORD_ALGORITHM", "sha256"),
-            iterations=getattr(self.cfg, "PASSWORD_ITERATIONS", 220_000),
-            salt_bytes=getattr(self.cfg, "PASSWORD_SALT_BYTES", 16),
-        )
+        stored.password = self._hash_password(new_password)
+        stored.must_change_password = False
+        stored.updated_at = self.now_iso()
+        self.db.write_json_atomic(self._users_dir() / f"{stored.id}.txt", stored.to_dict())
+        self.user_versions.bump(stored.id)
         user.must_change_password = False
-        user.updated_at = self.now_iso()
-        self.db.write_json_atomic(self._users_dir() / f"{user.id}.txt", user.to_dict())
-        self._audit(user.id, user.username, "PASSWORD_CHANGED", "USER", user.id, {})
+        self._audit(stored.id, stored.username, "PASSWORD_CHANGED", "USER", stored.id, {})
 
     def _request_from_dict(self, item: dict) -> BookingRequest:
-        if "requested_by" not in item:
-            item = {
-                "id": item.get("id", ""),
-                "requested_by": item.get("user_id", ""),
-                "username": item.get("username", ""),
-                "sector": item.get("sector", ""),
-                "room_id": item.get("room_id", ""),
-                "date": item.get("date", ""),
-                "start": item.get("start", item.get("start_time", "")),
-                "end": item.get("end", item.get("end_time", "")),
-                "reason": item.get("reason", ""),
-                "status": "NEGADA" if item.get("status") == "RECUSADA" else item.get("status", REQ_PENDING),
-                "created_at": item.get("created_at", ""),
-                "decided_at": item.get("decided_at"),
-                "decided_by": item.get("decided_by"),
-                "decision_reason": item.get("decision_reason", ""),
-                "has_conflict": item.get("has_conflict", item.get("is_conflicting_on_create", False)),
-                "conflict_summary": item.get("conflict_summary", ""),
-                "recurrence_group_id": item.get("recurrence_group_id", item.get("recurring_group")),
-            }
-        return BookingRequest(**item)
+        if self.schema_current:
+            try:
+                return BookingRequest(**item)
+            except TypeError:
+                pass
+        return BookingRequest.from_dict(item)
 
     def _booking_from_dict(self, item: dict) -> Booking:
-        if "created_by" not in item:
-            item = {
-                "id": item.get("id", ""),
-                "room_id": item.get("room_id", ""),
-                "date": item.get("date", ""),
-                "start": item.get("start", item.get("start_time", "")),
-                "end": item.get("end", item.get("end_time", "")),
-                "sector": item.get("sector", ""),
-                "created_by": item.get("created_by", item.get("user_id", "")),
-                "created_by_username": item.get("created_by_username", item.get("username", "")),
-                "approved_by": item.get("approved_by", ""),
-                "status": item.get("status", BOOK_ACTIVE),
-                "request_id": item.get("request_id"),
-                "is_emergency": item.get("is_emergency", False),
-                "emergency_reason": item.get("emergency_reason", ""),
-                "requires_checkin": item.get("requires_checkin", True),
-                "checkin_deadline_minutes": item.get("checkin_deadline_minutes", self.get_runtime_config()["checkin_grace_minutes"]),
-                "checked_in_at": item.get("checked_in_at", item.get("checkin_confirmed_at")),
-                "recurrence_group_id": item.get("recurrence_group_id"),
-                "cancel_reason": item.get("cancel_reason", ""),
-                "cancelled_by": item.get("cancelled_by", ""),
-                "created_at": item.get("created_at", ""),
-                "updated_at": item.get("updated_at", ""),
-            }
-        return Booking(**item)
+        if self.schema_current:
+            try:
+                return Booking(**item)
+            except TypeError:
+                pass
+        if "created_by" in item:
+            return Booking.from_dict(item)
+        return Booking.from_dict(item, checkin_grace_minutes=self.get_runtime_config()["checkin_grace_minutes"])
+
+    def _upsert_items(self, path: Path, default: dict, records: list, from_dict, metric_keys) -> list[tuple]:
+        # Troca/insere os registros via compare-and-swap; devolve as chaves de métrica
+        # das versões anteriores (recalculadas a cada nova tentativa).
+        ids = {r.id for r in records}
+        new_items = [r.to_dict() for r in records]
+        old_keys = []
+
+        def mutate(data):
+            old_keys.clear()
+            items = []
+            for x in data.get("items", []):
+                if x.get("id") in ids:
+                    old_keys.extend(metric_keys(from_dict(x)))
+                else:
+                    items.append(x)
+            data["items"] = items + new_items
+
+        self.db.update_json(path, default, mutate)
+        return old_keys
 
     def _save_request(self, req: BookingRequest):
-        ym = req.date[:7]
-        path = self._requests_file(ym)
-        data = self.db.read_json(path, {"month": ym, "items": []})
-        items = [x for x in data["items"] if x.get("id") != req.id]
-        items.append(req.to_dict())
-        data["items"] = items
-        self.db.write_json_atomic(path, data)
+        self._save_requests([req])
+
+    def _save_requests(self, reqs: list[BookingRequest]):
+        # Um read-modify-write por arquivo mensal, qualquer que seja o tamanho do lote.
+        by_month = {}
+        by_user = {}
+        for req in reqs:
+            by_month.setdefault(req.date[:7], []).append(req)
+            by_user.setdefault(req.requested_by, []).append(req)
+        old_keys = []
+        new_keys = []
+        for ym, batch in by_month.items():
+            old_keys += self._upsert_items(self._requests_file(ym), {"month": ym, "items": []}, batch, self._request_from_dict, self._request_metric_keys)
+            for req in batch:
+                new_keys.extend(self._request_metric_keys(req))
+        self.metrics.apply(diff_keys(old_keys, new_keys))
+        for user_id, batch in by_user.items():
+            self._summary_put_requests(user_id, batch)
+        self.generations.bump("requests", *map(self._user_scope, by_user))
+        self.events.publish(self._user_data_events(by_user))
+
+    def _requests_in(self, path: Path) -> list[BookingRequest]:
+        if self.repo:
+            return [copy.copy(r) for r in self.repo.requests.get(path.stem) or ()]
+        return [self._request_from_dict(raw) for raw in self.db.read_json(path, {"items": []}).get("items", [])]
 
     def _load_request(self, request_id: str) -> Optional[BookingRequest]:
+        if self.repo:
+            found = self.repo.requests.find(request_id)
+            return next((copy.copy(r) for r in found[1] if r.id == request_id), None) if found else None
         for path in sorted((self.db.data_dir / "requests").glob("*.txt")):
             data = self.db.read_json(path, {"items": []})
             for item in data.get("items", []):
@@ -466,41 +762,101 @@ class RoomFlowService:
                     return self._request_from_dict(item)
         return None
 
-    def list_requests(self, filters: Optional[dict] = None):
+    def _request_matches(self, req: BookingRequest, filters: dict) -> bool:
+        if filters.get("status") and req.status != filters["status"]:
+            return False
+        if filters.get("room_id") and req.room_id != filters["room_id"]:
+            return False
+        if filters.get("sector") and req.sector != filters["sector"]:
+            return False
+        if filters.get("date") and req.date != filters["date"]:
+            return False
+        if "has_conflict" in filters and filters["has_conflict"] is not None and req.has_conflict != filters["has_conflict"]:
+            return False
+        if filters.get("requested_by") and req.requested_by != filters["requested_by"]:
+            return False
+        if filters.get("recurrence_group_id") and req.recurrence_group_id != filters["recurrence_group_id"]:
+            return False
+        return True
+
+    def _request_partitions(self, filters: dict):
+        month = filters.get("month") or (filters["date"][:7] if filters.get("date") else None)
+        if month:
+            return [self._requests_file(month)]
+        return sorted((self.db.data_dir / "requests").glob("*.txt"))
+
+    def iter_requests(self, filters: Optional[dict] = None):
+        # Partições mensais em ordem: cada mês é ordenado isoladamente e entregue
+        # em seguida, então quem consome só os primeiros itens não lê o resto.
         filters = filters or {}
-        out = []
-        month = filters.get("month")
-        files = [self._requests_file(month)] if month else sorted((self.db.data_dir / "requests").glob("*.txt"))
-        for path in files:
-            data = self.db.read_json(path, {"items": []})
-            for raw in data.get("items", []):
-                req = self._request_from_dict(raw)
-                if filters.get("status") and req.status != filters["status"]:
-                    continue
-                if filters.get("room_id") and req.room_id != filters["room_id"]:
-                    continue
-                if filters.get("sector") and req.sector != filters["sector"]:
-                    continue
-                if filters.get("date") and req.date != filters["date"]:
-                    continue
-                if "has_conflict" in filters and filters["has_conflict"] is not None and req.has_conflict != filters["has_conflict"]:
-                    continue
-                if filters.get("requested_by") and req.requested_by != filters["requested_by"]:
-                    continue
-                out.append(req)
-        out.sort(key=lambda x: (x.date, x.start))
-        return out
+        for path in self._request_partitions(filters):
+            batch = [req for req in self._requests_in(path) if self._request_matches(req, filters)]
+            batch.sort(key=lambda x: (x.date_ord, x.start_min))
+            yield from batch
+
+    def count_requests(self, filters: Optional[dict] = None) -> int:
+        filters = filters or {}
+        total = 0
+        for path in self._request_partitions(filters):
+            for req in self._requests_in(path):
+                if self._request_matches(req, filters):
+                    total += 1
+        return total
+
+    def list_requests(self, filters: Optional[dict] = None):
+        return list(self.iter_requests(filters))
 
     def _load_bookings_file(self, ds_iso: str, room_id: str):
         return self.db.read_json(self._bookings_file(ds_iso, room_id), {"date": ds_iso, "room_id": room_id, "items": []})
 
+    def _bookings_in(self, path: Path) -> list[Booking]:
+        if self.repo:
+            return [copy.copy(b) for b in self.repo.bookings.get(path.stem) or ()]
+        return [self._booking_from_dict(raw) for raw in self.db.read_json(path, {"items": []}).get("items", [])]
+
+    def _day_bookings(self, ds_iso: str, room_id: str) -> list[Booking]:
+        return self._bookings_in(self._bookings_file(ds_iso, room_id))
+
+    def _day_bookings_on_disk(self, ds_iso: str, room_id: str) -> list[Booking]:
+        # Verificação de conflito sob `reservation_locks`: sempre o arquivo, nunca o repositório.
+        return [self._booking_from_dict(raw) for raw in self._load_bookings_file(ds_iso, room_id).get("items", [])]
+
     def _save_booking(self, booking: Booking):
-        data = self._load_bookings_file(booking.date, booking.room_id)
-        data["items"] = [x for x in data["items"] if x.get("id") != booking.id]
-        data["items"].append(booking.to_dict())
-        self.db.write_json_atomic(self._bookings_file(booking.date, booking.room_id), data)
+        self._save_bookings([booking])
+
+    def _save_bookings(self, bookings: list[Booking]):
+        # Um read-modify-write por arquivo dia+sala, qualquer que seja o tamanho do lote.
+        by_file = {}
+        by_user = {}
+        for booking in bookings:
+            by_file.setdefault((booking.date, booking.room_id), []).append(booking)
+            by_user.setdefault(booking.created_by, []).append(booking)
+        old_keys = []
+        new_keys = []
+        for (date_iso, room_id), batch in by_file.items():
+            default = {"date": date_iso, "room_id": room_id, "items": []}
+            old_keys += self._upsert_items(self._bookings_file(date_iso, room_id), default, batch, self._booking_from_dict, self._booking_metric_keys)
+            for booking in batch:
+                new_keys.extend(self._booking_metric_keys(booking))
+        self.metrics.apply(diff_keys(old_keys, new_keys))
+        for user_id, batch in by_user.items():
+            self._summary_put_bookings(user_id, batch)
+        self.generations.bump("bookings", *map(self._user_scope, by_user))
+        self.events.publish(self._room_day_events(by_file) + self._user_data_events(by_user))
+
+    def find_booking(self, booking_id: str, room_id: str = "", date_iso: str = "") -> Optional[Booking]:
+        # Com sala e dia conhecidos, lê só o arquivo dia+sala; sem eles, varre todos.
+        if not (room_id and date_iso):
+            return self.get_booking(booking_id)
+        parse_date_iso(date_iso)
+        if not room_id.startswith("room_") or "/" in room_id or "\\" in room_id or ".." in room_id:
+            return None
+        return next((b for b in self._day_bookings(date_iso, room_id) if b.id == booking_id), None)
 
     def get_booking(self, booking_id: str) -> Optional[Booking]:
+        if self.repo:
+            found = self.repo.bookings.find(booking_id)
+            return next((copy.copy(b) for b in found[1] if b.id == booking_id), None) if found else None
         for path in sorted((self.db.data_dir / "bookings").glob("*.txt")):
             data = self.db.read_json(path, {"items": []})
             for raw in data.get("items", []):
@@ -508,93 +864,90 @@ class RoomFlowService:
                     return self._booking_from_dict(raw)
         return None
 
-    def list_bookings(self, filters: Optional[dict] = None):
-        self.expire_due_checkins()
-        filters = filters or {}
+    def _booking_partitions(self, filters: dict):
         out = []
-        for path in sorted((self.db.data_dir / "bookings").glob("*.txt")):
-            name = path.stem
-            if "_room_" not in name:
+        for path in (self.db.data_dir / "bookings").glob("*.txt"):
+            fdate, sep, froom = path.stem.partition("_")
+            if not sep or not froom.startswith("room_"):
                 continue
-            fdate = name.split("_room_")[0]
             if filters.get("date") and filters["date"] != fdate:
                 continue
             if filters.get("month") and not fdate.startswith(filters["month"]):
                 continue
-            if filters.get("room_id") and not name.endswith(filters["room_id"]):
+            if filters.get("room_id") and froom != filters["room_id"]:
                 continue
-
-            data = self.db.read_json(path, {"items": []})
-            for raw in data.get("items", []):
-                booking = self._booking_from_dict(raw)
-                if filters.get("created_by") and booking.created_by != filters["created_by"]:
-                    continue
-                if filters.get("status") and booking.status != filters["status"]:
-                    continue
-                if filters.get("sector") and booking.sector != filters["sector"]:
-                    continue
-                if "is_emergency" in filters and filters["is_emergency"] is not None and booking.is_emergency != filters["is_emergency"]:
-                    continue
-                if filters.get("date_from") and booking.date < filters["date_from"]:
-                    continue
-                if filters.get("date_to") and booking.date > filters["date_to"]:
-                    continue
-                if filters.get("search") and filters["search"].lower() not in (booking.cancel_reason or "").lower() and filters["search"].lower() not in (booking.emergency_reason or "").lower():
-                    continue
-                out.append(booking)
-        out.sort(key=lambda x: (x.date, x.start))
+            if filters.get("date_from") and fdate < filters["date_from"]:
+                continue
+            if filters.get("date_to") and fdate > filters["date_to"]:
+                continue
+            out.append((fdate, path.name, path))
+        out.sort()
         return out
 
+    def _booking_matches(self, booking: Booking, filters: dict) -> bool:
+        if filters.get("created_by") and booking.created_by != filters["created_by"]:
+            return False
+        if filters.get("status") and booking.status != filters["status"]:
+            return False
+        if filters.get("sector") and booking.sector != filters["sector"]:
+            return False
+        if "is_emergency" in filters and filters["is_emergency"] is not None and booking.is_emergency != filters["is_emergency"]:
+            return False
+        if filters.get("search") and filters["search"].lower() not in (booking.cancel_reason or "").lower() and filters["search"].lower() not in (booking.emergency_reason or "").lower():
+            return False
+        return True
+
+    def iter_bookings(self, filters: Optional[dict] = None, expire: bool = True):
+        # Caminha pelas partições dia+sala em ordem de data; as salas de um mesmo
+        # dia são lidas juntas e ordenadas por início antes de serem entregues.
+        if expire:
+            self.expire_due_checkins()
+        filters = filters or {}
+        for _, group in groupby(self._booking_partitions(filters), key=lambda x: x[0]):
+            batch = []
+            for _, _, path in group:
+                for booking in self._bookings_in(path):
+                    if self._booking_matches(booking, filters):
+                        batch.append(booking)
+            batch.sort(key=lambda x: x.start_min)
+            yield from batch
+
+    def count_bookings(self, filters: Optional[dict] = None, expire: bool = True) -> int:
+        if expire:
+            self.expire_due_checkins()
+        filters = filters or {}
+        total = 0
+        for _, _, path in self._booking_partitions(filters):
+            for booking in self._bookings_in(path):
+                if self._booking_matches(booking, filters):
+                    total += 1
+        return total
+
+    def list_bookings(self, filters: Optional[dict] = None):
+        return list(self.iter_bookings(filters))
+
     def _load_blocks_room(self, room_id: str):
         data = self.db.read_json(self._blocks_file(room_id), {"room_id": room_id, "items": []})
         return data
 
     def _block_from_dict(self, raw: dict) -> Block:
-        raw.setdefault("date", None)
-        raw.setdefault("weekday", None)
-        raw.setdefault("start_date", raw.get("date"))
-        raw.setdefault("end_date", raw.get("date"))
-        raw.setdefault("weekdays", [])
-        if raw.get("weekdays") is None:
-            raw["weekdays"] = []
-        if raw.get("weekday") is not None and not raw.get("weekdays"):
-            legacy_weekday = int(raw.get("weekday"))
-            # Compatibilidade: legado podia estar em 0..6; novo padrão usa 1..7.
-            raw["weekdays"] = [legacy_weekday + 1] if 0 <= legacy_weekday <= 6 else [legacy_weekday]
-        raw.setdefault("updated_at", raw.get("created_at", ""))
-        return Block(**raw)
+        # Sempre pela conversão: registro legado tem `weekday` e `weekdays` (vazio) e passaria
+        # pelo construtor sem virar dias da semana. São poucos e ficam no `BlockIndex`.
+        return Block.from_dict(raw)
 
     def list_blocks(self, room_id: Optional[str] = None, date_iso: Optional[str] = None, active_only: bool = True):
         out = []
-        room_ids = [room_id] if room_id else [r.id for r in self.list_rooms()]
-        weekday_iso = datetime.strptime(date_iso, "%Y-%m-%d").isoweekday() if date_iso else None
+        room_ids = [room_id] if room_id else self.block_index.room_ids()
         for rid in room_ids:
-            data = self._load_blocks_room(rid)
-            for raw in data.get("items", []):
-                blk = self._block_from_dict(raw)
-                if active_only and blk.status != BLOCK_ACTIVE:
-                    continue
+            if date_iso and active_only:
+                rules = self.block_index.active_on(rid, date_iso)
+            else:
+                rules = [r for r in self.block_index.rules(rid) if r.active or not active_only]
                 if date_iso:
-                    in_date_range = True
-                    start_date = blk.start_date or blk.date
-                    end_date = blk.end_date or blk.date
-                    if start_date and date_iso < start_date:
-                        in_date_range = False
-                    if end_date and date_iso > end_date:
-                        in_date_range = False
-
-                    allowed_weekdays = blk.weekdays or []
-                    if blk.weekday is not None and not allowed_weekdays:
-                        legacy_weekday = int(blk.weekday)
-                        allowed_weekdays = [legacy_weekday + 1] if 0 <= legacy_weekday <= 6 else [legacy_weekday]
-
-                    weekday_match = True if not allowed_weekdays else (weekday_iso in allowed_weekdays)
-                    legacy_specific_date_match = (blk.date == date_iso) if blk.date else True
-
-                    if not (in_date_range and weekday_match and legacy_specific_date_match):
-                        continue
-                out.append(blk)
-        out.sort(key=lambda x: (x.room_id, x.start))
+                    day = parse_date_iso(date_iso)
+                    rules = [r for r in rules if r.applies_on(day.toordinal(), day.isoweekday())]
+            out.extend(r.block for r in rules)
+        out.sort(key=lambda x: (x.room_id, x.start_min))
         return out
 
     def create_block(
@@ -610,7 +963,7 @@ class RoomFlowService:
         audit: bool = True,
     ):
         self.validate_booking_window(start_date_iso, start, end)
-        datetime.strptime(end_date_iso, "%Y-%m-%d")
+        parse_date_iso(end_date_iso)
         if start_date_iso > end_date_iso:
             raise ValueError("Data início deve ser menor ou igual à data fim")
         if not weekdays:
@@ -636,9 +989,9 @@ class RoomFlowService:
             created_at=self.now_iso(),
             updated_at=self.now_iso(),
         )
-        data = self._load_blocks_room(room_id)
-        data["items"].append(blk.to_dict())
-        self.db.write_json_atomic(self._blocks_file(room_id), data)
+        self.db.update_json(self._blocks_file(room_id), {"room_id": room_id, "items": []}, lambda data: data["items"].append(blk.to_dict()))
+        self.block_index.invalidate(room_id)
+        self.events.publish(self._room_day_events([(None, room_id)]))
         if audit:
             self._audit(
                 actor.id,
@@ -651,23 +1004,26 @@ class RoomFlowService:
         return blk
 
     def disable_block(self, block_id: str, actor: User):
-        for room in self.list_rooms():
-            data = self._load_blocks_room(room.id)
-            changed = False
+        def mutate(data):
             for item in data.get("items", []):
                 if item.get("id") == block_id:
                     item["status"] = BLOCK_INACTIVE
                     item["updated_at"] = self.now_iso()
-                    changed = True
-                    self.db.write_json_atomic(self._blocks_file(room.id), data)
-                    self._audit(actor.id, actor.username, "BLOCK_DISABLED", "BLOCK", block_id, {"room_id": room.id})
-                    return
-            if changed:
-                break
+                    return True
+            return False
+
+        for room in self.list_rooms():
+            if not any(item.get("id") == block_id for item in self._load_blocks_room(room.id).get("items", [])):
+                continue
+            self.db.update_json(self._blocks_file(room.id), {"room_id": room.id, "items": []}, mutate)
+            self.block_index.invalidate(room.id)
+            self.events.publish(self._room_day_events([(None, room.id)]))
+            self._audit(actor.id, actor.username, "BLOCK_DISABLED", "BLOCK", block_id, {"room_id": room.id})
+            return
         raise ValueError("Bloqueio não encontrado")
 
-    def build_time_options(self):
-        cfg = self.get_runtime_config()
+    def build_time_options(self, cfg: Optional[dict] = None):
+        cfg = cfg or self.get_runtime_config()
         start = time_to_minutes(cfg["business_start"])
         end = time_to_minutes(cfg["business_end"])
         step = int(cfg.get("slot_minutes", 15))
@@ -678,101 +1034,140 @@ class RoomFlowService:
             cur += step
         return options
 
-    def blocked_time_points(self, room_id: str, date_iso: str) -> set[str]:
-        cfg = self.get_runtime_config()
-        step = int(cfg.get("slot_minutes", 15))
+    @staticmethod
+    def _time_points(intervals: list[tuple], step: int) -> frozenset:
         points = set()
-        blocks = self.list_blocks(room_id=room_id, date_iso=date_iso, active_only=True)
-        for blk in blocks:
-            cur = time_to_minutes(blk.start)
-            end = time_to_minutes(blk.end)
-            while cur < end:
+        for start_min, end_min, _label in intervals:
+            cur = start_min
+            while cur < end_min:
                 points.add(minutes_to_time(cur))
                 cur += step
-        return points
+        return frozenset(points)
+
+    def room_day_occupancy(self, room_id: str, date_iso: str) -> dict:
+        # Bloqueios e reservas ativas de sala+dia, reconstruídos só quando os tokens de sala+dia mudam.
+        tokens = self.data_generation(room_day=(room_id, date_iso))
+        today = self.today_iso()
+        if date_iso == today:
+            # Reservas de hoje mudam de estado com o relógio (expiração): a entrada vale por minuto.
+            tokens.append(self.now().strftime("%H:%M"))
+        return self.occupancy_cache.get((room_id, date_iso), tuple(tokens), lambda: self._build_occupancy(room_id, date_iso, expire=date_iso <= today))
+
+    def _build_occupancy(self, room_id: str, date_iso: str, expire: bool = False) -> dict:
+        if expire:
+            self.expire_due_checkins()
+        step = int(self.get_runtime_config().get("slot_minutes", 15))
+        blocks = [(r.start_min, r.end_min, r.block.reason) for r in self.block_index.active_on(room_id, date_iso)]
+        bookings = []
+        for b in self._day_bookings(date_iso, room_id):
+            if b.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS):
+                bookings.append((b.start_min, b.end_min, b.sector))
+        return {
+            "blocks": blocks,
+            "bookings": bookings,
+            "blocked_times": self._time_points(blocks, step),
+            "reserved_times": self._time_points(bookings, step),
+        }
+
+    def blocked_time_points(self, room_id: str, date_iso: str) -> set[str]:
+        return set(self.room_day_occupancy(room_id, date_iso)["blocked_times"])
 
     def reserved_time_points(self, room_id: str, date_iso: str) -> set[str]:
+        return set(self.room_day_occupancy(room_id, date_iso)["reserved_times"])
+
+    def availability(self, room_id: str, date_iso: str, start: str = "", end: str = "") -> dict:
         cfg = self.get_runtime_config()
-        step = int(cfg.get("slot_minutes", 15))
-        points = set()
-        bookings = self.list_bookings({"room_id": room_id, "date": date_iso})
-        for b in bookings:
-            if b.status not in (BOOK_ACTIVE, BOOK_IN_PROGRESS):
-                continue
-            cur = time_to_minutes(b.start)
-            end = time_to_minutes(b.end)
-            while cur < end:
-                points.add(minutes_to_time(cur))
-                cur += step
-        return points
+        occupancy = self.room_day_occupancy(room_id, date_iso)
+        return {
+            "room_id": room_id,
+            "date": date_iso,
+            "time_options": self.build_time_options(cfg),
+            "blocked_times": sorted(occupancy["blocked_times"]),
+            "reserved_times": sorted(occupancy["reserved_times"]),
+            "semaphore": self.get_semaphore(room_id, date_iso, start, end, cfg=cfg) if start and end else None,
+        }
 
-    def _overlaps(self, a_start: str, a_end: str, b_start: str, b_end: str):
-        return time_to_minutes(a_start) < time_to_minutes(b_end) and time_to_minutes(b_start) < time_to_minutes(a_end)
+    def _overlaps(self, a_start: int, a_end: int, b_start: int, b_end: int):
+        return a_start < b_end and b_start < a_end
 
-    def validate_booking_window(self, date_iso: str, start: str, end: str):
-        datetime.strptime(date_iso, "%Y-%m-%d")
-        start = parse_time_hhmm(start)
-        end = parse_time_hhmm(end)
-        cfg = self.get_runtime_config()
-        if time_to_minutes(start) >= time_to_minutes(end):
+    def validate_booking_window(self, date_iso: str, start: str, end: str, cfg: Optional[dict] = None):
+        parse_date_iso(date_iso)
+        start_min = time_to_minutes(start)
+        end_min = time_to_minutes(end)
+        cfg = cfg or self.get_runtime_config()
+        if start_min >= end_min:
             raise ValueError("Hora inicial deve ser menor que final")
-        if (time_to_minutes(end) - time_to_minutes(start)) < int(cfg["min_booking_minutes"]):
+        if (end_min - start_min) < int(cfg["min_booking_minutes"]):
             raise ValueError(f"Duração mínima de {cfg['min_booking_minutes']} minutos")
-        if time_to_minutes(start) < time_to_minutes(cfg["business_start"]) or time_to_minutes(end) > time_to_minutes(cfg["business_end"]):
+        if start_min < time_to_minutes(cfg["business_start"]) or end_min > time_to_minutes(cfg["business_end"]):
             raise ValueError("Horário fora do expediente")
 
     def find_conflicting_active_bookings(self, room_id: str, date_iso: str, start: str, end: str):
         conflicts = []
-        data = self._load_bookings_file(date_iso, room_id)
-        for raw in data.get("items", []):
-            b = self._booking_from_dict(raw)
+        start_min = time_to_minutes(start)
+        end_min = time_to_minutes(end)
+        for b in self._day_bookings_on_disk(date_iso, room_id):
             if b.status not in (BOOK_ACTIVE, BOOK_IN_PROGRESS):
                 continue
-            if self._overlaps(start, end, b.start, b.end):
+            if self._overlaps(start_min, end_min, b.start_min, b.end_min):
                 conflicts.append(b)
         return conflicts
 
     def find_conflicting_blocks(self, room_id: str, date_iso: str, start: str, end: str):
-        out = []
-        for blk in self.list_blocks(room_id=room_id, date_iso=date_iso, active_only=True):
-            if self._overlaps(start, end, blk.start, blk.end):
-                out.append(blk)
-        return out
+        rules = self.block_index.overlapping(room_id, date_iso, time_to_minutes(start), time_to_minutes(end))
+        return [r.block for r in rules]
 
-    def get_semaphore(self, room_id: str, date_iso: str, start: str, end: str):
+    def get_semaphore(self, room_id: str, date_iso: str, start: str, end: str, cfg: Optional[dict] = None):
         try:
-            self.validate_booking_window(date_iso, start, end)
+            self.validate_booking_window(date_iso, start, end, cfg=cfg)
         except Exception as exc:
             return {"color": "vermelho", "label": "Vermelho", "message": str(exc), "can_submit": False}
 
-        block_conflicts = self.find_conflicting_blocks(room_id, date_iso, start, end)
-        if block_conflicts:
-            blk = block_conflicts[0]
+        # Mesma ordem de `find_conflicting_blocks`/`find_conflicting_active_bookings`, sobre a ocupação em cache.
+        occupancy = self.room_day_occupancy(room_id, date_iso)
+        start_min = time_to_minutes(start)
+        end_min = time_to_minutes(end)
+        block = next((x for x in occupancy["blocks"] if self._overlaps(start_min, end_min, x[0], x[1])), None)
+        if block:
             return {
                 "color": "vermelho",
                 "label": "Vermelho",
-                "message": f"Conflito com bloqueio: {blk.reason}",
+                "message": f"Conflito com bloqueio: {block[2]}",
                 "can_submit": False,
             }
 
-        booking_conflicts = self.find_conflicting_active_bookings(room_id, date_iso, start, end)
-        if booking_conflicts:
-            first = booking_conflicts[0]
+        booking = next((x for x in occupancy["bookings"] if self._overlaps(start_min, end_min, x[0], x[1])), None)
+        if booking:
             return {
                 "color": "vermelho",
                 "label": "Vermelho",
-                "message": f"Conflito com reserva ativa de setor {first.sector}",
+                "message": f"Conflito com reserva ativa de setor {booking[2]}",
                 "can_submit": False,
             }
 
         return {"color": "verde", "label": "Verde", "message": "Sem conflito detectado", "can_submit": True}
 
-    def _new_request(self, room_id: str, date_iso: str, start: str, end: str, reason: str, user: User, recurrence_group_id: Optional[str] = None):
-        semaphore = self.get_semaphore(room_id, date_iso, start, end)
+    def _submittable_semaphore(self, room_id: str, date_iso: str, start: str, end: str, cfg: Optional[dict] = None):
+        semaphore = self.get_semaphore(room_id, date_iso, start, end, cfg=cfg)
         if not semaphore["can_submit"]:
             raise ValueError(semaphore["message"])
+        return semaphore
+
+    def _new_request(
+        self,
+        room_id: str,
+        date_iso: str,
+        start: str,
+        end: str,
+        reason: str,
+        user: User,
+        recurrence_group_id: Optional[str] = None,
+        semaphore: Optional[dict] = None,
+        request_id: Optional[str] = None,
+    ):
+        semaphore = semaphore or self._submittable_semaphore(room_id, date_iso, start, end)
         req = BookingRequest(
-            id=self._next_id("requests", "r"),
+            id=request_id or self._next_id("requests", "r"),
             requested_by=user.id,
             username=user.username,
             sector=user.sector,
@@ -798,14 +1193,25 @@ class RoomFlowService:
     def create_recurring_weekly_requests(self, room_id: str, start_date_iso: str, start: str, end: str, reason: str, user: User, occurrences: int):
         if occurrences <= 0:
             raise ValueError("Número de ocorrências deve ser maior que zero")
-        base = datetime.strptime(start_date_iso, "%Y-%m-%d").date()
+        base = parse_date_iso(start_date_iso)
         group = f"rec_{uuid.uuid4().hex[:8]}"
-        created = []
+        # Valida a série inteira antes de gravar: configuração lida uma vez, IDs
+        # reservados em um único lote e cada arquivo mensal reescrito uma vez.
+        cfg = self.get_runtime_config()
+        checked = []
         for i in range(occurrences):
             date_iso = (base + timedelta(days=7 * i)).strftime("%Y-%m-%d")
-            req = self._new_request(room_id, date_iso, start, end, reason, user, recurrence_group_id=group)
-            self._save_request(req)
-            created.append(req)
+            try:
+                semaphore = self._submittable_semaphore(room_id, date_iso, start, end, cfg=cfg)
+            except ValueError as exc:
+                raise ValueError(f"{format_date_br(date_iso)}: {exc}") from exc
+            checked.append((date_iso, semaphore))
+        ids = self._next_ids("requests", "r", occurrences)
+        created = [
+            self._new_request(room_id, date_iso, start, end, reason, user, recurrence_group_id=group, semaphore=semaphore, request_id=request_id)
+            for request_id, (date_iso, semaphore) in zip(ids, checked)
+        ]
+        self._save_requests(created)
         self._audit(user.id, user.username, "REQUEST_RECURRING_CREATED", "REQUEST_GROUP", group, {"count": len(created)})
         return created
 
@@ -824,19 +1230,11 @@ class RoomFlowService:
         self._save_request(req)
         self._audit(actor.id, actor.username, "REQUEST_CANCELLED", "REQUEST", req.id, {"reason": reason, "force": force})
 
+    def _notification_record(self, user_id: str, ntype: str, title: str, message: str):
+        return ("notification", {"user_id": user_id, "type": ntype, "title": title, "message": message, "created_at": self.now_iso()})
+
     def _notify(self, user_id: str, ntype: str, title: str, message: str):
-        path = self._notif_file(user_id)
-        data = self.db.read_json(path, {"user_id": user_id, "items": []})
-        n = Notification(
-            id=self._next_id("notifications", "n"),
-            user_id=user_id,
-            type=ntype,
-            title=title,
-            message=message,
-            created_at=self.now_iso(),
-        )
-        data["items"].append(n.to_dict())
-        self.db.write_json_atomic(path, data)
+        self._emit([self._notification_record(user_id, ntype, title, message)])
 
     def list_notifications(self, user_id: str):
         data = self.db.read_json(self._notif_file(user_id), {"user_id": user_id, "items": []})
@@ -847,31 +1245,64 @@ class RoomFlowService:
     def unread_notification_count(self, user_id: Optional[str]):
         if not user_id:
             return 0
-        return len([x for x in self.list_notifications(user_id) if not x.get("read_at")])
+        return self._user_summary(user_id)["unread"]
 
     def mark_notification_read(self, user_id: str, notification_id: str):
-        path = self._notif_file(user_id)
-        data = self.db.read_json(path, {"user_id": user_id, "items": []})
-        for item in data.get("items", []):
-            if item.get("id") == notification_id:
-                item["read_at"] = self.now_iso()
-                self.db.write_json_atomic(path, data)
-                return
-        raise ValueError("Notificação não encontrada")
+        marked = {}
+        found = []
+
+        def mutate(data):
+            marked.clear()
+            found.clear()
+            for item in data.get("items", []):
+                if item.get("id") == notification_id:
+                    found.append(item)
+                    was_unread = not item.get("read_at")
+                    item["read_at"] = self.now_iso()
+                    if was_unread:
+                        marked[notification_id] = item["read_at"]
+                    return True
+            return False
+
+        self.db.update_json(self._notif_file(user_id), {"user_id": user_id, "items": []}, mutate)
+        if not found:
+            raise ValueError("Notificação não encontrada")
+        self._summary_mark_read(user_id, marked)
+        if marked:
+            self.generations.bump(self._user_scope(user_id))
+            self._publish_unread([user_id])
 
     def mark_all_notifications_read(self, user_id: str):
-        path = self._notif_file(user_id)
-        data = self.db.read_json(path, {"user_id": user_id, "items": []})
-        for item in data.get("items", []):
-            if not item.get("read_at"):
-                item["read_at"] = self.now_iso()
-        self.db.write_json_atomic(path, data)
+        marked = {}
+
+        def mutate(data):
+            marked.clear()
+            for item in data.get("items", []):
+                if not item.get("read_at"):
+                    item["read_at"] = self.now_iso()
+                    marked[item.get("id")] = item["read_at"]
+            return bool(marked)
+
+        self.db.update_json(self._notif_file(user_id), {"user_id": user_id, "items": []}, mutate)
+        self._summary_mark_read(user_id, marked)
+        if marked:
+            self.generations.bump(self._user_scope(user_id))
+            self._publish_unread([user_id])
 
     def approve_request(self, request_id: str, actor: User):
         req = self._load_request(request_id)
         if not req or req.status != REQ_PENDING:
             raise ValueError("Solicitação inválida")
 
+        with self.reservation_locks.hold([(req.room_id, req.date)]):
+            booking = self._approve_locked(req, actor)
+
+        self._notify(req.requested_by, "REQUEST_APPROVED", "Solicitação aprovada", f"Reserva criada para {format_date_br(req.date)} {req.start}-{req.end}.")
+        self._audit(actor.id, actor.username, "REQUEST_APPROVED", "REQUEST", req.id, {"booking_id": booking.id})
+        return booking
+
+    def _approve_locked(self, req: BookingRequest, actor: User) -> Booking:
+        # Chamado com o lock de (sala, dia) da solicitação: verificação e gravação são atômicas.
         if self.find_conflicting_blocks(req.room_id, req.date, req.start, req.end):
             raise ValueError("Solicitação conflita com bloqueio ativo")
 
@@ -902,9 +1333,6 @@ class RoomFlowService:
         req.decided_at = self.now_iso()
         req.decided_by = actor.id
         self._save_request(req)
-
-        self._notify(req.requested_by, "REQUEST_APPROVED", "Solicitação aprovada", f"Reserva criada para {format_date_br(req.date)} {req.start}-{req.end}.")
-        self._audit(actor.id, actor.username, "REQUEST_APPROVED", "REQUEST", req.id, {"booking_id": booking.id})
         return booking
 
     def deny_request(self, request_id: str, actor: User, reason: str):
@@ -919,29 +1347,102 @@ class RoomFlowService:
         self._notify(req.requested_by, "REQUEST_DENIED", "Solicitação negada", f"Motivo: {reason or 'Não informado'}")
         self._audit(actor.id, actor.username, "REQUEST_DENIED", "REQUEST", req.id, {"reason": reason})
 
+    def _occurrence_outcome(self, req: BookingRequest, ok: bool, **extra) -> dict:
+        outcome = {"request_id": req.id, "date": req.date, "start": req.start, "end": req.end, "ok": ok}
+        outcome.update(extra)
+        return outcome
+
     def approve_request_group(self, recurrence_group_id: str, actor: User):
-        reqs = [r for r in self.list_requests({"status": REQ_PENDING}) if r.recurrence_group_id == recurrence_group_id]
-        approved = 0
-        failed = 0
-        for req in reqs:
-            try:
-                self.approve_request(req.id, actor)
-                approved += 1
-            except Exception:
-                failed += 1
+        # Decide o grupo inteiro de uma vez: ocupação de cada dia+sala lida uma vez
+        # (incluindo as ocorrências já aprovadas neste lote), cada arquivo gravado uma
+        # vez e uma notificação agregada por usuário.
+        reqs = list(self.iter_requests({"status": REQ_PENDING, "recurrence_group_id": recurrence_group_id}))
+        with self.reservation_locks.hold((req.room_id, req.date) for req in reqs):
+            outcomes, bookings = self._approve_group_locked(reqs, actor)
+
+        approved = len(bookings)
+        failed = len(reqs) - approved
         for uid in sorted(set(r.requested_by for r in reqs)):
-            self._notify(uid, "REQUEST_GROUP_APPROVED", "Recorrência processada", f"Grupo {recurrence_group_id}: {approved} aprovadas, {failed} falhas.")
-        return {"total": len(reqs), "approved": approved, "failed": failed}
+            failed_dates = ", ".join(format_date_br(o["date"]) for o in outcomes if not o["ok"])
+            message = f"Grupo {recurrence_group_id}: {approved} aprovadas, {failed} falhas."
+            if failed_dates:
+                message += f" Não aprovadas: {failed_dates}."
+            self._notify(uid, "REQUEST_GROUP_APPROVED", "Recorrência processada", message)
+        self._audit_many(
+            actor.id,
+            actor.username,
+            [("REQUEST_APPROVED", "REQUEST", b.request_id, {"booking_id": b.id}) for b in bookings],
+        )
+        return {"total": len(reqs), "approved": approved, "failed": failed, "outcomes": outcomes}
+
+    def _approve_group_locked(self, reqs: list[BookingRequest], actor: User):
+        # Chamado com os locks de todos os (sala, dia) do grupo, adquiridos em ordem.
+        grace = int(self.get_runtime_config()["checkin_grace_minutes"])
+        busy = {}
+        accepted = []
+        outcomes = []
+        for req in reqs:
+            key = (req.date, req.room_id)
+            if key not in busy:
+                busy[key] = self._busy_intervals([], self._day_bookings_on_disk(req.date, req.room_id))
+            if self.block_index.overlapping(req.room_id, req.date, req.start_min, req.end_min):
+                outcomes.append(self._occurrence_outcome(req, False, error="Solicitação conflita com bloqueio ativo"))
+                continue
+            if any(self._overlaps(req.start_min, req.end_min, s, e) for s, e in busy[key]):
+                outcomes.append(self._occurrence_outcome(req, False, error="Conflito com reserva ativa. Ajuste o horário."))
+                continue
+            busy[key].append((req.start_min, req.end_min))
+            accepted.append(req)
+            outcomes.append(None)
+
+        now = self.now_iso()
+        bookings = []
+        for booking_id, req in zip(self._next_ids("bookings", "b", len(accepted)), accepted):
+            bookings.append(
+                Booking(
+                    id=booking_id,
+                    room_id=req.room_id,
+                    date=req.date,
+                    start=req.start,
+                    end=req.end,
+                    sector=req.sector,
+                    created_by=req.requested_by,
+                    created_by_username=req.username,
+                    approved_by=actor.id,
+                    request_id=req.id,
+                    recurrence_group_id=req.recurrence_group_id,
+                    status=BOOK_ACTIVE,
+                    checkin_deadline_minutes=grace,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            req.status = REQ_APPROVED
+            req.decided_at = now
+            req.decided_by = actor.id
+        self._save_bookings(bookings)
+        self._save_requests(accepted)
+
+        booking_by_request = {b.request_id: b.id for b in bookings}
+        outcomes = [
+            outcome or self._occurrence_outcome(req, True, booking_id=booking_by_request[req.id])
+            for req, outcome in zip(reqs, outcomes)
+        ]
+        return outcomes, bookings
 
     def deny_request_group(self, recurrence_group_id: str, actor: User, reason: str):
-        reqs = [r for r in self.list_requests({"status": REQ_PENDING}) if r.recurrence_group_id == recurrence_group_id]
-        denied = 0
+        reqs = list(self.iter_requests({"status": REQ_PENDING, "recurrence_group_id": recurrence_group_id}))
+        now = self.now_iso()
         for req in reqs:
-            self.deny_request(req.id, actor, reason)
-            denied += 1
+            req.status = REQ_DENIED
+            req.decided_by = actor.id
+            req.decided_at = now
+            req.decision_reason = reason.strip()
+        self._save_requests(reqs)
         for uid in sorted(set(r.requested_by for r in reqs)):
-            self._notify(uid, "REQUEST_GROUP_DENIED", "Recorrência negada", f"Grupo {recurrence_group_id}: {denied} negadas. Motivo: {reason}")
-        return {"total": len(reqs), "denied": denied}
+            self._notify(uid, "REQUEST_GROUP_DENIED", "Recorrência negada", f"Grupo {recurrence_group_id}: {len(reqs)} negadas. Motivo: {reason}")
+        self._audit_many(actor.id, actor.username, [("REQUEST_DENIED", "REQUEST", req.id, {"reason": reason}) for req in reqs])
+        return {"total": len(reqs), "denied": len(reqs), "outcomes": [self._occurrence_outcome(req, True) for req in reqs]}
 
     def cancel_booking(self, booking_id: str, actor: User, reason: str, force: bool = False):
         booking = self.get_booking(booking_id)
@@ -955,7 +1456,7 @@ class RoomFlowService:
         if not force:
             if booking.created_by != actor.id:
                 raise ValueError("Sem permissão")
-            start_dt = datetime.strptime(f"{booking.date} {booking.start}", "%Y-%m-%d %H:%M")
+            start_dt = self._booking_start_dt(booking)
             minutes_left = int((start_dt - self.now()).total_seconds() // 60)
             limit = int(self.get_runtime_config()["user_cancel_limit_minutes"])
             if minutes_left < limit:
@@ -970,8 +1471,8 @@ class RoomFlowService:
         self._notify(booking.created_by, "BOOKING_CANCELLED", "Reserva cancelada", f"Reserva {format_date_br(booking.date)} {booking.start}-{booking.end} cancelada.")
         self._audit(actor.id, actor.username, "BOOKING_CANCELLED", "BOOKING", booking.id, {"reason": reason, "force": force})
 
-    def checkin(self, booking_id: str, actor: User):
-        booking = self.get_booking(booking_id)
+    def checkin(self, booking_id: str, actor: User, room_id: str = "", date_iso: str = ""):
+        booking = self.find_booking(booking_id, room_id, date_iso)
         if not booking:
             raise ValueError("Reserva não encontrada")
         if booking.created_by != actor.id:
@@ -981,7 +1482,7 @@ class RoomFlowService:
         if booking.checked_in_at:
             raise ValueError("Check-in já realizado")
 
-        start_dt = datetime.strptime(f"{booking.date} {booking.start}", "%Y-%m-%d %H:%M")
+        start_dt = self._booking_start_dt(booking)
         deadline = start_dt + timedelta(minutes=int(booking.checkin_deadline_minutes or 15))
         now = self.now()
         if now < start_dt or now > deadline:
@@ -992,43 +1493,120 @@ class RoomFlowService:
         self._save_booking(booking)
         self._audit(actor.id, actor.username, "BOOKING_CHECKIN", "BOOKING", booking.id, {})
 
+    @staticmethod
+    def _kiosk_booking(b: Booking, now_min: int) -> dict:
+        return {
+            "id": b.id,
+            "start": b.start,
+            "end": b.end,
+            "sector": b.sector,
+            "username": b.created_by_username,
+            "checked_in": bool(b.checked_in_at),
+            "checkin_open": b.requires_checkin
+            and not b.checked_in_at
+            and b.start_min <= now_min <= b.start_min + int(b.checkin_deadline_minutes or 15),
+        }
+
+    def _build_kiosk_board(self) -> dict:
+        # Só os arquivos de hoje, sem expirar check-ins: o estado vem das horas, não do status gravado.
+        now = self.now()
+        today = now.strftime("%Y-%m-%d")
+        now_min = now.hour * 60 + now.minute
+        rooms = []
+        for room in self.list_rooms():
+            bookings = sorted(
+                (
+                    b
+                    for b in self._day_bookings(today, room.id)
+                    if b.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS) and b.end_min > now_min
+                ),
+                key=lambda b: b.start_min,
+            )
+            current = next((b for b in bookings if b.start_min <= now_min), None)
+            upcoming = next((b for b in bookings if b.start_min > now_min), None)
+            block = next((r.block for r in self.block_index.active_on(room.id, today) if r.start_min <= now_min < r.end_min), None)
+            rooms.append(
+                {
+                    "room_id": room.id,
+                    "name": room.name,
+                    "capacity_label": room.capacity_label,
+                    "blocked": {"reason": block.reason, "start": block.start, "end": block.end} if block else None,
+                    "current": self._kiosk_booking(current, now_min) if current else None,
+                    "next": self._kiosk_booking(upcoming, now_min) if upcoming else None,
+                }
+            )
+        return {"date": today, "as_of": now.strftime("%H:%M"), "rooms": rooms}
+
+    def _booking_start_dt(self, booking: Booking) -> datetime:
+        return datetime.combine(date.fromordinal(booking.date_ord), time(booking.start_min // 60, booking.start_min % 60))
+
     def expire_due_checkins(self):
         expired_items = []
-        now = self.now()
+        old_keys = []
+        new_keys = []
+        changed_by_user = {}
+        now_dt = self.now()
+        today = now_dt.strftime("%Y-%m-%d")
+        # Instante atual como (ordinal, minuto): a comparação vira tupla de inteiros.
+        now = (now_dt.toordinal(), now_dt.hour * 60 + now_dt.minute)
         for path in sorted((self.db.data_dir / "bookings").glob("*.txt")):
-            data = self.db.read_json(path, {"items": []})
-            dirty = False
-            for item in data.get("items", []):
-                b = self._booking_from_dict(item)
-                if b.status not in (BOOK_ACTIVE, BOOK_IN_PROGRESS):
-                    continue
-
-                start_dt = datetime.strptime(f"{b.date} {b.start}", "%Y-%m-%d %H:%M")
-                end_dt = datetime.strptime(f"{b.date} {b.end}", "%Y-%m-%d %H:%M")
-                new_status = b.status
-
-                if now < start_dt:
-                    new_status = BOOK_ACTIVE
-                elif start_dt <= now < end_dt:
-                    new_status = BOOK_IN_PROGRESS
-                else:
-                    if b.requires_checkin and not b.checked_in_at:
-                        new_status = BOOK_EXPIRED
-                    else:
-                        new_status = BOOK_DONE
+            if path.stem[:10] > today:
+                # Reservas futuras permanecem ATIVA; não há transição a avaliar.
+                continue
+            transitions = []
 
-                if new_status != b.status:
-                    item["status"] = new_status
-                    item["updated_at"] = self.now_iso()
-                    dirty = True
-                    if new_status == BOOK_EXPIRED:
-                        expired_items.append((b.id, b.created_by, b.date, b.start, b.end))
-            if dirty:
-                self.db.write_json_atomic(path, data)
+            def mutate(data, transitions=transitions):
+                # Pode rodar de novo após conflito de escrita: recomeça do arquivo relido.
+                transitions.clear()
+                for item in data.get("items", []):
+                    if item.get("status", BOOK_ACTIVE) not in (BOOK_ACTIVE, BOOK_IN_PROGRESS):
+                        continue
+                    b = self._booking_from_dict(item)
 
+                    start_at = (b.date_ord, b.start_min)
+                    end_at = (b.date_ord, b.end_min)
+                    new_status = b.status
+
+                    if now < start_at:
+                        new_status = BOOK_ACTIVE
+                    elif start_at <= now < end_at:
+                        new_status = BOOK_IN_PROGRESS
+                    else:
+                        if b.requires_checkin and not b.checked_in_at:
+                            new_status = BOOK_EXPIRED
+                        else:
+                            new_status = BOOK_DONE
+
+                    if new_status != b.status:
+                        old = self._booking_metric_keys(b)
+                        b.status = new_status
+                        item["status"] = new_status
+                        item["updated_at"] = self.now_iso()
+                        b.updated_at = item["updated_at"]
+                        transitions.append((old, b))
+                return bool(transitions)
+
+            self.db.update_json(path, {"items": []}, mutate)
+            for old, b in transitions:
+                old_keys.extend(old)
+                new_keys.extend(self._booking_metric_keys(b))
+                changed_by_user.setdefault(b.created_by, []).append(b)
+                if b.status == BOOK_EXPIRED:
+                    expired_items.append((b.id, b.created_by, b.date, b.start, b.end))
+        self.metrics.apply(diff_keys(old_keys, new_keys))
+        for user_id, changed in changed_by_user.items():
+            self._summary_put_bookings(user_id, changed)
+        if changed_by_user:
+            self.generations.bump("bookings", *map(self._user_scope, changed_by_user))
+            changed_days = {(b.date, b.room_id) for changed in changed_by_user.values() for b in changed}
+            self.events.publish(self._room_day_events(sorted(changed_days)) + self._user_data_events(changed_by_user))
+
+        records = []
         for booking_id, user_id, date_iso, start, end in expired_items:
-            self._notify(user_id, "BOOKING_EXPIRED", "Reserva expirada", f"Reserva em {format_date_br(date_iso)} {start}-{end} expirou por falta de check-in.")
-            self._audit("system", "system", "BOOKING_EXPIRED_AUTO", "BOOKING", booking_id, {})
+            records.append(self._notification_record(user_id, "BOOKING_EXPIRED", "Reserva expirada", f"Reserva em {format_date_br(date_iso)} {start}-{end} expirou por falta de check-in."))
+            records.append(self._audit_record("system", "system", "BOOKING_EXPIRED_AUTO", "BOOKING", booking_id, {}))
+        if records:
+            self._emit(records)
 
     def emergency_preview(self, room_id: str, date_iso: str, start: str, end: str):
         return self.find_conflicting_active_bookings(room_id, date_iso, start, end)
@@ -1038,16 +1616,32 @@ class RoomFlowService:
         if not reason.strip():
             raise ValueError("Motivo obrigatório")
 
+        with self.reservation_locks.hold([(room_id, date_iso)]):
+            emergency, conflicts = self._emergency_locked(room_id, date_iso, start, end, reason, actor)
+
+        impacted_ids = [b.id for b in conflicts]
+        for b in conflicts:
+            self._notify(b.created_by, "BOOKING_EMERGENCY", "Reserva cancelada por emergência", f"Sua reserva de {format_date_br(b.date)} {b.start}-{b.end} foi cancelada por emergência RH.")
+
+        self._audit(
+            actor.id,
+            actor.username,
+            "EMERGENCY_BOOKING_CREATED",
+            "BOOKING",
+            emergency.id,
+            {"impacted": impacted_ids, "room_id": room_id, "date": date_iso, "start": start, "end": end},
+        )
+        return emergency, conflicts
+
+    def _emergency_locked(self, room_id: str, date_iso: str, start: str, end: str, reason: str, actor: User):
+        # Chamado com o lock de (sala, dia): cancelamentos e a reserva de emergência
+        # vão no mesmo read-modify-write do arquivo do dia.
         conflicts = self.find_conflicting_active_bookings(room_id, date_iso, start, end)
-        impacted_ids = []
         for b in conflicts:
             b.status = BOOK_CANCELLED_EMERGENCY
             b.cancel_reason = reason.strip()
             b.cancelled_by = actor.id
             b.updated_at = self.now_iso()
-            self._save_booking(b)
-            impacted_ids.append(b.id)
-            self._notify(b.created_by, "BOOKING_EMERGENCY", "Reserva cancelada por emergência", f"Sua reserva de {format_date_br(b.date)} {b.start}-{b.end} foi cancelada por emergência RH.")
 
         emergency = Booking(
             id=self._next_id("bookings", "b"),
@@ -1066,103 +1660,335 @@ class RoomFlowService:
             created_at=self.now_iso(),
             updated_at=self.now_iso(),
         )
-        self._save_booking(emergency)
-
-        self._audit(
-            actor.id,
-            actor.username,
-            "EMERGENCY_BOOKING_CREATED",
-            "BOOKING",
-            emergency.id,
-            {"impacted": impacted_ids, "room_id": room_id, "date": date_iso, "start": start, "end": end},
-        )
+        self._save_bookings(conflicts + [emergency])
         return emergency, conflicts
 
-    def _interval_taken(self, room_id: str, date_iso: str, start: str, end: str):
-        if self.find_conflicting_active_bookings(room_id, date_iso, start, end):
-            return True
-        if self.find_conflicting_blocks(room_id, date_iso, start, end):
-            return True
-        return False
+    def reservation_lock_metrics(self) -> dict:
+        return self.reservation_locks.metrics()
+
+    def _busy_intervals(self, block_rules, bookings, statuses=(BOOK_ACTIVE, BOOK_IN_PROGRESS)) -> list[tuple[int, int]]:
+        busy = [(r.start_min, r.end_min) for r in block_rules]
+        busy += [(b.start_min, b.end_min) for b in bookings if b.status in statuses]
+        busy.sort()
+        merged = []
+        for start, end in busy:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def _free_slots(self, busy: list[tuple[int, int]], window_start: int, window_end: int, duration: int, step: int, limit: int):
+        out = []
+        cur = window_start
+        idx = 0
+        while cur + duration <= window_end and len(out) < limit:
+            # `busy` vem ordenado e mesclado: avança o cursor sem reler intervalos já passados.
+            while idx < len(busy) and busy[idx][1] <= cur:
+                idx += 1
+            if idx < len(busy) and busy[idx][0] < cur + duration:
+                cur += step
+                continue
+            out.append({"start": minutes_to_time(cur), "end": minutes_to_time(cur + duration)})
+            cur += step
+        return out
 
     def suggest_free_slots(self, room_id: str, date_iso: str, duration_minutes: int, limit: int = 5):
         cfg = self.get_runtime_config()
         step = int(cfg["slot_minutes"])
         start_min = time_to_minutes(cfg["business_start"])
         end_min = time_to_minutes(cfg["business_end"])
-        out = []
-        cur = start_min
-        while cur + duration_minutes <= end_min and len(out) < limit:
-            start = minutes_to_time(cur)
-            end = minutes_to_time(cur + duration_minutes)
-            if not self._interval_taken(room_id, date_iso, start, end):
-                out.append({"start": start, "end": end})
-            cur += step
-        return out
+        blocks = self.block_index.active_on(room_id, date_iso)
+        busy = self._busy_intervals(blocks, self._day_bookings(date_iso, room_id))
+        return self._free_slots(busy, start_min, end_min, duration_minutes, step, limit)
 
-    def schedule_for_room(self, room_id: str, date_iso: str, viewer: User):
+    def search_availability(
+        self,
+        date_from_iso: str,
+        date_to_iso: str,
+        start: str,
+        end: str,
+        duration_minutes: int,
+        min_capacity: int = 0,
+        slots_per_room: int = 5,
+        max_days: int = 31,
+    ):
+        cfg = self.get_runtime_config()
+        step = int(cfg["slot_minutes"])
+        first_day = parse_date_iso(date_from_iso)
+        last_day = parse_date_iso(date_to_iso or date_from_iso)
+        if first_day > last_day:
+            raise ValueError("Data início deve ser menor ou igual à data fim")
+        if (last_day - first_day).days + 1 > max_days:
+            raise ValueError(f"Intervalo máximo de {max_days} dias")
+
+        window_start = max(time_to_minutes(start), time_to_minutes(cfg["business_start"]))
+        window_end = min(time_to_minutes(end), time_to_minutes(cfg["business_end"]))
+        if window_start >= window_end:
+            raise ValueError("Hora inicial deve ser menor que final (dentro do expediente)")
+        if duration_minutes < int(cfg["min_booking_minutes"]):
+            raise ValueError(f"Duração mínima de {cfg['min_booking_minutes']} minutos")
+        if duration_minutes > window_end - window_start:
+            raise ValueError("Duração maior que a janela de horário")
+
+        rooms = [r for r in self.list_rooms() if int(r.capacity or 0) >= min_capacity]
+        days = [(first_day + timedelta(days=i)) for i in range((last_day - first_day).days + 1)]
+
+        # Bloqueios vêm do índice compilado; uma listagem do diretório de reservas:
+        # só os arquivos dia+sala existentes no intervalo são lidos, cada um uma vez.
+        existing_files = {p.name for p in (self.db.data_dir / "bookings").glob("*.txt")}
+
+        results = []
+        for room in rooms:
+            slots = []
+            for day in days:
+                if len(slots) >= slots_per_room:
+                    break
+                date_iso = day.strftime("%Y-%m-%d")
+                blocks = self.block_index.active_on(room.id, date_iso)
+                bookings = []
+                if f"{date_iso}_{room.id}.txt" in existing_files:
+                    bookings = self._day_bookings(date_iso, room.id)
+                busy = self._busy_intervals(blocks, bookings)
+                for slot in self._free_slots(busy, window_start, window_end, duration_minutes, step, slots_per_room - len(slots)):
+                    slots.append({"date": date_iso, **slot})
+            if slots:
+                results.append({"room": room, "capacity_surplus": int(room.capacity or 0) - min_capacity, "slots": slots})
+
+        # Ranking: primeiro horário livre mais cedo; empate -> sala de capacidade mais justa.
+        results.sort(key=lambda x: (x["slots"][0]["date"], x["slots"][0]["start"], x["capacity_surplus"], x["room"].id))
+        return results
+
+    def calendar_grid(self, date_from_iso: str, date_to_iso: str, room_id: Optional[str] = None):
+        cfg = self.get_runtime_config()
+        business_start = time_to_minutes(cfg["business_start"])
+        business_end = time_to_minutes(cfg["business_end"])
+        business_total = max(business_end - business_start, 1)
+        first_day = parse_date_iso(date_from_iso)
+        last_day = parse_date_iso(date_to_iso)
+        days = [(first_day + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((last_day - first_day).days + 1)]
+        rooms = [r for r in self.list_rooms() if not room_id or r.id == room_id]
+
+        # Expande as regras compiladas de bloqueio de cada sala para o intervalo inteiro.
+        blocks_by_day = {(room.id, date_iso): self.block_index.active_on(room.id, date_iso) for room in rooms for date_iso in days}
+
+        # Uma listagem do diretório; cada arquivo dia+sala do intervalo é lido uma única vez.
+        room_ids = {r.id for r in rooms}
+        bookings_by_day = {}
+        for path in (self.db.data_dir / "bookings").glob("*.txt"):
+            name = path.stem
+            if "_room_" not in name:
+                continue
+            fdate, _, fsuffix = name.partition("_")
+            if fdate < date_from_iso or fdate > date_to_iso or fsuffix not in room_ids:
+                continue
+            bookings_by_day[(fsuffix, fdate)] = self._bookings_in(path)
+
+        rows = []
+        for room in rooms:
+            cells = []
+            for date_iso in days:
+                blocks = blocks_by_day.get((room.id, date_iso), [])
+                bookings = [b for b in bookings_by_day.get((room.id, date_iso), []) if b.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS, BOOK_DONE)]
+                busy = self._busy_intervals(blocks, bookings, statuses=(BOOK_ACTIVE, BOOK_IN_PROGRESS, BOOK_DONE))
+                busy_minutes = sum(max(0, min(e, business_end) - max(s, business_start)) for s, e in busy)
+                pct = int(round(100 * busy_minutes / business_total))
+                if pct == 0:
+                    level = "free"
+                elif pct < 50:
+                    level = "partial"
+                elif pct < 100:
+                    level = "busy"
+                else:
+                    level = "full"
+                cells.append(
+                    {
+                        "date": date_iso,
+                        "bookings": len(bookings),
+                        "blocks": len(blocks),
+                        "occupancy_pct": pct,
+                        "level": level,
+                    }
+                )
+            rows.append({"room": room, "cells": cells})
+        return {"days": days, "rows": rows}
+
+    def schedule_slots(self, room_id: str, date_iso: str, staff: bool):
+        # Grade sem destaque do visualizador: varia só por sala, dia, configuração de slots e
+        # classe do visualizador (RH/Admin vê quem reservou). `owner` permite aplicar `mine_slot` depois.
         cfg = self.get_runtime_config()
         step = int(cfg["slot_minutes"])
         slots = []
-        blocks = self.list_blocks(room_id=room_id, date_iso=date_iso, active_only=True)
+        block_rules = self.block_index.active_on(room_id, date_iso)
         bookings = self.list_bookings({"room_id": room_id, "date": date_iso})
 
         cur = time_to_minutes(cfg["business_start"])
         end_limit = time_to_minutes(cfg["business_end"])
         while cur < end_limit:
             slot_start = minutes_to_time(cur)
-            slot_end = minutes_to_time(cur + step)
             entry = {
                 "time": slot_start,
                 "status_key": "free",
                 "status_label": "Livre",
                 "badge": "success",
                 "detail": "Livre",
+                "owner": None,
             }
 
-            matching_block = next((b for b in blocks if self._overlaps(slot_start, slot_end, b.start, b.end)), None)
+            matching_block = next((r.block for r in block_rules if r.overlaps(cur, cur + step)), None)
             if matching_block:
                 entry.update({"status_key": "blocked", "status_label": "Bloqueado", "badge": "dark", "detail": f"Bloqueio - {matching_block.reason}"})
             else:
-                matching_booking = next((b for b in bookings if b.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS) and self._overlaps(slot_start, slot_end, b.start, b.end)), None)
+                matching_booking = next((b for b in bookings if b.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS) and self._overlaps(cur, cur + step, b.start_min, b.end_min)), None)
                 if matching_booking:
-                    is_mine = viewer and matching_booking.created_by == viewer.id
-                    if viewer.role in (ROLE_ADMIN, ROLE_RH):
+                    if staff:
                         detail = f"Reservado - {matching_booking.created_by_username} ({matching_booking.sector})"
                     else:
-                        detail = "Minha reserva" if is_mine else f"Reservado - {matching_booking.sector}"
-                    entry.update({"status_key": "mine" if is_mine else "reserved", "status_label": "Reservado", "badge": "primary" if is_mine else "secondary", "detail": detail})
+                        detail = f"Reservado - {matching_booking.sector}"
+                    entry.update({"status_key": "reserved", "status_label": "Reservado", "badge": "secondary", "detail": detail, "owner": matching_booking.created_by})
             slots.append(entry)
             cur += step
         return slots
 
+    @staticmethod
+    def mine_slot(entry: dict, staff: bool) -> dict:
+        mine = dict(entry, status_key="mine", badge="primary")
+        if not staff:
+            mine["detail"] = "Minha reserva"
+        return mine
+
+    def schedule_for_room(self, room_id: str, date_iso: str, viewer: User):
+        staff = viewer.role in (ROLE_ADMIN, ROLE_RH)
+        return [
+            self.mine_slot(entry, staff) if entry["owner"] and entry["owner"] == viewer.id else entry
+            for entry in self.schedule_slots(room_id, date_iso, staff)
+        ]
+
+    @staticmethod
+    def _summary_booking_key(item: dict):
+        return (item["date"], item["start"], item["room_id"])
+
+    @staticmethod
+    def _summary_request_key(item: dict):
+        return (item["date"], item["start"], item["id"])
+
+    def rebuild_user_summary(self, user_id: str) -> dict:
+        bookings = [
+            b.to_dict()
+            for b in self.iter_bookings({"created_by": user_id}, expire=False)
+            if b.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS)
+        ]
+        pending = [r.to_dict() for r in self.iter_requests({"requested_by": user_id, "status": REQ_PENDING})]
+        notifications = self.list_notifications(user_id)
+        data = {
+            "bookings": sorted(bookings, key=self._summary_booking_key),
+            "pending": sorted(pending, key=self._summary_request_key),
+            "notifications": notifications[:SUMMARY_NOTIFICATIONS],
+            "unread": sum(1 for x in notifications if not x.get("read_at")),
+        }
+        self.summaries.write(user_id, data)
+        return data
+
+    def _user_summary(self, user_id: str) -> dict:
+        return self.summaries.read(user_id) or self.rebuild_user_summary(user_id)
+
+    def _summary_put_bookings(self, user_id: str, bookings):
+        def mutate(data):
+            changed = False
+            for b in bookings:
+                item = b.to_dict() if b.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS) else None
+                changed |= replace_item(data["bookings"], b.id, item, self._summary_booking_key)
+            return changed
+
+        self.summaries.update(user_id, mutate)
+
+    def _summary_put_requests(self, user_id: str, reqs):
+        def mutate(data):
+            changed = False
+            for req in reqs:
+                item = req.to_dict() if req.status == REQ_PENDING else None
+                changed |= replace_item(data["pending"], req.id, item, self._summary_request_key)
+            return changed
+
+        self.summaries.update(user_id, mutate)
+
+    def _summary_add_notifications(self, user_id: str, items: list[dict]):
+        if not items:
+            return
+
+        def mutate(data):
+            # Mesma ordem de `list_notifications`: as novas entram por último e o sort estável decide empates.
+            latest = data["notifications"] + items
+            latest.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+            data["notifications"] = latest[:SUMMARY_NOTIFICATIONS]
+            data["unread"] += sum(1 for x in items if not x.get("read_at"))
+            return True
+
+        self.summaries.update(user_id, mutate)
+
+    def _summary_mark_read(self, user_id: str, marked: dict):
+        if not marked:
+            return
+
+        def mutate(data):
+            for item in data["notifications"]:
+                if item.get("id") in marked:
+                    item["read_at"] = marked[item["id"]]
+            data["unread"] = max(0, data["unread"] - len(marked))
+            return True
+
+        self.summaries.update(user_id, mutate)
+
     def my_dashboard(self, user: User):
+        # Uma leitura de `dashboards/<user_id>.txt`; a expiração de check-ins já
+        # rodou no before_request e atualizou o resumo.
+        summary = self._user_summary(user.id)
         today = self.today_iso()
-        bookings_today = [b for b in self.list_bookings({"created_by": user.id, "date": today}) if b.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS)]
-        upcoming = [b for b in self.list_bookings({"created_by": user.id}) if b.status == BOOK_ACTIVE and (b.date > today or (b.date == today and b.start >= self.now().strftime('%H:%M')))]
-        pending = self.list_requests({"requested_by": user.id, "status": REQ_PENDING})
-        notifications = self.list_notifications(user.id)[:5]
+        now_dt = self.now()
+        now_at = (now_dt.toordinal(), now_dt.hour * 60 + now_dt.minute)
+        bookings = [self._booking_from_dict(x) for x in summary["bookings"]]
+        upcoming = (b for b in bookings if b.status == BOOK_ACTIVE and b.date >= today and (b.date_ord, b.start_min) >= now_at)
         return {
-            "bookings_today": bookings_today,
-            "upcoming": upcoming[:5],
-            "pending": pending[:5],
-            "notifications": notifications,
+            "bookings_today": [b for b in bookings if b.date == today],
+            "upcoming": list(islice(upcoming, 5)),
+            "pending": [self._request_from_dict(x) for x in summary["pending"][:5]],
+            "notifications": summary["notifications"],
         }
 
+    def _request_metric_keys(self, req: BookingRequest) -> list[tuple]:
+        if req.status != REQ_PENDING:
+            return []
+        keys = [("months", req.date[:7], "pending")]
+        if req.has_conflict:
+            keys.append(("months", req.date[:7], "pending_conflict"))
+        return keys
+
+    def _booking_metric_keys(self, booking: Booking) -> list[tuple]:
+        if booking.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS):
+            return [("days", booking.date, booking.room_id)]
+        if booking.status == BOOK_EXPIRED:
+            return [("months", booking.date[:7], "no_show")]
+        return []
+
+    def rebuild_metrics(self) -> dict:
+        keys = []
+        for req in self.iter_requests():
+            keys.extend(self._request_metric_keys(req))
+        for b in self.iter_bookings(expire=False):
+            keys.extend(self._booking_metric_keys(b))
+        return self.metrics.rebuild(keys)
+
     def admin_dashboard(self):
+        # Leitura única de `_meta/metrics.txt`; as transições de check-in já
+        # foram aplicadas pelo before_request da requisição.
+        metrics = self.metrics.read() or self.rebuild_metrics()
         today = self.today_iso()
-        pending = len(self.list_requests({"status": REQ_PENDING}))
-        conflicts = len([r for r in self.list_requests({"status": REQ_PENDING}) if r.has_conflict])
-        no_show = len([b for b in self.list_bookings({"month": today[:7]}) if b.status == BOOK_EXPIRED])
-        today_bookings = [b for b in self.list_bookings({"date": today}) if b.status in (BOOK_ACTIVE, BOOK_IN_PROGRESS)]
-        by_room = {}
-        for b in today_bookings:
-            by_room[b.room_id] = by_room.get(b.room_id, 0) + 1
+        months = metrics["months"]
         return {
-            "pending_requests": pending,
-            "today_by_room": by_room,
-            "conflicts_pending": conflicts,
-            "no_show": no_show,
+            "pending_requests": sum(m.get("pending", 0) for m in months.values()),
+            "today_by_room": dict(sorted(metrics["days"].get(today, {}).items())),
+            "conflicts_pending": sum(m.get("pending_conflict", 0) for m in months.values()),
+            "no_show": months.get(today[:7], {}).get("no_show", 0),
         }
 
     def group_requests_for_display(self, requests):
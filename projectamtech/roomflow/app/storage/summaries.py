@@ -0,0 +1,66 @@
+"""Resumo materializado do painel de cada usuário.
+
+O documento `dashboards/<user_id>.txt` guarda o que o "Meu Painel" exibe:
+
+    {"version": 1, "user_id": "...",
+     "bookings": [reservas ATIVA/EM_ANDAMENTO do usuário, por (data, início)],
+     "pending": [solicitações PENDENTE do usuário, por (data, início)],
+     "notifications": [últimas notificações, mais recentes primeiro],
+     "unread": n}
+
+O serviço atualiza o resumo a cada escrita de reserva, solicitação ou
+notificação. Documento ausente ou de outra versão é reconstruído na próxima
+leitura; por isso as atualizações só são aplicadas sobre um documento válido.
+"""
+
+from pathlib import Path
+from typing import Callable, Optional
+
+from .filedb import FileDB
+
+SUMMARY_VERSION = 1
+SUMMARY_NOTIFICATIONS = 5
+
+
+def summary_file(db: FileDB, user_id: str) -> Path:
+    return db.data_dir / "dashboards" / f"{user_id}.txt"
+
+
+def replace_item(items: list, item_id: str, new_item: Optional[dict], sort_key: Callable) -> bool:
+    """Troca (ou remove, com `new_item=None`) o item de `item_id`; devolve se a lista mudou."""
+    kept = [x for x in items if x.get("id") != item_id]
+    if new_item is not None:
+        kept.append(new_item)
+        kept.sort(key=sort_key)
+    if kept == items:
+        return False
+    items[:] = kept
+    return True
+
+
+class UserSummaryStore:
+    def __init__(self, db: FileDB):
+        self.db = db
+
+    def read(self, user_id: str) -> Optional[dict]:
+        data = self.db.read_json(summary_file(self.db, user_id), None)
+        if not data or data.get("version") != SUMMARY_VERSION:
+            return None
+        return data
+
+    def write(self, user_id: str, data: dict):
+        data["version"] = SUMMARY_VERSION
+        data["user_id"] = user_id
+        self.db.write_json_atomic(summary_file(self.db, user_id), data)
+
+    def update(self, user_id: str, mutate: Callable[[dict], bool]):
+        path = summary_file(self.db, user_id)
+        with self.db.file_lock(path):
+            data = self.db.read_json(path, None)
+            if not data or data.get("version") != SUMMARY_VERSION:
+                return
+            if mutate(data):
+                self.db.write_json_atomic(path, data, use_lock=False)
+
+    def delete(self, user_id: str):
+        self.db.remove(summary_file(self.db, user_id))
@@ -0,0 +1,45 @@
+"""Cache LRU em memória validado por tokens de geração.
+
+Cada chave guarda `(tokens, valor)`. `get` devolve o valor só se os tokens
+atuais (por exemplo, `RoomFlowService.data_generation`) forem os mesmos da
+construção; caso contrário reconstrói e substitui a entrada. Acima de
+`max_entries` chaves, a usada há mais tempo sai primeiro.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class TokenCache:
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, tokens: tuple, build: Callable):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == tokens:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+        # Constrói fora do lock; dois misses simultâneos na mesma chave constroem em dobro.
+        value = build()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (tokens, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,49 @@
+"""Tabela de versões de usuário para validar o snapshot da sessão.
+
+`_meta/user_versions.txt` guarda `{user_id: versão}`. Toda mudança que afeta
+a sessão (papel/setor, senha, exclusão) incrementa a versão do usuário. A
+sessão carrega um snapshot assinado do usuário com a versão vista no login;
+se a versão atual for outra, o usuário é relido do disco.
+
+A tabela fica em memória e só é relida quando o arquivo muda (assinatura de
+`stat`), então validar a sessão custa um `stat` por requisição.
+"""
+
+import threading
+
+from .filedb import FileDB
+
+
+class UserVersionTable:
+    def __init__(self, db: FileDB):
+        self.db = db
+        self.path = db.data_dir / "_meta" / "user_versions.txt"
+        self._signature = None
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _table(self) -> dict:
+        signature = self._stat_signature()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._versions = self.db.read_json(self.path, {}) if signature else {}
+                    self._signature = signature
+        return self._versions
+
+    def get(self, user_id: str) -> int:
+        return int(self._table().get(user_id, 0))
+
+    def bump(self, user_id: str) -> int:
+        def mutate(data):
+            data[user_id] = int(data.get(user_id, 0)) + 1
+
+        data = self.db.update_json(self.path, {}, mutate)
+        return data[user_id]
@@ -1,6 +1,7 @@
 """Helpers de validação e conversão de data/hora."""
 
-from datetime import datetime
+from datetime import date, datetime
+from functools import lru_cache
 
 
 def parse_date_br(value: str) -> str:
@@ -21,19 +22,66 @@ def format_date_br(value_iso: str) -> str:
         return value_iso
 
 
+def _hhmm_to_minutes(value: str) -> int:
+    # Parser sem `strptime`: aceita H:MM/HH:MM (mesma regra de "%H:%M").
+    h, sep, m = value.partition(":")
+    if not sep or not (1 <= len(h) <= 2) or not (1 <= len(m) <= 2) or not h.isdecimal() or not m.isdecimal():
+        raise ValueError("Hora inválida. Use HH:MM")
+    hour = int(h)
+    minute = int(m)
+    if hour > 23 or minute > 59:
+        raise ValueError("Hora inválida. Use HH:MM")
+    return hour * 60 + minute
+
+
 def parse_time_hhmm(value: str) -> str:
     if not value:
         raise ValueError("Horário obrigatório")
+    total = _hhmm_to_minutes(value)
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+# Só existem 1440 horários válidos: o cache devolve o mesmo `int` sem reparsear.
+@lru_cache(maxsize=2048)
+def time_to_minutes(value: str) -> int:
+    if not value:
+        raise ValueError("Horário obrigatório")
+    if len(value) == 5 and value[2] == ":" and value[:2].isdecimal() and value[3:].isdecimal():
+        hour = int(value[:2])
+        minute = int(value[3:])
+        if hour <= 23 and minute <= 59:
+            return hour * 60 + minute
+    return _hhmm_to_minutes(value)
+
+
+def time_to_minutes_or_default(value: str, default: int = -1) -> int:
     try:
-        return datetime.strptime(value, "%H:%M").strftime("%H:%M")
+        return time_to_minutes(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_date_iso(value: str) -> date:
+    if not value:
+        raise ValueError("Data obrigatória")
+    if len(value) != 10 or value[4] != "-" or value[7] != "-":
+        raise ValueError("Data inválida. Use AAAA-MM-DD")
+    try:
+        return date.fromisoformat(value)
     except ValueError as exc:
-        raise ValueError("Hora inválida. Use HH:MM") from exc
+        raise ValueError("Data inválida. Use AAAA-MM-DD") from exc
 
 
-def time_to_minutes(value: str) -> int:
-    hhmm = parse_time_hhmm(value)
-    h, m = hhmm.split(":")
-    return int(h) * 60 + int(m)
+@lru_cache(maxsize=8192)
+def date_to_ordinal(value: str) -> int:
+    return parse_date_iso(value).toordinal()
+
+
+def date_to_ordinal_or_default(value: str, default: int = 0) -> int:
+    try:
+        return date_to_ordinal(value)
+    except (TypeError, ValueError):
+        return default
 
 
 def minutes_to_time(value: int) -> str:
@@ -0,0 +1,29 @@
+"""Configuração do gunicorn para o RoomFlow (`gunicorn -c gunicorn.conf.py wsgi:app`).
+
+`preload_app`: seed e conversões de arranque rodam uma vez, no mestre, antes
+do fork. Workers `gthread`: cada conexão SSE (`/api/events`) ocupa uma
+thread por até `SSE_MAX_SECONDS`, então `threads` precisa cobrir as páginas
+abertas por worker além das requisições comuns.
+
+Variáveis de ambiente: `ROOMFLOW_BIND`, `ROOMFLOW_WORKERS`, `ROOMFLOW_THREADS`.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("ROOMFLOW_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("ROOMFLOW_WORKERS", min(4, multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("ROOMFLOW_THREADS", "32"))
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+
+def post_fork(server, worker):
+    # Caches vazios e threads (outbox, eventos) do próprio worker; o mestre não os inicia.
+    from app import init_process
+    from wsgi import app
+
+    init_process(app)
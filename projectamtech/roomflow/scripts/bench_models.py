@@ -0,0 +1,113 @@
+"""Microbenchmark dos modelos de domínio (memória e CPU).
+
+Compara o modelo anterior (dataclass comum + `dataclasses.asdict`) com o
+`Booking` atual (`slots=True` + `to_dict`/`from_dict` escritos à mão) em uma
+listagem grande, como a que `list_bookings` materializa em páginas de admin.
+
+Uso:
+    python scripts/bench_models.py [N]
+"""
+
+import sys
+import timeit
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.storage.models import Booking  # noqa: E402
+
+
+@dataclass
+class DataclassBooking:
+    id: str
+    room_id: str
+    date: str
+    start: str
+    end: str
+    sector: str
+    created_by: str
+    created_by_username: str
+    approved_by: str
+    status: str
+    request_id: Optional[str] = None
+    is_emergency: bool = False
+    emergency_reason: str = ""
+    requires_checkin: bool = True
+    checkin_deadline_minutes: int = 15
+    checked_in_at: Optional[str] = None
+    recurrence_group_id: Optional[str] = None
+    cancel_reason: str = ""
+    cancelled_by: str = ""
+    created_at: str = ""
+    updated_at: str = ""
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def sample_rows(n: int) -> list[dict]:
+    rows = []
+    for i in range(n):
+        rows.append(
+            {
+                "id": f"b_{i:06d}",
+                "room_id": f"room_{i % 5 + 1}",
+                "date": f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                "start": f"{7 + i % 10:02d}:00",
+                "end": f"{8 + i % 10:02d}:00",
+                "sector": "TI",
+                "created_by": f"u_{i % 300:04d}",
+                "created_by_username": f"user{i % 300}",
+                "approved_by": "u_0001",
+                "status": "CONCLUIDA",
+                "request_id": f"r_{i:06d}",
+                "is_emergency": False,
+                "emergency_reason": "",
+                "requires_checkin": True,
+                "checkin_deadline_minutes": 15,
+                "checked_in_at": None,
+                "recurrence_group_id": None,
+                "cancel_reason": "",
+                "cancelled_by": "",
+                "created_at": "2026-01-01T08:00:00",
+                "updated_at": "2026-01-01T08:00:00",
+            }
+        )
+    return rows
+
+
+def measure_memory(factory, rows) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [factory(r) for r in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return after - before
+
+
+def bench(label, factory, rows, repeat=3):
+    objs = [factory(r) for r in rows]
+    load = min(timeit.repeat(lambda: [factory(r) for r in rows], number=1, repeat=repeat))
+    dump = min(timeit.repeat(lambda: [o.to_dict() for o in objs], number=1, repeat=repeat))
+    mem = measure_memory(factory, rows)
+    print(f"{label:<22} load {load * 1000:8.1f} ms   to_dict {dump * 1000:8.1f} ms   memória {mem / 1024 / 1024:7.2f} MiB")
+    return load, dump, mem
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rows = sample_rows(n)
+    print(f"{n} reservas")
+    old = bench("dataclass + asdict", lambda r: DataclassBooking(**r), rows)
+    new = bench("slots + to_dict manual", Booking.from_dict, rows)
+    print(
+        f"ganho: load {old[0] / new[0]:.2f}x   to_dict {old[1] / new[1]:.2f}x   memória -{100 * (1 - new[2] / old[2]):.0f}%"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Benchmark de arranque de vários workers (POSIX: usa `os.fork`).
+
+Compara dois jeitos de subir N workers sobre a mesma base:
+- por worker: cada processo importa o app e roda `create_app()` (cada um
+  passa pelo arranque da base, como o servidor sem preload);
+- preload: o mestre roda `create_app()` uma vez e faz o fork; cada worker só
+  chama `init_process` (caches vazios e worker do outbox).
+
+Cada modo roda sem o marcador de seed (`_meta/seed.txt` apagado antes de
+cada rodada: seed e conversões varrem a base) e com o marcador em dia
+(arranque sem varreduras). Mede o tempo até todos os workers estarem prontos
+e o tempo somado gasto no arranque da base (`run_startup`). Roda sobre uma
+cópia temporária da base, com `--users` usuários extras para o custo das
+varreduras aparecer.
+
+Uso:
+    python scripts/bench_startup.py [--workers 4] [--users 2000] [--rounds 3]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _build_app(data_dir: Path, timings: Path):
+    from app import create_app
+    from app.config import Config
+    from app.storage.services import RoomFlowService
+
+    class BenchConfig(Config):
+        DATA_DIR = data_dir
+        PASSWORD_POOL_WORKERS = 0
+
+    original = RoomFlowService.run_startup
+
+    def timed(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            with open(timings, "a", encoding="utf-8") as f:
+                f.write(f"{time.perf_counter() - started}\n")
+
+    RoomFlowService.run_startup = timed
+    try:
+        return create_app(BenchConfig)
+    finally:
+        RoomFlowService.run_startup = original
+
+
+def _stop(app):
+    # Sem esperar a thread do outbox: só para e drena o que ficou.
+    app.roomflow.stop_outbox_worker()
+
+
+def _spawn(workers: int, child) -> None:
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                child()
+            except BaseException:
+                code = 1
+            os._exit(code)
+        pids.append(pid)
+    for pid in pids:
+        _, status = os.waitpid(pid, 0)
+        if status != 0:
+            raise SystemExit("worker falhou")
+
+
+def _per_worker(data_dir: Path, timings: Path, workers: int) -> float:
+    started = time.perf_counter()
+
+    def child():
+        app = _build_app(data_dir, timings)
+        from app import init_process
+
+        init_process(app)
+        _stop(app)
+
+    _spawn(workers, child)
+    return time.perf_counter() - started
+
+
+def _preload(data_dir: Path, timings: Path, workers: int) -> float:
+    started = time.perf_counter()
+    app = _build_app(data_dir, timings)
+    from app import init_process
+
+    def child():
+        init_process(app)
+        _stop(app)
+
+    _spawn(workers, child)
+    return time.perf_counter() - started
+
+
+def _add_users(data_dir: Path, count: int):
+    users_dir = data_dir / "users"
+    template = json.loads(next(users_dir.glob("*.txt")).read_text(encoding="utf-8"))
+    for n in range(count):
+        user_id = f"u_bench_{n:05d}"
+        (users_dir / f"{user_id}.txt").write_text(
+            json.dumps(dict(template, id=user_id, username=f"bench{n}", role="USER", sector="TI"), ensure_ascii=False),
+            encoding="utf-8",
+        )
+
+
+def _run_mode(mode, base: Path, workers: int, rounds: int, marker: bool) -> tuple[float, float]:
+    walls = []
+    startup = []
+    for _ in range(rounds):
+        if not marker:
+            (base / "_meta" / "seed.txt").unlink(missing_ok=True)
+        timings = Path(tempfile.mkstemp(prefix="roomflow_startup_")[1])
+        try:
+            walls.append(mode(base, timings, workers))
+            startup.append(sum(float(x) for x in timings.read_text().split()))
+        finally:
+            timings.unlink(missing_ok=True)
+    return min(walls), min(startup)
+
+
+def main():
+    if not hasattr(os, "fork"):
+        raise SystemExit("bench_startup.py precisa de os.fork (Linux/macOS).")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="roomflow_startup_"))
+    try:
+        data_dir = tmp / "data"
+        shutil.copytree(ROOT / "data", data_dir)
+        _add_users(data_dir, args.users)
+        print(f"{args.workers} workers, {args.users} usuários extras, melhor de {args.rounds}")
+        # Por worker primeiro: o processo mestre ainda não importou o app.
+        for label, mode in (("por worker", _per_worker), ("preload", _preload)):
+            for marker in (False, True):
+                wall, startup = _run_mode(mode, data_dir, args.workers, args.rounds, marker)
+                name = f"{label}, {'com' if marker else 'sem'} marcador"
+                print(f"{name:<26} prontos em {wall * 1000:8.1f} ms   arranque da base (soma) {startup * 1000:8.1f} ms")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Teste de estresse de aprovações concorrentes na mesma sala e dia.
+
+Cria várias solicitações sobrepostas para o mesmo horário e as aprova ao
+mesmo tempo, em processos e threads diferentes. Com o lock por sala+dia,
+exatamente uma aprovação por rodada pode vencer; mais de uma reserva ativa
+no mesmo horário é reserva dupla.
+
+Roda sobre uma cópia temporária da base.
+
+Uso:
+    python scripts/stress_approvals.py [--procs 4] [--threads 4] [--rounds 5]
+"""
+
+import argparse
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.config import Config  # noqa: E402
+from app.storage.filedb import FileDB  # noqa: E402
+from app.storage.services import BOOK_ACTIVE, ROLE_ADMIN, RoomFlowService  # noqa: E402
+
+
+def _service(data_dir: str) -> RoomFlowService:
+    return RoomFlowService(FileDB(Path(data_dir), lock_timeout=30), Config)
+
+
+def _admin(svc: RoomFlowService):
+    return next(u for u in svc.list_users() if u.role == ROLE_ADMIN)
+
+
+def _worker(args):
+    data_dir, request_ids = args
+    svc = _service(data_dir)
+    admin = _admin(svc)
+    results = []
+
+    def approve(request_id):
+        try:
+            svc.approve_request(request_id, admin)
+            results.append(True)
+        except ValueError:
+            results.append(False)
+
+    threads = [threading.Thread(target=approve, args=(rid,)) for rid in request_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(results), svc.reservation_lock_metrics()
+
+
+def _weekdays(count: int):
+    # Dias bem no futuro: não colidem com reservas já existentes na base copiada.
+    day = date.today() + timedelta(days=3650)
+    while count:
+        if day.isoweekday() <= 5:
+            yield day.isoformat()
+            count -= 1
+        day += timedelta(days=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="roomflow_stress_"))
+    data_dir = tmp / "data"
+    shutil.copytree(Config.DATA_DIR, data_dir)
+    try:
+        svc = _service(str(data_dir))
+        user = next(u for u in svc.list_users() if u.role != ROLE_ADMIN)
+        room_id = svc.list_rooms()[0].id
+        ok = True
+        for rnd, day in enumerate(_weekdays(args.rounds)):
+            per_proc = []
+            for _ in range(args.procs):
+                reqs = [svc.create_request(room_id, day, "14:00", "15:00", "estresse", user) for _ in range(args.threads)]
+                per_proc.append([r.id for r in reqs])
+            with multiprocessing.Pool(args.procs) as pool:
+                results = pool.map(_worker, [(str(data_dir), ids) for ids in per_proc])
+            approved = sum(n for n, _ in results)
+            active = [b for b in svc.list_bookings({"room_id": room_id, "date": day}) if b.status == BOOK_ACTIVE and b.start == "14:00"]
+            waits = [stat for _, metrics in results for label, stat in metrics.items() if label == f"{room_id}@{day}"]
+            wait_max = max((s["wait_max_ms"] for s in waits), default=0.0)
+            status = "ok" if approved == 1 and len(active) == 1 else "RESERVA DUPLA"
+            ok = ok and status == "ok"
+            print(f"rodada {rnd + 1}: {day} aprovadas={approved} ativas={len(active)} espera_max={wait_max:.1f}ms {status}")
+        sys.exit(0 if ok else 1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Teste de estresse multi-processo das escritas com compare-and-swap.
+
+Vários processos gravam ao mesmo tempo no mesmo arquivo de reservas
+(mesma sala e dia), no mesmo inbox de notificações e no mesmo log de
+auditoria. Ao final, todo registro gravado precisa estar no arquivo: se o
+read-modify-write perdesse atualizações, as contagens ficariam abaixo do
+esperado.
+
+Roda sobre uma cópia temporária da base (ou sobre `--data-dir`, que deve
+ser descartável).
+
+Uso:
+    python scripts/stress_cas.py [--procs 8] [--writes 25] [--data-dir DIR]
+"""
+
+import argparse
+import multiprocessing
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.config import Config  # noqa: E402
+from app.storage.filedb import FileDB  # noqa: E402
+from app.storage.models import Booking  # noqa: E402
+from app.storage.services import BOOK_CANCELLED, RoomFlowService  # noqa: E402
+
+ROOM_ID = "room_stress"
+DATE_ISO = "2099-01-05"
+USER_ID = "u_stress"
+
+
+def _service(data_dir: str) -> RoomFlowService:
+    return RoomFlowService(FileDB(Path(data_dir), lock_timeout=30), Config)
+
+
+def _worker(args):
+    data_dir, proc, writes = args
+    svc = _service(data_dir)
+    for i in range(writes):
+        # Reservas canceladas: não entram em conflito entre si, só disputam o arquivo.
+        svc._save_booking(
+            Booking(
+                id=f"b_stress_{proc}_{i}",
+                room_id=ROOM_ID,
+                date=DATE_ISO,
+                start="08:00",
+                end="09:00",
+                sector="STRESS",
+                created_by=USER_ID,
+                created_by_username="stress",
+                approved_by=USER_ID,
+                status=BOOK_CANCELLED,
+            )
+        )
+        svc._notify(USER_ID, "STRESS", "Estresse", f"{proc}/{i}")
+        svc._audit(USER_ID, "stress", "STRESS_WRITE", "STRESS", f"{proc}/{i}", {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procs", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=25)
+    parser.add_argument("--data-dir", default="")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.data_dir:
+        data_dir = Path(args.data_dir)
+    else:
+        tmp = Path(tempfile.mkdtemp(prefix="roomflow_stress_"))
+        data_dir = tmp / "data"
+        shutil.copytree(Config.DATA_DIR, data_dir)
+
+    try:
+        svc = _service(str(data_dir))
+        audit_before = len(svc.list_audit_events(svc.today_iso()[:7], "STRESS_WRITE"))
+        tasks = [(str(data_dir), p, args.writes) for p in range(args.procs)]
+        with multiprocessing.Pool(args.procs) as pool:
+            pool.map(_worker, tasks)
+
+        svc.drain_outbox()
+        expected = args.procs * args.writes
+        bookings = [b for b in svc._load_bookings_file(DATE_ISO, ROOM_ID)["items"] if b["id"].startswith("b_stress_")]
+        notifications = [n for n in svc.list_notifications(USER_ID) if n["type"] == "STRESS"]
+        audit = len(svc.list_audit_events(svc.today_iso()[:7], "STRESS_WRITE")) - audit_before
+        ok = True
+        for label, got in (("reservas", len(bookings)), ("notificações", len(notifications)), ("auditoria", audit)):
+            status = "ok" if got == expected else "PERDA"
+            ok = ok and got == expected
+            print(f"{label:<14} esperado={expected:<6} gravado={got:<6} {status}")
+        sys.exit(0 if ok else 1)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
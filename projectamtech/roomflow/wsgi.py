@@ -0,0 +1,19 @@
+"""Entrada WSGI de produção do RoomFlow.
+
+Sem servidor de desenvolvimento nem debug. O app é criado uma vez por
+importação deste módulo: com preload (gunicorn `preload_app`), só no
+processo mestre, e os workers herdam o app pelo fork. O estado por processo
+(caches, worker do outbox, acompanhamento de eventos) é preparado em
+`app.init_process`, chamado no `post_fork` ou na primeira requisição.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    waitress-serve --threads 64 --connection-limit 200 --port 5000 wsgi:app
+
+Cada aba logada mantém uma conexão SSE ocupando uma thread por até
+`SSE_MAX_SECONDS`: o número de threads (no waitress, `--threads`) precisa
+cobrir as abas abertas mais as requisições comuns (abas + 16).
+"""
+
+from app import create_app
+
+app = create_app()